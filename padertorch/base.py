@@ -194,6 +194,14 @@ class Model(Module, Configurable, abc.ABC):
     # This flag is True when the model should create a snapshot in the review
     create_snapshot: bool = False
 
+    # This flag is True when the review is going to be summarized, i.e. the
+    # model should compute metrics that are only reported (see review)
+    summary_due: bool = True
+
+    # The loss weights of the trainer (set by pt.Trainer). Losses with a
+    # weight of zero do not need to be computed, when no summary is due.
+    loss_weights: dict = None
+
     @abc.abstractmethod
     def forward(self, inputs):  # pylint: disable=arguments-differ
         """Define the I/O behavior of Model().
@@ -236,7 +244,9 @@ class Model(Module, Configurable, abc.ABC):
                     Will be added to scalars logging of tensorboard.
                     Combined with `pt.Trainer.loss_weights` these losses build
                     the loss. On the loss is backward called for gradient
-                    update.
+                    update. Losses with a weight of zero in
+                    `self.loss_weights` may be missing, e.g. report them as
+                    scalars only when `self.summary_due`.
                 loss:
                     Scalar objective. Only allowed when no losses is provided.
                     Otherwise it will be computed from losses.
@@ -264,15 +274,23 @@ class Model(Module, Configurable, abc.ABC):
             You can use this flag to avoid unnecessary computations
             by only computing a snapshot if it will be reported instead of
             computing a snapshot in every iteration.
+         - `self.summary_due` (bool) indicates when metrics that do not
+            contribute to the loss (e.g. SDR) are reported.
+            Motivation: The metrics are only computed in the iterations
+            selected by the `review_metrics_trigger` of the trainer.
+            You can use this flag to skip expensive metrics in the other
+            iterations. Without a `review_metrics_trigger` and in validation
+            this flag is always True.
 
         """
         ...  # calculate loss
         with torch.no_grad():
-            ...  # calculate general metrics
-            if self.training:
-                ...  # calculate training specific metrics
-            else:
-                ...  # calculate validation specific metrics
+            if self.summary_due:
+                ...  # calculate general metrics
+                if self.training:
+                    ...  # calculate training specific metrics
+                else:
+                    ...  # calculate validation specific metrics
 
             if self.create_snapshot:
                 ...  # create snapshots to be displayed in TensorBoard
@@ -329,6 +347,10 @@ class Model(Module, Configurable, abc.ABC):
         required for loss computation, but are nice to have reported to
         tensorboard.
 
+        Examples with many small arrays (e.g. lengths, speaker ids, masks)
+        can be transferred with one copy per dtype with
+        `example_to_device(example, device, batched=True)`.
+
         Args:
             example: The example to transfer to `device`
             device: The device to transfer `example` to.
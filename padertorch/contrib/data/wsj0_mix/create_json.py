@@ -1,6 +1,5 @@
 import itertools
 
-import functools
 import re
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
@@ -10,6 +9,7 @@ from tqdm import tqdm
 from appdirs import user_cache_dir
 
 import paderbox as pb
+from padertorch.data.audio_scan import scan_audio_files
 
 from ..utils import check_audio_files_exist
 
@@ -127,13 +127,11 @@ def load_spk2gender(spk2gender_file):
     return spk2gender
 
 
-@functools.lru_cache(maxsize=None)
-def audio_length(file):
-    return pb.io.audioread.audio_length(file)
-
-
 def get_dataset(transcriptions, scenario_path, num_speakers, spk2gender,
                 dataset_name):
+    # Reads the headers of all mix files in parallel
+    infos = scan_audio_files(scenario_path / 'mix', extensions=('.wav',))
+
     def get_path(index, example_id):
         path = scenario_path / f's{index + 1}' / f'{example_id}.wav'
 
@@ -171,7 +169,7 @@ def get_dataset(transcriptions, scenario_path, num_speakers, spk2gender,
                 OBSERVATION: str(file),
             },
             LOG_WEIGHTS: list(map(float, speaker_sdr)),
-            NUM_SAMPLES: audio_length(file),
+            NUM_SAMPLES: infos[str(file)]['num_samples'],
             SPEAKER_ID: [utt_id[:3] for utt_id in wsj_utterance_ids],
         }
 
@@ -201,7 +199,7 @@ def get_dataset(transcriptions, scenario_path, num_speakers, spk2gender,
         return example_id, example
 
     with ThreadPoolExecutor() as pool:
-        files = (scenario_path / 'mix').glob('*.wav')
+        files = map(Path, infos)
         dataset = dict(tqdm(
             pool.map(task, files),
             desc=f'{dataset_name} ({scenario_path})',
@@ -0,0 +1,101 @@
+"""
+Throughput benchmark of the parallel data loading of a lazy_dataset pipeline:
+ - lazy_dataset prefetch with threads
+ - lazy_dataset prefetch with processes
+ - torch DataLoader (padertorch.data.loader.to_data_loader)
+
+The synthetic transform simulates reading (sleep) and a feature extraction
+(STFT with numpy) of each example. The batches are collated to padded
+tensors.
+
+Use the following command:
+
+    OMP_NUM_THREADS=1 MKL_NUM_THREADS=1 python data_loader.py --num_workers=4
+
+The throughput is reported in examples per second for the second epoch
+(i.e. with started persistent workers).
+"""
+import time
+
+import lazy_dataset
+import numpy as np
+
+from padertorch.data.loader import to_data_loader
+from padertorch.data.utils import PaddedCollate
+
+
+class Transform:
+    def __init__(self, read_time, num_samples):
+        self.read_time = read_time
+        self.num_samples = num_samples
+
+    def __call__(self, example):
+        time.sleep(self.read_time)
+        rng = np.random.RandomState(example)
+        audio = rng.randn(
+            rng.randint(self.num_samples // 2, self.num_samples))
+        frames = np.lib.stride_tricks.sliding_window_view(
+            audio, 512)[::128]
+        stft = np.abs(np.fft.rfft(frames * np.hanning(512), axis=-1))
+        return {
+            'example_id': str(example),
+            'stft': stft.astype(np.float32),
+            'num_frames': stft.shape[0],
+        }
+
+
+def _measure(loader, num_examples):
+    for _ in loader:  # First epoch, e.g. worker start
+        pass
+    start = time.perf_counter()
+    for _ in loader:
+        pass
+    return num_examples / (time.perf_counter() - start)
+
+
+def main(
+        num_examples=2000,
+        num_workers=4,
+        batch_size=16,
+        read_time=0.002,
+        num_samples=32000,
+):
+    dataset = lazy_dataset.new(list(range(num_examples)))
+    transform = Transform(read_time, num_samples)
+    collate = PaddedCollate(to_torch=True)
+
+    candidates = {
+        'prefetch (threads)': (
+            dataset.map(transform)
+            .prefetch(num_workers, 2 * num_workers * batch_size, backend='t')
+            .batch(batch_size).map(collate)
+        ),
+        'prefetch (processes)': (
+            dataset.map(transform)
+            .prefetch(
+                num_workers, 2 * num_workers * batch_size,
+                backend='concurrent_mp',
+            )
+            .batch(batch_size).map(collate)
+        ),
+        'DataLoader': to_data_loader(
+            dataset.map(transform), batch_size=batch_size,
+            collate_fn=collate, num_workers=num_workers,
+            persistent_workers=True,
+        ),
+        'DataLoader (pin_memory)': to_data_loader(
+            dataset.map(transform), batch_size=batch_size,
+            collate_fn=collate, num_workers=num_workers,
+            persistent_workers=True, pin_memory=True,
+        ),
+    }
+    print(f'{num_examples} examples, {num_workers} workers, '
+          f'batch_size={batch_size}')
+    for name, loader in candidates.items():
+        throughput = _measure(loader, num_examples)
+        print(f'{name:<25}: {throughput:10.0f} examples/s')
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(main)
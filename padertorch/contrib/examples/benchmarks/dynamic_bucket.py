@@ -0,0 +1,74 @@
+"""
+Benchmark of the bucket assignment of the dynamic time series bucketing:
+ - lazy_dataset.core.DynamicBucketDataset, that assesses all open buckets
+ - padertorch.contrib.je.data.utils.IndexedDynamicBucketDataset, that only
+   assesses the open buckets with a matching length range
+
+Both are used with DynamicExtendedTimeSeriesBucket on synthetic examples with
+log-normal distributed lengths and the batches are checked to be identical.
+
+Use the following command:
+
+    python dynamic_bucket.py --num_examples=1000000 --batch_size=16 --max_padding_rate=0.05
+
+The throughput is reported in examples per second.
+"""
+import time
+
+import numpy as np
+from lazy_dataset.core import DynamicBucketDataset
+
+from padertorch.contrib.je.data.utils import (
+    DynamicExtendedTimeSeriesBucket, IndexedDynamicBucketDataset
+)
+
+
+def _run(dataset_cls, examples, **kwargs):
+    start = time.perf_counter()
+    batches = [
+        [example['example_id'] for example in batch]
+        for batch in dataset_cls(
+            examples, DynamicExtendedTimeSeriesBucket, **kwargs)
+    ]
+    return batches, time.perf_counter() - start
+
+
+def main(
+        num_examples=1_000_000,
+        batch_size=16,
+        max_padding_rate=0.05,
+        expiration=None,
+        seed=0,
+):
+    rng = np.random.RandomState(seed)
+    lengths = np.ceil(
+        rng.lognormal(mean=np.log(500), sigma=0.8, size=num_examples))
+    examples = [
+        {'example_id': str(i), 'seq_len': int(length)}
+        for i, length in enumerate(lengths)
+    ]
+    kwargs = dict(
+        batch_size=batch_size, len_key='seq_len',
+        max_padding_rate=max_padding_rate, expiration=expiration,
+        sort_key='seq_len', reverse_sort=True,
+    )
+
+    print(f'{num_examples} examples, batch_size={batch_size}, '
+          f'max_padding_rate={max_padding_rate}, expiration={expiration}')
+    results = {}
+    for name, dataset_cls in [
+        ('DynamicBucketDataset', DynamicBucketDataset),
+        ('IndexedDynamicBucketDataset', IndexedDynamicBucketDataset),
+    ]:
+        batches, elapsed = _run(dataset_cls, examples, **kwargs)
+        results[name] = batches
+        print(f'{name:<30}: {num_examples / elapsed:10.0f} examples/s '
+              f'({len(batches)} batches)')
+    reference, indexed = results.values()
+    assert reference == indexed, 'The batches are different'
+    print('Identical batches')
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(main)
@@ -0,0 +1,63 @@
+"""
+Benchmark of `padertorch.data.example_to_device` with and without
+`batched=True`.
+
+The example has `num_arrays` small arrays (lengths, speaker ids, masks,
+per-source signals), as produced by the collate of a source separation
+database.
+
+Use the following command:
+
+    python example_to_device.py --device=cuda --num_arrays=50 --steps=100
+
+Without a GPU, `--device=meta` can be used to measure the host overhead
+(traversal and packing) without the transfers.
+"""
+import time
+
+import numpy as np
+import torch
+
+from padertorch.data import example_to_device
+
+
+def get_example(num_arrays, batch_size=8, num_samples=32000):
+    rng = np.random.RandomState(0)
+    example = {
+        'observation': rng.randn(batch_size, num_samples).astype(np.float32),
+        'num_samples': np.full(batch_size, num_samples),
+        'speaker_id': rng.randint(0, 100, (batch_size, 2)),
+        'example_id': [str(i) for i in range(batch_size)],
+    }
+    for i in range(num_arrays - 3):
+        if i % 2:
+            example[f'mask_{i}'] = rng.rand(batch_size, 100) > 0.5
+        else:
+            example[f'source_{i}'] = rng.randn(
+                batch_size, 100).astype(np.float32)
+    return example
+
+
+def _synchronize(device):
+    if torch.device(device).type == 'cuda':
+        torch.cuda.synchronize(device)
+
+
+def main(device='cuda', num_arrays=50, steps=100):
+    example = get_example(num_arrays)
+    for batched in [False, True]:
+        # Warmup, e.g. CUDA initialization and pinned memory allocation
+        example_to_device(example, device, batched=batched)
+        _synchronize(device)
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            example_to_device(example, device, batched=batched)
+        _synchronize(device)
+        elapsed = (time.perf_counter() - start) / steps
+        print(f'batched={batched!s:<5}: {elapsed * 1e3:.3f} ms per example')
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(main)
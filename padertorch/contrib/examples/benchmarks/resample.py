@@ -0,0 +1,104 @@
+"""
+Throughput benchmark of the resampling in the data pipeline:
+ - scipy.signal.resample_poly per example
+ - samplerate ('sinc_fastest', used by contrib/je AudioReader) per example,
+   if installed
+ - padertorch.ops.resample per example (e.g. in the prefetch workers)
+ - padertorch.ops.resample on a padded batch (e.g. on the GPU after the
+   collation)
+
+Use the following command:
+
+    python resample.py --orig_sample_rate=44100 --target_sample_rate=16000 --device=cuda
+
+The throughput is reported in seconds of audio per second.
+"""
+import math
+import time
+
+import numpy as np
+import torch
+from scipy.signal import resample_poly
+
+from padertorch.ops import resample
+
+
+def _synchronize(device):
+    if torch.device(device).type == 'cuda':
+        torch.cuda.synchronize(device)
+
+
+def _measure(fn, audio_seconds, repetitions):
+    fn()  # Warmup, e.g. kernel computation and CUDA initialization
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        fn()
+    elapsed = (time.perf_counter() - start) / repetitions
+    return audio_seconds / elapsed
+
+
+def main(
+        orig_sample_rate=44100,
+        target_sample_rate=16000,
+        batch_size=16,
+        seconds=10,
+        device='cpu',
+        repetitions=5,
+):
+    rng = np.random.RandomState(0)
+    lengths = rng.randint(
+        seconds * orig_sample_rate // 2, seconds * orig_sample_rate,
+        size=batch_size)
+    examples = [rng.randn(length).astype(np.float32) for length in lengths]
+    audio_seconds = sum(lengths) / orig_sample_rate
+
+    g = math.gcd(orig_sample_rate, target_sample_rate)
+    up, down = target_sample_rate // g, orig_sample_rate // g
+
+    def scipy_per_example():
+        for x in examples:
+            resample_poly(x, up, down)
+
+    def torch_per_example():
+        with torch.no_grad():
+            for x in examples:
+                resample(torch.from_numpy(x), orig_sample_rate,
+                         target_sample_rate)
+
+    batch = np.zeros((batch_size, max(lengths)), dtype=np.float32)
+    for i, x in enumerate(examples):
+        batch[i, :len(x)] = x
+    batch = torch.from_numpy(batch).to(device)
+
+    def torch_batch():
+        with torch.no_grad():
+            resample(batch, orig_sample_rate, target_sample_rate,
+                     sequence_lengths=lengths)
+        _synchronize(device)
+
+    candidates = {
+        'scipy.signal.resample_poly': scipy_per_example,
+        'padertorch.ops.resample (per example, cpu)': torch_per_example,
+        f'padertorch.ops.resample (batch, {device})': torch_batch,
+    }
+    try:
+        import samplerate
+    except ImportError:
+        pass
+    else:
+        def samplerate_per_example():
+            for x in examples:
+                samplerate.resample(
+                    x, target_sample_rate / orig_sample_rate, 'sinc_fastest')
+        candidates['samplerate (sinc_fastest)'] = samplerate_per_example
+
+    print(f'{orig_sample_rate} Hz -> {target_sample_rate} Hz, '
+          f'{audio_seconds:.1f} s audio in {batch_size} examples')
+    for name, fn in candidates.items():
+        throughput = _measure(fn, audio_seconds, repetitions)
+        print(f'{name:<45}: {throughput:10.0f} s/s')
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(main)
@@ -5,6 +5,8 @@ from padertorch.contrib.je.data.transforms import (
 )
 from padertorch.contrib.je.data.mixup import MixUpDataset, \
     SampleMixupComponents, SuperposeEvents
+from padertorch.contrib.je.data.utils import IndexedDynamicBucketDataset
+from lazy_dataset.core import DynamicTimeSeriesBucket
 from paderbox.utils.random_utils import LogTruncatedNormal
 
 
@@ -124,7 +126,8 @@ def prepare_dataset(
             buffer_size=80*batch_size,
         )
 
-    return dataset.batch_dynamic_time_series_bucket(
+    return IndexedDynamicBucketDataset(
+        dataset, DynamicTimeSeriesBucket,
         batch_size=batch_size, len_key="seq_len",
         max_padding_rate=max_padding_rate, expiration=1000*batch_size,
         drop_incomplete=training, sort_key="seq_len", reverse_sort=True
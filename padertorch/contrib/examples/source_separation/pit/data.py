@@ -3,7 +3,6 @@ from functools import partial
 import einops
 import numpy as np
 
-import paderbox as pb
 import padertorch as pt
 from paderbox.transform import stft
 
@@ -16,7 +15,8 @@ def prepare_iterable(
 
     iterator = (
         iterator
-        .map(partial(read_audio, audio_keys=audio_keys))
+        # Reads the observation and all speech sources concurrently
+        .map(pt.data.async_audio.AsyncAudioReader(audio_keys=audio_keys))
         .map(partial(pre_batch_transform, return_keys=return_keys))
         .shuffle(reshuffle=True)
         .batch(batch_size)
@@ -35,17 +35,6 @@ def prepare_iterable(
     return iterator
 
 
-def read_audio(example, src_key="audio_path", audio_keys=None):
-    data = {
-        audio_key: pb.io.audioread.recursive_load_audio(
-            example[src_key][audio_key],
-        )
-        for audio_key in audio_keys
-    }
-    example["audio_data"] = data
-    return example
-
-
 def pre_batch_transform(inputs, return_keys=None):
     s = inputs['audio_data']['speech_source']
     y = inputs['audio_data']['observation']
@@ -108,8 +108,7 @@ class PermutationInvariantTrainingModel(pt.Model):
         )
         return pt.ops.unpack_sequence(mask)
 
-    def review(self, batch, model_out):
-
+    def pit_mse_loss(self, batch, model_out):
         pit_mse_loss = list()
         for mask, observation, target in zip(
                 model_out,
@@ -121,6 +120,9 @@ class PermutationInvariantTrainingModel(pt.Model):
                 target,
                 axis=-2
             ))
+        return torch.mean(torch.stack(pit_mse_loss))
+
+    def pit_ips_loss(self, batch, model_out):
         # Ideal Phase Sensitive loss
         pit_ips_loss = list()
         for mask, observation, target, cos_phase_diff in zip(
@@ -134,19 +136,31 @@ class PermutationInvariantTrainingModel(pt.Model):
                 target * cos_phase_diff,
                 axis=-2
             ))
+        return torch.mean(torch.stack(pit_ips_loss))
 
-        losses = {
-                'pit_mse_loss': torch.mean(torch.stack(pit_mse_loss)),
-                'pit_ips_loss': torch.mean(torch.stack(pit_ips_loss)),
-        }
-
-        b = 0   # only print image of first example in a batch
-        images = dict()
-        images['observation'] = stft_to_image(batch['Y_abs'][b])
-        for i in range(model_out[b].shape[1]):
-            images[f'mask_{i}'] = mask_to_image(model_out[b][:, i, :])
-            images[f'estimation_{i}'] = stft_to_image(batch['X_abs'][b][:, 0, :])
-
-        return dict(losses=losses,
-                    images=images
-                    )
+    def review(self, batch, model_out):
+        review = dict(losses=dict(), scalars=dict())
+        for key in ['pit_mse_loss', 'pit_ips_loss']:
+            # Losses with a weight of zero are only reported. Compute them
+            # only when a summary is due.
+            if self.loss_weights is not None \
+                    and self.loss_weights.get(key, 1) == 0:
+                if self.summary_due:
+                    with torch.no_grad():
+                        review['scalars'][key] = getattr(self, key)(
+                            batch, model_out)
+            else:
+                review['losses'][key] = getattr(self, key)(batch, model_out)
+
+        # The images are only reported once per summary. Skip them in all
+        # other iterations.
+        if self.create_snapshot:
+            b = 0   # only print image of first example in a batch
+            images = dict()
+            images['observation'] = stft_to_image(batch['Y_abs'][b])
+            for i in range(model_out[b].shape[1]):
+                images[f'mask_{i}'] = mask_to_image(model_out[b][:, i, :])
+                images[f'estimation_{i}'] = stft_to_image(batch['X_abs'][b][:, 0, :])
+            review['images'] = images
+
+        return review
@@ -151,16 +151,20 @@ class TasNet(pt.Model):
 
         return out
 
-    def loss(self, inputs: dict, outputs: dict) -> dict:
+    loss_functions = {
+        'si-sdr': si_sdr_loss,
+        'log-mse': log_mse_loss,
+        'log1p-mse': log1p_mse_loss,
+    }
+
+    def loss(self, inputs: dict, outputs: dict, keys=None) -> dict:
         s = inputs['s']
         sequence_lengths = inputs['num_samples']
         x = outputs['out']
 
-        loss_functions = {
-            'si-sdr': si_sdr_loss,
-            'log-mse': log_mse_loss,
-            'log1p-mse': log1p_mse_loss,
-        }
+        if keys is None:
+            keys = self.loss_functions.keys()
+        loss_functions = {k: self.loss_functions[k] for k in keys}
         losses = {k: [] for k in loss_functions.keys()}
 
         for seq_len, estimated, target in zip(sequence_lengths, x, s):
@@ -176,25 +180,44 @@ class TasNet(pt.Model):
         return {k: torch.mean(torch.stack(v)) for k, v in losses.items()}
 
     def review(self, inputs: dict, outputs: dict) -> dict:
-        # Report audios
-        audios = {
-            'observation': pt.summary.audio(
-                signal=inputs['y'][0], sampling_rate=self.sample_rate
-            ),
-        }
+        # The audios are only reported once per summary. Skip the transfer
+        # to the cpu in all other iterations.
+        audios = None
+        if self.create_snapshot:
+            # Report audios
+            audios = {
+                'observation': pt.summary.audio(
+                    signal=inputs['y'][0], sampling_rate=self.sample_rate
+                ),
+            }
+
+            for i, e in enumerate(outputs['out'][0]):
+                audios[f'estimate/{i}'] = pt.summary.audio(
+                    signal=e, sampling_rate=self.sample_rate
+                )
 
-        for i, e in enumerate(outputs['out'][0]):
-            audios[f'estimate/{i}'] = pt.summary.audio(
-                signal=e, sampling_rate=self.sample_rate
-            )
+            for i, y in enumerate(inputs['s'][0]):
+                audios[f'target/{i}'] = pt.summary.audio(
+                    signal=y, sampling_rate=self.sample_rate
+                )
 
-        for i, y in enumerate(inputs['s'][0]):
-            audios[f'target/{i}'] = pt.summary.audio(
-                signal=y, sampling_rate=self.sample_rate
-            )
+        # Losses with a weight of zero are only reported. Compute them only
+        # when a summary is due.
+        loss_keys = list(self.loss_functions.keys())
+        report_keys = []
+        if self.loss_weights is not None:
+            report_keys = [
+                k for k in loss_keys if self.loss_weights.get(k, 1) == 0]
+            loss_keys = [k for k in loss_keys if k not in report_keys]
+
+        scalars = None
+        if report_keys and self.summary_due:
+            with torch.no_grad():
+                scalars = self.loss(inputs, outputs, report_keys)
 
         return pt.summary.review_dict(
-            losses=self.loss(inputs, outputs),
+            losses=self.loss(inputs, outputs, loss_keys),
+            scalars=scalars,
             audios=audios,
         )
 
@@ -20,6 +20,8 @@ from sacred.utils import InvalidConfigError, MissingConfigError
 
 import padertorch as pt
 import padertorch.contrib.examples.source_separation.tasnet.model
+from padertorch.data.async_audio import AsyncAudioReader
+from padertorch.data.audio import AudioFile
 from padertorch.data.segment import Segmenter
 
 sacred.SETTINGS.CONFIG.READ_ONLY_CONFIG = False
@@ -197,13 +199,22 @@ def on_wsj0_2mix_max():
 
 @ex.capture
 def pre_batch_transform(inputs):
+    # The audio is read after the segmenter, that reads only the samples of
+    # the segments. One file per source, so the sources are read
+    # concurrently.
     return {
-        's': np.ascontiguousarray([
-            pb.io.load_audio(p)
-            for p in inputs['audio_path']['speech_source']
-        ], np.float32),
-        'y': np.ascontiguousarray(
-            pb.io.load_audio(inputs['audio_path']['observation']), np.float32),
+        's': {
+            str(i): AudioFile(
+                path, num_samples=inputs['num_samples'], num_channels=1,
+                dtype=np.float32,
+            )
+            for i, path in enumerate(inputs['audio_path']['speech_source'])
+        },
+        'y': AudioFile(
+            inputs['audio_path']['observation'],
+            num_samples=inputs['num_samples'], num_channels=1,
+            dtype=np.float32,
+        ),
         'num_samples': inputs['num_samples'],
         'example_id': inputs['example_id'],
         'audio_path': inputs['audio_path'],
@@ -224,11 +235,23 @@ def prepare_dataset(
 
     segmenter = Segmenter(
         chunk_size, include_keys=('y', 's'), axis=-1,
-        anchor='random' if shuffle else 'left',
+        anchor='random' if shuffle else 'left', lazy=True,
     )
 
+    audio_reader = AsyncAudioReader()
+
+    def _load_segments(segments):
+        # Reads the samples of the lazy segments. This has to happen before
+        # the prefetch, so the prefetch workers read the audio.
+        segments = audio_reader.read_segments(segments)
+        for segment in segments:
+            s = segment['s']
+            segment['s'] = np.stack([s[str(i)] for i in range(len(s))])
+        return segments
+
     def _set_num_samples(example):
-        example['num_samples'] = example['y'].shape[-1]
+        example['num_samples'] = \
+            example['segment_stop'] - example['segment_start']
         return example
 
     if shuffle:
@@ -236,6 +259,7 @@ def prepare_dataset(
 
     dataset = dataset.map(pre_batch_transform)
     dataset = dataset.map(segmenter)
+    dataset = dataset.map(_load_segments)
 
     # FilterExceptions are only raised inside the chunking code if the
     # example is too short. If chunk_size == -1, no filter exception is raised.
@@ -0,0 +1,104 @@
+"""
+Benchmark of the communication hooks in `padertorch.train.comm_hooks`.
+
+Spawns `num_processes` CPU processes with the gloo backend and reduces random
+gradients with the parameter shapes of a PIT BLSTM and a DPRNN model.
+Reports the communicated bytes and the time per step for each hook.
+
+Use the following command:
+
+    python benchmark_comm_hooks.py --num_processes=2 --steps=10
+
+Since gloo on a single machine has a fast "interconnect", the time per step
+mainly shows the overhead of the compression. The communicated bytes are
+independent of the hardware.
+"""
+import tempfile
+import time
+
+import torch
+import torch.multiprocessing
+
+from padertorch.contrib.examples.source_separation.pit.model import \
+    PermutationInvariantTrainingModel
+from padertorch.modules.dual_path_rnn import DPRNN
+from padertorch.train.comm_hooks import (
+    AllReduceHook,
+    CastCompressionHook,
+    PowerSGDHook,
+    TopKCompressionHook,
+)
+
+
+def get_models():
+    return {
+        'pit_blstm': PermutationInvariantTrainingModel(),
+        'dprnn': DPRNN(
+            input_size=64, rnn_size=128, window_length=100, hop_size=50,
+            num_blocks=6,
+        ),
+    }
+
+
+def get_comm_hooks():
+    return {
+        'all_reduce': AllReduceHook,
+        'float16': lambda: CastCompressionHook('float16'),
+        'bfloat16': lambda: CastCompressionHook('bfloat16'),
+        'power_sgd_rank_1': lambda: PowerSGDHook(rank=1),
+        'power_sgd_rank_4': lambda: PowerSGDHook(rank=4),
+        'top_k_1%': lambda: TopKCompressionHook(ratio=0.01),
+    }
+
+
+def _worker(rank, world_size, tmp_dir, steps, results):
+    import torch.distributed as dist
+    dist.init_process_group(
+        'gloo', init_method=f'file://{tmp_dir}/init',
+        rank=rank, world_size=world_size,
+    )
+    try:
+        torch.manual_seed(rank)
+        for model_name, model in get_models().items():
+            shapes = [p.shape for p in model.parameters()]
+            for hook_name, hook_factory in get_comm_hooks().items():
+                comm_hook = hook_factory()
+                # Warmup, e.g. the initialization of PowerSGD
+                comm_hook([torch.randn(s) for s in shapes])
+                comm_hook.bytes_communicated = 0
+
+                elapsed = 0
+                for _ in range(steps):
+                    grads = [torch.randn(s) for s in shapes]
+                    dist.barrier()
+                    start = time.perf_counter()
+                    comm_hook(grads)
+                    elapsed += time.perf_counter() - start
+                if rank == 0:
+                    results[(model_name, hook_name)] = (
+                        comm_hook.bytes_communicated / steps,
+                        elapsed / steps,
+                    )
+    finally:
+        dist.destroy_process_group()
+
+
+def main(num_processes=2, steps=10):
+    results = torch.multiprocessing.Manager().dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        torch.multiprocessing.spawn(
+            _worker, args=(num_processes, tmp_dir, steps, results),
+            nprocs=num_processes,
+        )
+
+    print(f'{"model":<12} {"comm_hook":<18} {"MB/step":>10} '
+          f'{"ratio":>8} {"ms/step":>10}')
+    for (model_name, hook_name), (num_bytes, seconds) in results.items():
+        reference, _ = results[(model_name, 'all_reduce')]
+        print(f'{model_name:<12} {hook_name:<18} {num_bytes / 1e6:>10.2f} '
+              f'{reference / num_bytes:>8.1f} {seconds * 1e3:>10.1f}')
+
+
+if __name__ == '__main__':
+    import fire
+    fire.Fire(main)
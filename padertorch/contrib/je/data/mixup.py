@@ -15,9 +15,12 @@ class MixUpDataset(Dataset):
         Args:
             input_dataset: lazy dataset providing example dict with key audio_length.
             sample_fn: sample_fn(buffer) returning a list of examples from buffer for mixup.
+
+        For a mixup without CPU load in the data workers see
+        `padertorch.contrib.je.modules.augment.SuperposeEvents`, which mixes
+        the examples of a batch on the training device.
         """
         self.input_dataset = input_dataset
-        self.buffer = []
         self.buffer_size = buffer_size
         self.sample_fn = sample_fn
         self.mixup_fn = mixup_fn
@@ -26,19 +29,28 @@ class MixUpDataset(Dataset):
         return len(self.input_dataset)
 
     def __iter__(self):
+        # Ring buffer: sample_fn indexes the buffer randomly, which is O(n)
+        # for a deque. The new example is temporarily appended, so it is
+        # buffer[-1] for sample_fn, and then replaces the oldest example.
+        buffer = []
+        write_index = 0
         for example in self.input_dataset:
-            self.buffer.append(example)
-            if len(self.buffer) > self.buffer_size:
-                examples = self.sample_fn(self.buffer)
-                if len(examples) == 1:
-                    yield examples[0]
-                elif len(examples) > 1:
-                    yield self.mixup_fn(examples)
-                else:
-                    raise ValueError('sample_fn has to return at least one example')
-                self.buffer.pop(0)
-            else:
+            if len(buffer) < self.buffer_size:
+                buffer.append(example)
                 yield example
+                continue
+            buffer.append(example)
+            examples = self.sample_fn(buffer)
+            buffer.pop()
+            if len(examples) == 1:
+                yield examples[0]
+            elif len(examples) > 1:
+                yield self.mixup_fn(examples)
+            else:
+                raise ValueError('sample_fn has to return at least one example')
+            if self.buffer_size > 0:
+                buffer[write_index] = example
+                write_index = (write_index + 1) % self.buffer_size
 
     def copy(self, freeze=False):
         return self.__class__(
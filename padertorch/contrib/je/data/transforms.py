@@ -6,9 +6,14 @@ import dataclasses
 import numpy as np
 import samplerate
 import soundfile
+import torch
 from paderbox.transform.module_fbank import MelTransform as BaseMelTransform
 from paderbox.transform.module_stft import STFT as BaseSTFT
 from paderbox.utils.nested import nested_op
+from padertorch.data.statistics import (
+    cached_statistics, dataset_fingerprint, map_reduce
+)
+from padertorch.ops import resample
 from padertorch.utils import to_list
 from tqdm import tqdm
 from collections import defaultdict
@@ -32,10 +37,30 @@ class AudioReader:
     storage_dir: str = None
     preemphasis_factor: float = 0.
     alignment_keys: list = None
+    audio_cache: object = None  # padertorch.data.audio_cache.AudioCache
+    resampler: str = 'samplerate'  # samplerate, torch
 
     def __post_init__(self):
         self.norm = None
 
+    def _read(self, filepath, start_sample, stop_sample):
+        if self.audio_cache is None:
+            x, sr = soundfile.read(
+                filepath, start=start_sample, stop=stop_sample, always_2d=True
+            )
+            return x.T, sr
+        # Decode the whole file once, e.g. for mixup, where a file is used
+        # in many mixtures.
+        x = self.audio_cache.get_or_load(
+            ('AudioReader', filepath),
+            lambda: soundfile.read(filepath, always_2d=True)[0].T,
+            item=(slice(None), slice(start_sample, stop_sample)),
+        )
+        sr = self.source_sample_rate
+        if sr is None:
+            sr = soundfile.info(filepath).samplerate
+        return x, sr
+
     def _load_source(self, filepath, start_sample=0, stop_sample=None):
         if isinstance(filepath, (list, tuple)):
             assert self.concat_axis is not None
@@ -56,19 +81,27 @@ class AudioReader:
             return np.concatenate(audio, axis=self.concat_axis), sr[0]
 
         filepath = str(filepath)
-        x, sr = soundfile.read(
-            filepath, start=start_sample, stop=stop_sample, always_2d=True
-        )
+        x, sr = self._read(filepath, start_sample, stop_sample)
         if self.source_sample_rate is not None:
             assert sr == self.source_sample_rate, (self.source_sample_rate, sr)
-        return x.T, sr
+        return x, sr
 
     def load(self, filepath, start_sample=0, stop_sample=None):
         x, sr = self._load_source(filepath, start_sample, stop_sample)
         if self.target_sample_rate != sr:
-            x = samplerate.resample(
-                x.T, self.target_sample_rate / sr, "sinc_fastest"
-            ).T
+            if self.resampler == 'samplerate':
+                x = samplerate.resample(
+                    x.T, self.target_sample_rate / sr, "sinc_fastest"
+                ).T
+            elif self.resampler == 'torch':
+                # The resampling can also be moved to the model, i.e. applied
+                # on the padded batch on the GPU, with
+                # `padertorch.ops.resample`.
+                x = resample(
+                    torch.from_numpy(x), sr, self.target_sample_rate
+                ).numpy()
+            else:
+                raise ValueError(f'Invalid resampler {self.resampler}')
         return x
 
     def _prenormalize(self, audio):
@@ -113,55 +146,100 @@ class AudioReader:
         else:
             raise ValueError(f'Invalid normalization {self.normalization_type}')
 
-    def initialize_norm(self, dataset=None):
+    def _accumulate_norm(self, dataset):
+        # Partial statistics of a shard of the dataset, see initialize_norm
+        norm = {}
+        count = defaultdict(lambda: 0)
+        for example in tqdm(dataset):
+            dataset_name = example['dataset']
+            assert dataset_name != 'global_norm'
+            audio_path = example["audio_path"]
+            start_samples = example.get("audio_start_samples", 0)
+            stop_samples = example.get("audio_stop_samples", None)
+            audio = self.load(audio_path, start_samples, stop_samples)
+            audio = self._prenormalize(audio)
+            audio_norm = self._get_audio_norm(audio)
+            n_samples = audio.shape[-1] if self.channelwise_norm else np.prod(audio.shape)
+            for key in [dataset_name, 'global_norm']:
+                if self.normalization_type == "power":
+                    # Sum of the power, normalized in initialize_norm
+                    norm[key] = norm.get(key, 0) + n_samples * audio_norm**2
+                elif self.normalization_type == "max":
+                    norm[key] = np.maximum(norm.get(key, 0), audio_norm)
+                count[key] += n_samples
+        return norm, dict(count)
+
+    def _merge_norm(self, a, b):
+        norm, count = dict(a[0]), dict(a[1])
+        for key in b[0]:
+            if key not in norm:
+                norm[key], count[key] = b[0][key], b[1][key]
+            elif self.normalization_type == "power":
+                norm[key] = norm[key] + b[0][key]
+                count[key] += b[1][key]
+            elif self.normalization_type == "max":
+                norm[key] = np.maximum(norm[key], b[0][key])
+                count[key] += b[1][key]
+        return norm, count
+
+    def initialize_norm(
+            self, dataset=None, dataset_name=None, num_workers=None,
+    ):
+        """
+        Computes the norms for the normalization domains 'dataset' and
+        'global'. The examples are processed as a map-reduce over
+        `num_workers` processes (default: number of CPUs) and the result is
+        saved in the storage dir with the hash of the config of the reader
+        and the `dataset_name` (the example ids, if the dataset has no
+        name), so a restart or a training with the same config reuses the
+        norm. The `audio_norm.json` of storage dirs of older versions is
+        restored as before.
+        """
         if self.normalization_domain is None \
                 or self.normalization_domain == 'instance' \
                 or self.normalization_type is None:
             print('No audio norm initialization required')
             return
-        filepath = None if self.storage_dir is None \
-            else Path(self.storage_dir) / f"audio_norm.json"
-        if filepath is not None and Path(filepath).exists():
-            with filepath.open() as fid:
-                self.norm = {
-                    key: np.array(norm) for key, norm in json.load(fid).items()
-                }
-            print(f'Restored audio norm from {filepath}')
-        else:
+
+        def compute_norm():
             print(f'Initialize audio norm')
             assert dataset is not None
-            count = 0
-            for example in tqdm(dataset):
-                dataset_name = example['dataset']
-                assert dataset_name != 'global_norm'
-                audio_path = example["audio_path"]
-                start_samples = example.get("audio_start_samples", 0)
-                stop_samples = example.get("audio_stop_samples", None)
-                audio = self.load(audio_path, start_samples, stop_samples)
-                audio = self._prenormalize(audio)
-                audio_norm = self._get_audio_norm(audio)
-                n_samples = audio.shape[-1] if self.channelwise_norm else np.prod(audio.shape)
-                if count == 0:
-                    self.norm = defaultdict(lambda: np.zeros_like(audio_norm))
-                    count = defaultdict(lambda: 0)
-                for key in [dataset_name, 'global_norm']:
-                    if self.normalization_type == "power":
-                        self.norm[key] *= count[key] / (count[key] + n_samples)
-                        self.norm[key] += n_samples / (count[key] + n_samples) * audio_norm**2
-                    elif self.normalization_type == "max":
-                        self.norm[key] = np.maximum(self.norm[key], audio_norm)
-                    count[key] += n_samples
+            norm, count = map_reduce(
+                dataset, self._accumulate_norm, self._merge_norm,
+                num_workers=num_workers,
+            )
             if self.normalization_type == "power":
-                self.norm = {key: np.sqrt(power) for key, power in self.norm.items()}
-            elif self.normalization_type == "max":
-                self.norm = {key: norm for key, norm in self.norm.items()}
-            if filepath is not None:
-                with filepath.open('w') as fid:
-                    json.dump(
-                        {key: norm.tolist() for key, norm in self.norm.items()},
-                        fid, sort_keys=True, indent=4
-                    )
-                print(f'Saved audio norm to {filepath}')
+                norm = {
+                    key: np.sqrt(power / count[key])
+                    for key, power in norm.items()
+                }
+            return {key: np.asarray(n).tolist() for key, n in norm.items()}
+
+        config = {
+            field: getattr(self, field) for field in [
+                'source_sample_rate', 'target_sample_rate', 'concat_axis',
+                'average_channels', 'normalization_type',
+                'normalization_domain', 'channelwise_norm',
+                'preemphasis_factor', 'resampler',
+            ]
+        }
+        config['dataset_name'] = dataset_name
+        if dataset_name is None and dataset is not None:
+            config['dataset_fingerprint'] = dataset_fingerprint(dataset)
+        legacy_filepath = None if self.storage_dir is None \
+            else Path(self.storage_dir) / 'audio_norm.json'
+        if legacy_filepath is not None and legacy_filepath.exists():
+            # Storage dirs of older versions contain the norm without the
+            # config hash in the file name.
+            with legacy_filepath.open() as fid:
+                norm = json.load(fid)
+            print(f'Restored audio norm from {legacy_filepath}')
+        else:
+            norm = cached_statistics(
+                self.storage_dir, 'audio_norm', config, compute_norm,
+                verbose=True,
+            )
+        self.norm = {key: np.array(n) for key, n in norm.items()}
 
     def add_start_stop_samples(self, example):
         if self.alignment_keys is not None:
@@ -432,33 +510,57 @@ class LabelEncoder:
             example[self.label_key] = y
         return example
 
+    def _collect_labels(self, dataset):
+        labels = set()
+        for example in dataset:
+            labels.update(to_list(example[self.label_key]))
+        return labels
+
     def initialize_labels(
-            self, labels=None, dataset=None, dataset_name=None, verbose=False
+            self, labels=None, dataset=None, dataset_name=None, verbose=False,
+            num_workers=None,
     ):
+        """
+        Initializes the label mapping from `labels` or from the labels of
+        the examples in `dataset`, that are collected as a map-reduce over
+        `num_workers` processes (default: number of CPUs). The labels are
+        saved in the storage dir with the hash of the `label_key` and the
+        `dataset_name` (the example ids, if the dataset has no name). The
+        label files of storage dirs of older versions are restored as
+        before.
+        """
         filename = f"{self.label_key}.json" if dataset_name is None \
             else f"{self.label_key}_{dataset_name}.json"
-        filepath = None if self.storage_dir is None \
+        legacy_filepath = None if self.storage_dir is None \
             else (Path(self.storage_dir) / filename).expanduser().absolute()
 
-        if filepath and Path(filepath).exists():
-            with filepath.open() as fid:
+        if legacy_filepath and legacy_filepath.exists():
+            with legacy_filepath.open() as fid:
                 labels_ = json.load(fid)
             if verbose:
-                print(f'Restored labels from {filepath}')
-            if labels is not None:
-                assert labels_ == labels
-            labels = labels_
+                print(f'Restored labels from {legacy_filepath}')
         else:
-            if labels is None:
-                labels = set()
-                for example in dataset:
-                    labels.update(to_list(example[self.label_key]))
-                labels = sorted(labels)
-            if filepath:
-                with filepath.open('w') as fid:
-                    json.dump(labels, fid, indent=4)
-                if verbose:
-                    print(f'Saved labels to {filepath}')
+            def collect_labels():
+                if labels is not None:
+                    return labels
+                # The label sets of the shards are merged
+                return sorted(map_reduce(
+                    dataset, self._collect_labels, set.union,
+                    num_workers=num_workers,
+                ))
+
+            config = {
+                'label_key': self.label_key, 'dataset_name': dataset_name,
+            }
+            if dataset_name is None and dataset is not None:
+                config['dataset_fingerprint'] = dataset_fingerprint(dataset)
+            labels_ = cached_statistics(
+                self.storage_dir, self.label_key, config, collect_labels,
+                verbose=verbose,
+            )
+        if labels is not None:
+            assert labels_ == labels, (labels_, labels)
+        labels = labels_
 
         self.label_mapping = {
             label: i for i, label in enumerate(labels)
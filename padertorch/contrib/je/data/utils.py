@@ -1,7 +1,14 @@
+import bisect
+import logging
+
 import numpy as np
-from lazy_dataset.core import DynamicTimeSeriesBucket
+from lazy_dataset.core import (
+    DynamicTimeSeriesBucket, DynamicBucketDataset, _ItemsNotDefined
+)
 from padertorch.utils import to_list
 
+LOG = logging.getLogger('lazy_dataset')
+
 
 class DynamicExtendedTimeSeriesBucket(DynamicTimeSeriesBucket):
     def __init__(
@@ -92,6 +99,134 @@ class DynamicExtendedTimeSeriesBucket(DynamicTimeSeriesBucket):
         return to_list(labels)
 
 
+class IndexedDynamicBucketDataset(DynamicBucketDataset):
+    """
+    Faster drop-in replacement of `lazy_dataset.core.DynamicBucketDataset`
+    for `DynamicTimeSeriesBucket` and its subclasses (e.g.
+    `DynamicExtendedTimeSeriesBucket`), that yields identical batches.
+
+    `DynamicBucketDataset` tries to append each example to every open bucket
+    until one accepts it, which is O(B) bucket assessments in python for B
+    open buckets. Here, the open buckets are indexed by their lower length
+    bound in a sorted list. A bucket can only accept an example of length L,
+    if its lower bound is in [L * (1 - max_padding_rate) ** 2, L], so only
+    the buckets in this range are found by bisection (O(log B)) and assessed
+    in the order of their creation. Expiration and `max_buffered_examples`
+    only look at the oldest bucket.
+
+    >>> examples = [1, 10, 5, 7, 8, 2, 4]
+    >>> batch_dataset = IndexedDynamicBucketDataset(\
+        examples, DynamicTimeSeriesBucket, batch_size=2, len_key=lambda x: x, max_padding_rate=0.5)
+    >>> [batch for batch in batch_dataset]
+    [[10, 5], [7, 8], [1, 2], [4]]
+    >>> batch_dataset = IndexedDynamicBucketDataset(\
+    examples, DynamicTimeSeriesBucket, batch_size=2, len_key=lambda x: x, max_padding_rate=0.2)
+    >>> [batch for batch in batch_dataset]
+    [[10, 8], [5, 4], [1], [7], [2]]
+    >>> batch_dataset = IndexedDynamicBucketDataset(\
+    examples, DynamicTimeSeriesBucket, expiration=4, batch_size=2, len_key=lambda x: x, max_padding_rate=0.2)
+    >>> [batch for batch in batch_dataset]
+    [[10, 8], [1], [5, 4], [7], [2]]
+    >>> batch_dataset = IndexedDynamicBucketDataset(\
+    examples, DynamicTimeSeriesBucket, max_buffered_examples=3, batch_size=2, len_key=lambda x: x, max_padding_rate=0.2)
+    >>> [batch for batch in batch_dataset]
+    [[1], [10, 8], [5, 4], [7], [2]]
+    """
+    def __init__(self, input_dataset, bucket_cls, **kwargs):
+        assert issubclass(bucket_cls, DynamicTimeSeriesBucket), bucket_cls
+        super().__init__(input_dataset, bucket_cls, **kwargs)
+        len_key = self.bucket_kwargs['len_key']
+        self.len_key = len_key if callable(len_key) else (lambda x: x[len_key])
+        # A bucket has upper_bound <= lower_bound / (1 - max_padding_rate)**2
+        self.window = (1 - self.bucket_kwargs['max_padding_rate']) ** 2
+
+    def _emit(self, bucket):
+        data = bucket.data
+        if self.sort_key is not None:
+            data = sorted(data, key=self.sort_key, reverse=self.reverse_sort)
+        return data
+
+    def __iter__(self, with_key=False):
+        if with_key:
+            raise _ItemsNotDefined(self.__class__.__name__)
+        # Open buckets by creation index, i.e. in the order of their creation
+        buckets = {}
+        # Sorted (lower_bound, creation index) of the open buckets
+        index = []
+        dropped_count = 0
+        total_count = 0
+        buffered_count = 0
+
+        def remove(creation_idx):
+            bucket = buckets.pop(creation_idx)
+            key = (bucket.lower_bound, creation_idx)
+            del index[bisect.bisect_left(index, key)]
+            return bucket
+
+        for i, example in enumerate(self.input_dataset):
+            total_count += 1
+            seq_len = self.len_key(example)
+            # Small tolerance for the rounding of the bounds
+            lo = bisect.bisect_left(index, (seq_len * self.window * (1 - 1e-9),))
+            hi = bisect.bisect_right(index, (seq_len * (1 + 1e-9), i))
+            candidates = sorted(
+                creation_idx for _, creation_idx in index[lo:hi]
+                if buckets[creation_idx].upper_bound >= seq_len
+            )
+            bucket = None
+            for creation_idx in candidates:
+                bucket_j = buckets[creation_idx]
+                lower_bound = bucket_j.lower_bound
+                if bucket_j.maybe_append(example):
+                    bucket = bucket_j
+                    if bucket.lower_bound != lower_bound:
+                        del index[bisect.bisect_left(
+                            index, (lower_bound, creation_idx))]
+                        bisect.insort(
+                            index, (bucket.lower_bound, creation_idx))
+                    break
+            if bucket is None:
+                creation_idx = i
+                bucket = self.bucket_cls(example, **self.bucket_kwargs)
+                buckets[creation_idx] = bucket
+                bisect.insort(index, (bucket.lower_bound, creation_idx))
+            buffered_count += 1
+
+            if bucket.is_completed():
+                remove(creation_idx)
+                data = self._emit(bucket)
+                yield data
+                buffered_count -= len(data)
+
+            if self.expiration is not None and buckets:
+                # The oldest bucket expires first
+                creation_idx = next(iter(buckets))
+                if (i - creation_idx) >= self.expiration:
+                    bucket = remove(creation_idx)
+                    if not self.drop_incomplete:
+                        yield self._emit(bucket)
+                    else:
+                        dropped_count += len(bucket.data)
+                    buffered_count -= len(bucket.data)
+
+            if self.max_buffered_examples is not None:
+                while buffered_count > self.max_buffered_examples:
+                    bucket = remove(next(iter(buckets)))
+                    if not self.drop_incomplete:
+                        yield self._emit(bucket)
+                    else:
+                        dropped_count += len(bucket.data)
+                    buffered_count -= len(bucket.data)
+
+        for bucket in buckets.values():
+            if not self.drop_incomplete:
+                yield self._emit(bucket)
+            else:
+                dropped_count += len(bucket.data)
+        if dropped_count > 0:
+            LOG.info(f'{self.__class__.__name__} dropped {dropped_count} of {total_count} examples.')
+
+
 def split_dataset(dataset, fold, nfolds=5, seed=0):
     """
 
@@ -155,6 +155,380 @@ class Mixup(nn.Module):
         return x, seq_len, targets
 
 
+class SuperposeEvents(nn.Module):
+    """
+    Batched version of `padertorch.contrib.je.data.mixup.SuperposeEvents`,
+    that is applied on the (training) device after the collation: Each
+    example is superposed with up to `len(superposition_probs) - 1` other
+    examples of the same batch, that are randomly scaled and shifted in time.
+    The batch keeps its shape, i.e. shifted components are cut at the end of
+    the padded sequence axis. Multi-hot targets (batch, events) are combined
+    by max and alignment targets (batch, events, time) are shifted as well.
+
+    Note that the superposition assumes a linear representation, e.g.
+    audio or the STFT, not log features.
+
+    >>> x = torch.zeros((4, 1, 6, 3))
+    >>> for i, length in enumerate([6, 5, 4, 3]):
+    ...     x[i, :, :length] = i + 1
+    >>> targets = torch.eye(4)
+    >>> superpose = SuperposeEvents((0., 1.), min_overlap=1., sequence_axis=2, seed=0)
+    >>> x, seq_len, targets = superpose(x, seq_len=[6, 5, 4, 3], targets=targets)
+    >>> x[:, 0, :, 0]
+    tensor([[1., 4., 4., 4., 4., 1.],
+            [3., 3., 3., 3., 3., 1.],
+            [3., 7., 7., 7., 0., 0.],
+            [7., 7., 7., 0., 0., 0.]])
+    >>> seq_len
+    array([6, 6, 4, 3])
+    >>> targets
+    tensor([[1., 0., 1., 0.],
+            [1., 1., 0., 0.],
+            [0., 0., 1., 1.],
+            [0., 0., 1., 1.]])
+    """
+    def __init__(
+            self, superposition_probs, min_overlap=1., max_gain_db=0.,
+            sequence_axis=-1, seed=None,
+    ):
+        """
+
+        Args:
+            superposition_probs: Probabilities of superposing 0, 1, 2, ...
+                other examples (see `SampleMixupComponents`).
+            min_overlap: Minimal overlap of an added component relative to
+                its length.
+            max_gain_db: Added components are scaled by a gain drawn
+                uniformly from [-max_gain_db, max_gain_db] dB.
+            sequence_axis: Time axis of the signal.
+            seed: Seed of the random generator. If None, the global torch
+                random state is used.
+        """
+        super().__init__()
+        assert np.isclose(np.sum(superposition_probs), 1.), superposition_probs
+        self.superposition_probs = superposition_probs
+        self.min_overlap = min_overlap
+        self.max_gain_db = max_gain_db
+        self.sequence_axis = sequence_axis
+        if seed is None:
+            self.generator = None
+        else:
+            self.generator = torch.Generator().manual_seed(seed)
+
+    def _shift(self, x, shifts, scales):
+        # Moves x[b, ..., t] to t + shifts[b] and scales it with scales[b, t]
+        T = x.shape[-1]
+        idx = torch.arange(T)[None] - shifts[:, None]
+        valid = (idx >= 0) & (idx < T)
+        idx = idx.clamp(0, T - 1).to(x.device)
+        scales = (scales * valid).to(x.device, x.dtype)
+        view = (x.shape[0],) + (x.dim() - 2) * (1,) + (T,)
+        x = x.gather(-1, idx.view(view).expand(x.shape))
+        return x * scales.view(view)
+
+    def forward(self, x, seq_len=None, targets=None):
+        if not self.training:
+            return x, seq_len, targets
+        B = x.shape[0]
+        sequence_axis = self.sequence_axis % x.dim()
+        T = x.shape[sequence_axis]
+        if seq_len is None:
+            lengths = torch.full((B,), T, dtype=torch.long)
+        else:
+            lengths = torch.as_tensor(np.asarray(seq_len), dtype=torch.long)
+        g = self.generator
+
+        num_components = torch.multinomial(
+            torch.tensor(self.superposition_probs, dtype=torch.float64),
+            B, replacement=True, generator=g,
+        ).clamp(max=B - 1)
+        # Distinct random partners of each example
+        partners = torch.rand(B, B, generator=g)
+        partners[torch.arange(B), torch.arange(B)] = 2.
+        partners = partners.argsort(dim=-1)
+
+        x = x.movedim(sequence_axis, -1)
+        x_mix = x
+        new_lengths = lengths
+        if targets is not None:
+            assert ((targets == 0.) | (targets == 1.)).all(), \
+                'Targets must be multi-hot encoded'
+            assert targets.dim() == 2 or targets.shape[-1] == T, \
+                (targets.shape, T)
+            targets_mix = targets
+        for k in range(int(num_components.max()) if B > 1 else 0):
+            active = num_components > k
+            partner = partners[:, k]
+            partner_lengths = lengths[partner]
+            min_start = -torch.floor(partner_lengths * (1 - self.min_overlap))
+            max_start = lengths - torch.ceil(partner_lengths * self.min_overlap)
+            min_start, max_start = (
+                torch.min(min_start, max_start), torch.max(min_start, max_start)
+            )
+            starts = (
+                min_start + torch.floor(
+                    torch.rand(B, generator=g) * (max_start - min_start + 1))
+            ).long()
+            gains = 10 ** (
+                (2 * torch.rand(B, generator=g) - 1) * self.max_gain_db / 20)
+            scales = (active * gains)[:, None].expand(B, T)
+            scales = scales * (
+                torch.arange(T)[None] < (starts + partner_lengths)[:, None])
+            x_mix = x_mix + self._shift(x[partner], starts, scales)
+            new_lengths = torch.where(
+                active,
+                torch.clamp(
+                    torch.max(new_lengths, starts + partner_lengths), max=T),
+                new_lengths,
+            )
+            if targets is not None:
+                partner_targets = targets[partner]
+                if targets.dim() == 2:
+                    partner_targets = partner_targets * active[:, None].to(
+                        targets.device, targets.dtype)
+                else:
+                    partner_targets = self._shift(
+                        partner_targets, starts, scales > 0)
+                targets_mix = torch.max(targets_mix, partner_targets)
+        x = x_mix.movedim(-1, sequence_axis)
+        if targets is not None:
+            targets = targets_mix
+        if isinstance(seq_len, torch.Tensor):
+            seq_len = new_lengths.to(seq_len.device)
+        elif seq_len is not None:
+            seq_len = new_lengths.numpy()
+        return x, seq_len, targets
+
+
+def piecewise_linear_time_warping(seq_len, warp_factors, segment_length=None):
+    """
+    Time indices of a piecewise linear time warping, which is the batched
+    counterpart of the segment wise STFT shifts of
+    `padertorch.contrib.je.data.transforms.AugmentedSTFT`: Each sequence is
+    split into segments of equal length (at most `segment_length`) and the
+    k-th segment of the b-th sequence is stretched by `warp_factors[b, k]`.
+
+    Args:
+        seq_len: sequence lengths (batch,)
+        warp_factors: stretch factors (batch, segments), where segments has
+            to be at least the maximum number of segments of a sequence.
+        segment_length: maximum segment length. If None, each sequence is a
+            single segment.
+
+    Returns:
+        time_indices: fractional indices into the input sequences
+            (batch, max(new_seq_len))
+        new_seq_len: sequence lengths after the warping
+
+    >>> time_indices, seq_len = piecewise_linear_time_warping(
+    ...     [4, 3], np.array([[2., .5], [.5, 1.]]), segment_length=2)
+    >>> time_indices
+    array([[0. , 0.5, 1. , 1.5, 2. ],
+           [0. , 2. , 3. , 3. , 3. ]])
+    >>> seq_len
+    array([5, 2])
+    """
+    seq_len = np.asarray(seq_len, dtype=np.int64)
+    batch_size = len(seq_len)
+    if segment_length is None:
+        n_segments = np.ones_like(seq_len)
+    else:
+        n_segments = np.maximum(np.ceil(seq_len / segment_length), 1)
+    segment_lengths = np.ceil(seq_len / n_segments)
+    max_segments = int(n_segments.max())
+    warp_factors = np.asarray(warp_factors, dtype=np.float64)
+    assert warp_factors.shape[-1] >= max_segments, (
+        warp_factors.shape, max_segments)
+    warp_factors = warp_factors[:, :max_segments]
+
+    onsets = np.arange(max_segments) * segment_lengths[:, None]
+    in_lengths = np.clip(
+        seq_len[:, None] - onsets, 0, segment_lengths[:, None])
+    out_lengths = np.round(in_lengths * warp_factors).astype(np.int64)
+    out_stops = np.cumsum(out_lengths, axis=1)
+    out_onsets = out_stops - out_lengths
+    new_seq_len = out_stops[:, -1]
+
+    t = np.arange(max(new_seq_len.max(), 1))
+    # Segment of each output frame
+    k = np.minimum(
+        (out_stops[:, None, :] <= t[None, :, None]).sum(-1), max_segments - 1)
+    b = np.arange(batch_size)[:, None]
+    time_indices = np.minimum(
+        onsets[b, k] + (t - out_onsets[b, k]) / warp_factors[b, k],
+        seq_len[:, None] - 1,
+    )
+    # Continue into the padding behind the warped sequences
+    time_indices = np.where(
+        t >= new_seq_len[:, None],
+        seq_len[:, None] + t - new_seq_len[:, None],
+        time_indices,
+    )
+    time_indices = np.clip(time_indices, 0, max(seq_len.max() - 1, 0))
+    return time_indices, new_seq_len
+
+
+class AugmentedSTFT(nn.Module):
+    """
+    Batched version of `padertorch.contrib.je.data.transforms.AugmentedSTFT`,
+    that is applied on collated STFTs (e.g. on the training device) instead
+    of each example in the data workers:
+     - roll: Each sequence is circularly rolled (within its length) with
+       probability `roll_prob` by a random number of frames.
+     - warp: With probability `warp_prob`, the sequence is split into
+       segments of at most `warp_segment_length` frames and each segment is
+       stretched by a factor from `warp_factor_sampling_fn`.
+     - scale: Each example is scaled by `scale_sample_fn()`.
+
+    The data transform warps by computing the STFT of each segment with a
+    different shift. Here, the frames are interpolated. The magnitude is
+    interpolated linearly and the phase is taken from the nearest frame, so
+    that the power is not reduced by the interpolation of the real and
+    imaginary parts. Alignment targets (batch, events, time) are rolled and
+    warped (nearest frame) as well, multi-hot targets (batch, events) are
+    not changed.
+
+    >>> x = torch.randn((3, 1, 20, 5, 2))
+    >>> targets = (torch.rand((3, 4, 20)) > .5).float()
+    >>> augment = AugmentedSTFT(
+    ...     warp_factor_sampling_fn=lambda n: np.random.choice([.5, 2.], n),
+    ...     warp_segment_length=8, roll_prob=1.)
+    >>> x, seq_len, targets = augment(x, seq_len=[20, 16, 10], targets=targets)
+    >>> x.shape[2] == targets.shape[-1] == int(seq_len.max())
+    True
+    """
+    def __init__(
+            self,
+            warp_prob=1.,
+            warp_factor_sampling_fn=None,
+            warp_segment_length=None,
+            scale_sample_fn=None,
+            roll_prob=0.,
+            sequence_axis=2,
+            real_imag_axis=-1,
+    ):
+        """
+
+        Args:
+            warp_prob: Probability of warping an example.
+            warp_factor_sampling_fn: Returns n random stretch factors given n.
+                If None, no warping is applied.
+            warp_segment_length: Maximal segment length in frames.
+            scale_sample_fn: Returns a random scale. If None, no scaling is
+                applied.
+            roll_prob: Probability of rolling an example.
+            sequence_axis: Time axis of the STFT.
+            real_imag_axis: Axis of the real and imaginary part of the STFT.
+                If None, the input is real valued and linearly interpolated.
+        """
+        super().__init__()
+        self.warp_prob = warp_prob
+        self.warp_factor_sampling_fn = warp_factor_sampling_fn
+        self.warp_segment_length = warp_segment_length
+        self.scale_sample_fn = scale_sample_fn
+        self.roll_prob = roll_prob
+        self.sequence_axis = sequence_axis
+        self.real_imag_axis = real_imag_axis
+
+    @staticmethod
+    def _gather(x, time_indices):
+        # x: (batch, time, ...), time_indices: (batch, new_time)
+        batch_indices = torch.arange(x.shape[0], device=x.device)[:, None]
+        time_indices = torch.as_tensor(time_indices, device=x.device)
+        return x[batch_indices, time_indices]
+
+    def _interpolate(self, x, time_indices):
+        floor = np.floor(time_indices).astype(np.int64)
+        ceil = np.minimum(floor + 1, x.shape[1] - 1)
+        weights = torch.as_tensor(
+            time_indices - floor, dtype=x.dtype, device=x.device
+        )[(...,) + (x.dim() - 2) * (None,)]
+        x_floor = self._gather(x, floor)
+        x_ceil = self._gather(x, ceil)
+        if self.real_imag_axis is None:
+            return (1 - weights) * x_floor + weights * x_ceil
+        axis = self.real_imag_axis % x.dim()
+        norm_floor = x_floor.norm(dim=axis, keepdim=True)
+        norm_ceil = x_ceil.norm(dim=axis, keepdim=True)
+        magnitude = (1 - weights) * norm_floor + weights * norm_ceil
+        nearest = weights >= .5
+        phase = torch.where(nearest, x_ceil, x_floor) / torch.where(
+            nearest, norm_ceil, norm_floor).clamp_min(1e-12)
+        return magnitude * phase
+
+    def forward(self, x, seq_len=None, targets=None):
+        if not self.training:
+            return x, seq_len, targets
+        B = x.shape[0]
+        sequence_axis = self.sequence_axis % x.dim()
+        T = x.shape[sequence_axis]
+        if seq_len is None:
+            lengths = np.full(B, T)
+        elif isinstance(seq_len, torch.Tensor):
+            lengths = seq_len.cpu().numpy().astype(np.int64)
+        else:
+            lengths = np.asarray(seq_len, dtype=np.int64)
+        x = x.movedim(sequence_axis, 1)
+        alignment = targets is not None and targets.dim() > 2
+        if alignment:
+            assert targets.shape[-1] == T, (targets.shape, T)
+            targets = targets.movedim(-1, 1)
+
+        if self.roll_prob > 0:
+            n_roll = (
+                (np.random.rand(B) * lengths).astype(np.int64)
+                * (np.random.rand(B) < self.roll_prob)
+            )
+            t = np.arange(T)
+            time_indices = np.where(
+                t < lengths[:, None],
+                (t - n_roll[:, None]) % np.maximum(lengths[:, None], 1),
+                t,
+            )
+            x = self._gather(x, time_indices)
+            if alignment:
+                targets = self._gather(targets, time_indices)
+
+        if self.warp_factor_sampling_fn is not None:
+            if self.warp_segment_length is None:
+                n_segments = 1
+            else:
+                n_segments = max(
+                    int(np.ceil(lengths.max() / self.warp_segment_length)), 1)
+            warp_factors = np.reshape(
+                self.warp_factor_sampling_fn(B * n_segments), (B, n_segments))
+            warp_factors = np.where(
+                np.random.rand(B, 1) < self.warp_prob, warp_factors, 1.)
+            time_indices, lengths = piecewise_linear_time_warping(
+                lengths, warp_factors, self.warp_segment_length)
+            x = self._interpolate(x, time_indices)
+            if alignment:
+                targets = self._gather(
+                    targets, np.round(time_indices).astype(np.int64))
+            # Zero padding behind the warped sequences, as the collate of
+            # the data transform does.
+            mask = torch.as_tensor(
+                np.arange(x.shape[1]) < lengths[:, None], device=x.device)
+            x = x * mask[(...,) + (x.dim() - 2) * (None,)].to(x.dtype)
+            if alignment:
+                targets = targets * mask[
+                    (...,) + (targets.dim() - 2) * (None,)].to(targets.dtype)
+
+        if self.scale_sample_fn is not None:
+            scales = np.array([self.scale_sample_fn() for _ in range(B)])
+            x = x * torch.as_tensor(scales, dtype=x.dtype, device=x.device)[
+                (...,) + (x.dim() - 1) * (None,)]
+
+        x = x.movedim(1, sequence_axis)
+        if alignment:
+            targets = targets.movedim(1, -1)
+        if isinstance(seq_len, torch.Tensor):
+            seq_len = torch.as_tensor(lengths, device=seq_len.device)
+        elif seq_len is not None:
+            seq_len = lengths
+        return x, seq_len, targets
+
+
 class Mask(nn.Module):
     """
     >>> x = torch.ones((3, 4, 5))
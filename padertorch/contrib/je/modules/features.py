@@ -6,7 +6,7 @@ from paderbox.transform.module_fbank import get_fbanks
 from paderbox.utils.random_utils import TruncatedExponential
 from padertorch.base import Module
 from padertorch.contrib.je.modules.augment import (
-    TimeWarping, GaussianBlur2d, Mixup, Mask, AdditiveNoise,
+    TimeWarping, GaussianBlur2d, Mixup, Mask, AdditiveNoise, SuperposeEvents,
 )
 from padertorch.modules.normalization import Normalization, InputNormalization
 from torch import nn
@@ -30,6 +30,8 @@ class NormalizedLogMelExtractor(nn.Module):
             clamp=6,
             ipd_pairs=(),
             # augmentation
+            superposition_probs=(1.,), min_superposition_overlap=1.,
+            max_superposition_gain_db=0., superposition_seed=None,
             frequency_warping_fn=None, time_warping_fn=None,
             blur_sigma=0, blur_kernel_size=5,
             mixup_prob=0., mixup_alpha=1.,
@@ -80,6 +82,17 @@ class NormalizedLogMelExtractor(nn.Module):
         self.clamp = clamp
 
         # augmentation
+        if superposition_probs[0] < 1.:
+            self.superpose = SuperposeEvents(
+                superposition_probs=superposition_probs,
+                min_overlap=min_superposition_overlap,
+                max_gain_db=max_superposition_gain_db,
+                sequence_axis=2,
+                seed=superposition_seed,
+            )
+        else:
+            self.superpose = None
+
         if time_warping_fn is not None:
             self.time_warping = TimeWarping(warping_fn=time_warping_fn)
         else:
@@ -126,6 +139,9 @@ class NormalizedLogMelExtractor(nn.Module):
 
     def forward(self, x, seq_len=None, targets=None):
         with torch.no_grad():
+            if self.superpose is not None:
+                x, seq_len, targets = self.superpose(x, seq_len, targets)
+
             if self.ipd_pairs:
                 x_re = x[..., self.filter_max_indices, 0]
                 x_im = x[..., self.filter_max_indices, 1]
@@ -1,5 +1,17 @@
 from . import batch
 from . import utils
 from . import segment
+from . import audio
+from . import dynamic_batch
+from . import cache
+from . import audio_cache
+from . import packed_audio
+from . import statistics
+from . import telemetry
+from . import loader
+from . import batch_cache
+from . import async_audio
+from . import sharding
+from . import audio_scan
 
 from .batch import *
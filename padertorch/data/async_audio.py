@@ -0,0 +1,259 @@
+import collections
+import concurrent.futures
+import threading
+
+import numpy as np
+from lazy_dataset import Dataset
+
+__all__ = [
+    'AsyncAudioReader',
+    'ReadAheadDataset',
+]
+
+
+def _stack(data):
+    # Like `paderbox.io.audioread.recursive_load_audio`: Signals with the
+    # same shape are stacked, otherwise the list is kept.
+    try:
+        np_data = np.array(data)
+    except ValueError:
+        return data
+    if np_data.dtype != object:
+        return np_data
+    return data
+
+
+class AsyncAudioReader:
+    """
+    Reads the audio files of an example (e.g. all speech sources and the
+    observation of a mixture) concurrently with a thread pool instead of
+    one after another. This hides the latency of network storage, the
+    decoding in soundfile releases the GIL.
+
+    As transform for `map`, the reads of one example run concurrently:
+
+        dataset = dataset.map(AsyncAudioReader(
+            audio_keys=['observation', 'speech_source']))
+
+    With `num_read_ahead > 0` and `apply(reader.read_ahead)`, the reads of
+    the next examples are issued, while the following transforms (e.g.
+    the STFT) process the current example:
+
+        reader = AsyncAudioReader(num_read_ahead=4)
+        dataset = dataset.apply(reader.read_ahead).map(stft)
+
+    The loaded signals are stored in `example[dst_key]` with the structure
+    of `example[src_key]` (like `recursive_load_audio`).
+
+    >>> import tempfile, soundfile
+    >>> from pathlib import Path
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     path = str(Path(tmp_dir) / 'audio.wav')
+    ...     soundfile.write(path, np.arange(4) / 2**15, 8000, subtype='PCM_16')
+    ...     reader = AsyncAudioReader(audio_keys=['speech_source'])
+    ...     example = reader({'audio_path': {
+    ...         'speech_source': [path, path], 'observation': path}})
+    >>> example['audio_data']['speech_source'] * 2**15
+    array([[0., 1., 2., 3.],
+           [0., 1., 2., 3.]])
+    >>> list(example['audio_data'])
+    ['speech_source']
+    """
+    def __init__(
+            self,
+            audio_keys=None,
+            src_key='audio_path',
+            dst_key='audio_data',
+            num_workers=8,
+            num_read_ahead=0,
+            dtype=np.float64,
+            cache=None,
+    ):
+        """
+
+        Args:
+            audio_keys: Keys in `example[src_key]`, that are read. If None,
+                all keys are read.
+            src_key: Key of the (nested) audio paths in the example.
+            dst_key: Key of the loaded signals in the returned example.
+            num_workers: Number of threads, that read the files.
+            num_read_ahead: Number of following examples, whose reads are
+                issued by `read_ahead`, while the current example is
+                processed.
+            dtype: dtype of the loaded signals.
+            cache: Optional `padertorch.data.audio_cache.AudioCache`.
+        """
+        self.audio_keys = audio_keys
+        self.src_key = src_key
+        self.dst_key = dst_key
+        self.num_workers = num_workers
+        self.num_read_ahead = num_read_ahead
+        self.dtype = dtype
+        self.cache = cache
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Each process (e.g. of `prefetch(..., backend='mp')`) starts its own
+        # threads.
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        self.num_workers,
+                        thread_name_prefix=self.__class__.__name__,
+                    )
+        return self._executor
+
+    def _load(self, path):
+        if self.cache is None:
+            import paderbox as pb
+            return pb.io.load_audio(path, dtype=self.dtype)
+        return self.cache.load_audio(path, dtype=self.dtype)
+
+    def _submit(self, paths):
+        if isinstance(paths, (tuple, list)):
+            return [self._submit(p) for p in paths]
+        elif isinstance(paths, dict):
+            return {k: self._submit(v) for k, v in paths.items()}
+        else:
+            return self.executor.submit(self._load, paths)
+
+    def _result(self, futures):
+        if isinstance(futures, list):
+            return _stack([self._result(f) for f in futures])
+        elif isinstance(futures, dict):
+            return {k: self._result(v) for k, v in futures.items()}
+        else:
+            return futures.result()
+
+    def _cancel(self, futures):
+        if isinstance(futures, list):
+            for f in futures:
+                self._cancel(f)
+        elif isinstance(futures, dict):
+            for f in futures.values():
+                self._cancel(f)
+        else:
+            futures.cancel()
+
+    def submit(self, example):
+        """Issues the reads of an example and returns the futures."""
+        paths = example[self.src_key]
+        audio_keys = paths.keys() if self.audio_keys is None \
+            else self.audio_keys
+        return self._submit({key: paths[key] for key in audio_keys})
+
+    def collect(self, example, futures):
+        """Waits for the reads of `submit` and returns the example."""
+        example = dict(example)
+        example[self.dst_key] = self._result(futures)
+        return example
+
+    def __call__(self, example):
+        return self.collect(example, self.submit(example))
+
+    def iterate(self, iterable):
+        """
+        Yields the examples of `iterable` with the loaded signals, while the
+        reads of the next `num_read_ahead` examples are running.
+        """
+        pending = collections.deque()
+        iterator = iter(iterable)
+        try:
+            while True:
+                while len(pending) <= self.num_read_ahead:
+                    try:
+                        example = next(iterator)
+                    except StopIteration:
+                        break
+                    pending.append((example, self.submit(example)))
+                if not pending:
+                    return
+                yield self.collect(*pending.popleft())
+        finally:
+            # e.g. the consumer stopped or a read failed
+            for _, futures in pending:
+                self._cancel(futures)
+
+    def read_segments(self, segments):
+        """
+        Reads the segmented values (e.g. `padertorch.data.audio.AudioFile`)
+        of the lazy segments of `Segmenter(lazy=True)` concurrently and
+        returns the segments as dicts.
+
+            segmenter = Segmenter(32000, include_keys=('y', 's'), lazy=True)
+            dataset = dataset.map(segmenter).map(reader.read_segments)
+
+        >>> from padertorch.data.segment import Segmenter
+        >>> segmenter = Segmenter(2, include_keys='x', lazy=True)
+        >>> AsyncAudioReader().read_segments(segmenter({'x': np.arange(4)}))
+        [{'x': array([0, 1]), 'segment_start': 0, 'segment_stop': 2}, {'x': array([2, 3]), 'segment_start': 2, 'segment_stop': 4}]
+        """
+        # The segments keep the read values, hence `to_dict` does not read
+        # them again.
+        futures = [
+            self.executor.submit(segment.__getitem__, key)
+            for segment in segments
+            for key in segment.segmented_keys
+        ]
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            # e.g. a read failed
+            self._cancel(futures)
+        return [segment.to_dict() for segment in segments]
+
+    def read_ahead(self, dataset):
+        """Returns a `ReadAheadDataset`, for `dataset.apply`."""
+        return ReadAheadDataset(dataset, self)
+
+
+class ReadAheadDataset(Dataset):
+    """
+    Dataset, that loads the audio of the examples of `input_dataset` with
+    `AsyncAudioReader.iterate`, i.e. with read-ahead. See
+    `AsyncAudioReader`.
+
+    >>> import lazy_dataset
+    >>> reader = AsyncAudioReader(num_read_ahead=2)
+    >>> reader._load = lambda path: np.full(2, path)
+    >>> ds = lazy_dataset.new([{'audio_path': {'y': i}} for i in range(3)])
+    >>> [ex['audio_data']['y'] for ex in ds.apply(reader.read_ahead)]
+    [array([0, 0]), array([1, 1]), array([2, 2])]
+    """
+    def __init__(self, input_dataset, reader):
+        self.input_dataset = input_dataset
+        self.reader = reader
+
+    def __len__(self):
+        return len(self.input_dataset)
+
+    def __iter__(self):
+        yield from self.reader.iterate(self.input_dataset)
+
+    def copy(self, freeze=False):
+        return self.__class__(
+            self.input_dataset.copy(freeze=freeze),
+            reader=self.reader,
+        )
+
+    @property
+    def indexable(self):
+        return False
+
+    @property
+    def ordered(self):
+        return self.input_dataset.ordered
@@ -0,0 +1,209 @@
+from math import gcd
+from typing import Union, List
+
+import numpy as np
+
+__all__ = [
+    'AudioFile',
+]
+
+
+class AudioFile:
+    """
+    Array-like handle of an audio file (or a list of audio files with the
+    same length), that reads only the requested samples on slicing.
+
+    The shape is known without decoding the file: The number of samples is
+    taken from the database (e.g. `num_samples` in the database JSON) or
+    from the soundfile header. Hence `AudioFile` can be used as value for
+    `Segmenter(lazy=True)`. The segment boundaries are then calculated from
+    the metadata and only the samples of a segment are read from the disk:
+
+        example = {
+            'y': AudioFile(path, num_samples=num_samples, num_channels=1),
+            'num_samples': num_samples,
+        }
+        segmenter = Segmenter(32000, include_keys='y', lazy=True)
+        segmenter(example)[0]['y']  # Reads the samples 0 to 32000
+
+    The shape follows `paderbox.io.load_audio`: `(num_samples,)` for mono
+    and `(num_channels, num_samples)` for multi channel files. A list of
+    files adds a leading axis.
+
+    When `target_sample_rate` differs from the sample rate of the file,
+    the signal is resampled with `scipy.signal.resample_poly`. Only the
+    requested window plus the margin of the anti aliasing filter is read and
+    resampled. The result is identical (up to float precision) to
+    resampling the whole file.
+
+    >>> import tempfile, soundfile
+    >>> from pathlib import Path
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     path = Path(tmp_dir) / 'audio.wav'
+    ...     soundfile.write(str(path), np.arange(16000) / 2**15, 8000,
+    ...                     subtype='PCM_16')
+    ...     audio = AudioFile(path)
+    ...     print(audio.shape, audio[100:104] * 2**15)
+    ...     print(AudioFile(path, target_sample_rate=16000).shape)
+    (16000,) [100. 101. 102. 103.]
+    (32000,)
+    """
+    def __init__(
+            self,
+            path: Union[str, List[str]],
+            num_samples: int = None,
+            num_channels: int = None,
+            sample_rate: int = None,
+            target_sample_rate: int = None,
+            dtype=np.float64,
+            cache=None,
+    ):
+        """
+
+        Args:
+            path: Path to the audio file or list of paths.
+            num_samples: Number of samples in the file (at `sample_rate`).
+                If None, it is read from the file header.
+            num_channels: Number of channels in the file. If None, it is read
+                from the file header.
+            sample_rate: The sample rate of the file. If None and needed for
+                resampling, it is read from the file header.
+            target_sample_rate: If not None, the sample rate of the returned
+                signal.
+            dtype: dtype of the returned signal. With resampling, the
+                resampling is done in float64.
+            cache: Optional `padertorch.data.audio_cache.AudioCache`. If
+                given, the whole file is decoded once and the requested
+                samples are taken from the cache, e.g. when the same file is
+                used in multiple mixtures.
+        """
+        self.path = path
+        self._num_samples = num_samples
+        self._num_channels = num_channels
+        self._sample_rate = sample_rate
+        self.target_sample_rate = target_sample_rate
+        self.dtype = dtype
+        self.cache = cache
+
+    def _info(self):
+        import soundfile
+        path = self.path[0] if isinstance(self.path, (tuple, list)) \
+            else self.path
+        info = soundfile.info(str(path))
+        if self._num_samples is None:
+            self._num_samples = info.frames
+        if self._num_channels is None:
+            self._num_channels = info.channels
+        if self._sample_rate is None:
+            self._sample_rate = info.samplerate
+
+    @property
+    def num_samples(self):
+        """Number of samples of the file at the file's sample rate."""
+        if self._num_samples is None:
+            self._info()
+        return self._num_samples
+
+    @property
+    def num_channels(self):
+        if self._num_channels is None:
+            self._info()
+        return self._num_channels
+
+    @property
+    def sample_rate(self):
+        if self._sample_rate is None:
+            self._info()
+        return self._sample_rate
+
+    def _resampling_factors(self):
+        if self.target_sample_rate is None or (
+                self._sample_rate is not None
+                and self._sample_rate == self.target_sample_rate
+        ):
+            return 1, 1
+        g = gcd(self.target_sample_rate, self.sample_rate)
+        return self.target_sample_rate // g, self.sample_rate // g
+
+    @property
+    def shape(self):
+        up, down = self._resampling_factors()
+        # Length of scipy.signal.resample_poly
+        shape = (-(-self.num_samples * up // down),)
+        if self.num_channels > 1:
+            shape = (self.num_channels, *shape)
+        if isinstance(self.path, (tuple, list)):
+            shape = (len(self.path), *shape)
+        return shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.path!r})'
+
+    def _read_raw(self, start, stop, dtype):
+        if self.cache is None:
+            import paderbox as pb
+            load_audio = pb.io.load_audio
+        else:
+            load_audio = self.cache.load_audio
+        if isinstance(self.path, (tuple, list)):
+            return np.stack([
+                load_audio(p, start=start, stop=stop, dtype=dtype)
+                for p in self.path
+            ])
+        return load_audio(self.path, start=start, stop=stop, dtype=dtype)
+
+    def read(self, start: int = 0, stop: int = None):
+        """
+        Reads the samples `start` to `stop` (at the target sample rate).
+        """
+        if stop is None:
+            stop = self.shape[-1]
+        up, down = self._resampling_factors()
+        if (up, down) == (1, 1):
+            return self._read_raw(start, stop, self.dtype)
+
+        from scipy.signal import resample_poly
+        # Half length of the default filter of resample_poly in samples of
+        # the file plus one sample to be safe.
+        margin = -(-10 * max(up, down) // up) + 1
+        # The window has to start at a multiple of `down` to keep the
+        # polyphase alignment of the whole signal.
+        k = max(0, (start * down - margin * up) // (up * down))
+        window_stop = min(self.num_samples, -(-stop * down // up) + margin)
+        x = self._read_raw(k * down, window_stop, np.float64)
+        x = resample_poly(x, up, down, axis=-1)
+        return x[..., start - k * up:stop - k * up].astype(self.dtype)
+
+    def __getitem__(self, item):
+        if not isinstance(item, tuple):
+            item = (item,)
+        if any([i is Ellipsis for i in item]):
+            index = item.index(Ellipsis)
+            item = (
+                *item[:index],
+                *[slice(None)] * (self.ndim - len(item) + 1),
+                *item[index + 1:],
+            )
+        item = (*item, *[slice(None)] * (self.ndim - len(item)))
+        assert len(item) == self.ndim, (item, self.shape)
+
+        time = item[-1]
+        if isinstance(time, slice) and time.step in [None, 1]:
+            start, stop, _ = time.indices(self.shape[-1])
+            x = self.read(start, max(start, stop))
+            return x[(*item[:-1], slice(None))]
+        else:
+            return self.read()[item]
+
+    def __array__(self, dtype=None, copy=None):
+        x = self.read()
+        if dtype is not None:
+            x = x.astype(dtype)
+        return x
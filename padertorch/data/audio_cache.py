@@ -0,0 +1,285 @@
+import collections
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+__all__ = [
+    'AudioCache',
+]
+
+
+class AudioCache:
+    """
+    LRU cache of decoded audio with a budget in bytes.
+
+    Datasets that combine examples (e.g. `MixUpDataset` with
+    `SuperposeEvents`) decode the same files again and again. The reader
+    transforms (e.g. `AudioFile(..., cache=cache)` or the `AudioReader` in
+    `padertorch.contrib.je.data.transforms`) can use this cache to decode
+    each file only once and slice the requested samples from the cached
+    signal.
+
+    There are two backends:
+     - `shm_dir=None`: The entries are stored in a dict of this process.
+       The threads of `dataset.prefetch(..., backend='t')` share the cache.
+     - `shm_dir='/dev/shm/<some name>'`: The entries are stored as `.npy`
+       files in a shared memory filesystem and are memory mapped on a hit,
+       so all processes (e.g. `prefetch(..., backend='mp')` workers or
+       multiple trainings on the same machine) share the cache. The budget
+       is approximate, because each process tracks only its own writes
+       between two scans of the directory. The directory is not removed at
+       the end, use `clear()`.
+
+    The statistics (`hits`, `misses`, `hit_rate`, the time spent for
+    decoding and the estimated saved decode time) are shared across all
+    users of the cache. Register an `AudioCacheHook` to report them in the
+    timings of the training summary.
+
+    >>> cache = AudioCache(max_size=2**20)
+    >>> def decode():
+    ...     print('decode')
+    ...     return np.arange(10.)
+    >>> cache.get_or_load('a', decode)
+    decode
+    array([0., 1., 2., 3., 4., 5., 6., 7., 8., 9.])
+    >>> cache.get_or_load('a', decode)
+    array([0., 1., 2., 3., 4., 5., 6., 7., 8., 9.])
+    >>> {k: cache.statistics[k] for k in ['hits', 'misses', 'hit_rate']}
+    {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    """
+    _statistics_keys = (
+        'hits', 'misses', 'decode_time', 'decoded_bytes', 'hit_bytes')
+
+    def __init__(self, max_size, shm_dir=None, copy=True):
+        """
+
+        Args:
+            max_size: Budget of the cache in bytes.
+            shm_dir: If not None, the directory of the shared entries,
+                should be on a shared memory filesystem (e.g. `/dev/shm`).
+            copy: If True, return a copy of the cached signal, so it can be
+                modified in place by the following transforms. If False,
+                a read-only view (memory map) is returned.
+        """
+        self.max_size = max_size
+        self.shm_dir = None if shm_dir is None else Path(shm_dir)
+        self.copy = copy
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._size = None if self.shm_dir is not None else 0
+        self._local_statistics = dict.fromkeys(self._statistics_keys, 0)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        if self.shm_dir is None:
+            # The entries are not shared with other processes.
+            state['_entries'] = collections.OrderedDict()
+            state['_size'] = 0
+        else:
+            # Each process scans the directory itself.
+            state['_size'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _statistics_file(self):
+        return self.shm_dir / 'statistics.bin'
+
+    def _update_statistics(self, **deltas):
+        if self.shm_dir is None:
+            with self._lock:
+                for k, v in deltas.items():
+                    self._local_statistics[k] += v
+            return
+
+        import fcntl
+        self.shm_dir.mkdir(parents=True, exist_ok=True)
+        deltas = np.array(
+            [deltas.get(k, 0) for k in self._statistics_keys],
+            dtype=np.float64)
+        with open(os.open(
+                self._statistics_file(), os.O_RDWR | os.O_CREAT), 'r+b'
+        ) as fid:
+            fcntl.flock(fid, fcntl.LOCK_EX)
+            values = np.frombuffer(fid.read(), dtype=np.float64)
+            if values.size != deltas.size:
+                values = np.zeros_like(deltas)
+            fid.seek(0)
+            fid.write((values + deltas).tobytes())
+
+    @property
+    def statistics(self):
+        """
+        Statistics of all users of the cache. The `saved_time` is
+        estimated with the mean decoding speed of the misses.
+        """
+        if self.shm_dir is None:
+            with self._lock:
+                s = dict(self._local_statistics)
+        else:
+            try:
+                values = np.fromfile(self._statistics_file(), np.float64)
+            except FileNotFoundError:
+                values = []
+            if len(values) != len(self._statistics_keys):
+                values = np.zeros(len(self._statistics_keys))
+            s = dict(zip(self._statistics_keys, values.tolist()))
+            s['hits'], s['misses'] = int(s['hits']), int(s['misses'])
+        s['hit_rate'] = s['hits'] / max(s['hits'] + s['misses'], 1)
+        s['saved_time'] = s.pop('hit_bytes') * (
+            s['decode_time'] / max(s['decoded_bytes'], 1))
+        return s
+
+    def _get_shm_path(self, key):
+        key = hashlib.sha1(repr(key).encode()).hexdigest()
+        return self.shm_dir / key[:2] / f'{key}.npy'
+
+    def _get(self, key):
+        if self.shm_dir is None:
+            with self._lock:
+                if key not in self._entries:
+                    return None
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        path = self._get_shm_path(key)
+        try:
+            data = np.load(path, mmap_mode='r')
+            # Update the mtime for the LRU eviction.
+            os.utime(path)
+        except (FileNotFoundError, ValueError, EOFError):
+            # ValueError and EOFError: Removed by another process while
+            # reading.
+            return None
+        return data
+
+    def _put(self, key, data):
+        if data.nbytes > self.max_size:
+            return
+        if self.shm_dir is None:
+            with self._lock:
+                if key in self._entries:
+                    return
+                self._entries[key] = data
+                self._size += data.nbytes
+                while self._size > self.max_size:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= evicted.nbytes
+            return
+
+        path = self._get_shm_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fid:
+                np.save(fid, data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        if self._size is None:
+            self._size = self._shm_size()
+        else:
+            self._size += data.nbytes
+        if self._size > self.max_size:
+            self._prune()
+
+    def _shm_files(self):
+        for root, _, files in os.walk(self.shm_dir):
+            for file in files:
+                if file.endswith('.npy'):
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime_ns, stat.st_size, path
+
+    def _shm_size(self):
+        return sum(size for _, size, _ in self._shm_files())
+
+    def _prune(self):
+        # Remove the least recently used entries until 90 % of the budget
+        # are reached, so that the directory is not scanned on each write.
+        files = sorted(self._shm_files())
+        size = sum(size for _, size, _ in files)
+        for _, file_size, path in files:
+            if size <= 0.9 * self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        self._size = size
+
+    def _get_or_load(self, key, load_fn):
+        data = self._get(key)
+        if data is None:
+            start = time.perf_counter()
+            data = np.array(load_fn())
+            decode_time = time.perf_counter() - start
+            self._update_statistics(
+                misses=1, decode_time=decode_time, decoded_bytes=data.nbytes)
+            # The cached signal must not be changed by the user.
+            data.flags.writeable = False
+            self._put(key, data)
+        else:
+            self._update_statistics(hits=1, hit_bytes=data.nbytes)
+        return data
+
+    def get_or_load(self, key, load_fn, item=None):
+        """
+        Returns the cached signal for `key` or calls `load_fn()` to decode
+        it and adds it to the cache.
+
+        Args:
+            key: Hashable key of the signal, e.g. the path.
+            load_fn: Callable without arguments, that decodes the signal.
+            item: Optional index into the signal, e.g. to read a segment.
+                The index is applied before the copy.
+        """
+        data = self._get_or_load(key, load_fn)
+        if item is not None:
+            data = data[item]
+        if self.copy:
+            data = np.array(data)
+        return data
+
+    def load_audio(self, path, start=0, stop=None, dtype=np.float64):
+        """
+        Like `paderbox.io.load_audio(path, start=start, stop=stop,
+        dtype=dtype)`, but the whole file is decoded once and cached.
+        """
+        import paderbox as pb
+        path = str(path)
+        return self.get_or_load(
+            ('load_audio', path, np.dtype(dtype).str),
+            lambda: pb.io.load_audio(path, dtype=dtype),
+            item=(..., slice(start, stop)),
+        )
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        if self.shm_dir is None:
+            with self._lock:
+                self._entries.clear()
+                self._size = 0
+                for k in self._local_statistics:
+                    self._local_statistics[k] = 0
+            return
+        shutil.rmtree(self.shm_dir, ignore_errors=True)
+        self._size = None
@@ -0,0 +1,281 @@
+import concurrent.futures
+import json
+import os
+from pathlib import Path
+
+__all__ = [
+    'read_audio_info',
+    'scan_audio_files',
+    'create_database',
+]
+
+
+def read_audio_info(path):
+    """
+    Reads the number of samples, the sample rate and the number of channels
+    from the header of an audio file, the audio is not decoded.
+
+    >>> import tempfile, soundfile, numpy as np
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     path = str(Path(tmp_dir) / 'audio.wav')
+    ...     soundfile.write(path, np.zeros((100, 2)), 8000)
+    ...     read_audio_info(path)
+    {'num_samples': 100, 'sample_rate': 8000, 'num_channels': 2}
+    """
+    import soundfile
+    info = soundfile.info(str(path))
+    return {
+        'num_samples': info.frames,
+        'sample_rate': info.samplerate,
+        'num_channels': info.channels,
+    }
+
+
+def _read_headers(paths, num_threads):
+    # Runs in the worker processes: The headers are read with threads to
+    # overlap the latency of the file system.
+    def read(path):
+        try:
+            return read_audio_info(path)
+        except RuntimeError as e:  # soundfile.LibsndfileError
+            return {'error': str(e)}
+
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as pool:
+        return list(pool.map(read, paths))
+
+
+def _walk(root, extensions, num_threads):
+    # Lists the directory tree with a thread pool, each directory is one task.
+    # Symlinks to directories are followed, except for symlinks to an
+    # ancestor (cycle).
+    def scan_dir(directory):
+        files, directories = [], []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=True):
+                    directories.append(entry.path)
+                elif entry.name.endswith(extensions):
+                    files.append(entry.path)
+        return files, directories
+
+    files = []
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as pool:
+        # The real paths of the ancestors of each task
+        pending = {
+            pool.submit(scan_dir, root): frozenset([os.path.realpath(root)])}
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                ancestors = pending.pop(future)
+                new_files, directories = future.result()
+                files.extend(new_files)
+                for directory in directories:
+                    real_path = os.path.realpath(directory)
+                    if real_path not in ancestors:
+                        pending[pool.submit(scan_dir, directory)] = \
+                            ancestors | {real_path}
+    return sorted(files)
+
+
+def _stat(paths, num_threads):
+    def stat(path):
+        s = os.stat(path)
+        return s.st_mtime_ns, s.st_size
+
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as pool:
+        return list(pool.map(stat, paths))
+
+
+def _load_cache(cache_file):
+    cache = {}
+    if cache_file is not None and cache_file.exists():
+        with open(cache_file) as fid:
+            for line in fid:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of an interrupted scan
+                    continue
+                cache[entry.pop('path')] = entry
+    return cache
+
+
+def scan_audio_files(
+        paths,
+        extensions=('.wav', '.flac'),
+        cache_file=None,
+        num_processes=0,
+        num_threads=16,
+        chunk_size=256,
+):
+    """
+    Reads the header information (`read_audio_info`) of many audio files,
+    e.g. to create a database JSON.
+
+    The directories are listed and the headers are read in parallel: The
+    files are split in chunks, that are read by `num_processes` processes
+    (0: in this process) with `num_threads` threads each. Threads overlap
+    the latency of network file systems, processes the CPU time of parsing.
+
+    With `cache_file`, the results are appended to this JSON lines file as
+    soon as a chunk is finished. A later scan (e.g. after an interruption or
+    when files are added) reads only the headers of files, that are not in
+    the cache or whose modification time or size changed.
+
+    Args:
+        paths: A directory, that is scanned recursively for files with
+            `extensions`, or a list of files.
+        extensions: File extensions of the audio files in a directory.
+        cache_file: Optional path to the JSON lines cache.
+        num_processes: Number of worker processes, 0 reads the headers in
+            this process.
+        num_threads: Number of threads (in each process) for listing the
+            directories and reading the headers.
+        chunk_size: Number of files per task of a worker process.
+
+    Returns:
+        dict from the (absolute) path to the info dict. Files, that could
+        not be read, have an `error` entry instead.
+
+    >>> import tempfile, soundfile, numpy as np
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     for name in ['a/1.wav', 'a/2.flac', 'b/3.wav']:
+    ...         path = Path(tmp_dir) / name
+    ...         path.parent.mkdir(exist_ok=True)
+    ...         soundfile.write(str(path), np.zeros(100), 16000)
+    ...     infos = scan_audio_files(tmp_dir)
+    ...     print({str(Path(k).relative_to(tmp_dir)): v['num_samples']
+    ...            for k, v in infos.items()})
+    {'a/1.wav': 100, 'a/2.flac': 100, 'b/3.wav': 100}
+    """
+    cache_file = None if cache_file is None else Path(cache_file)
+    extensions = tuple(extensions)
+    if isinstance(paths, (str, Path)):
+        assert Path(paths).is_dir(), f'{paths} is not a directory.'
+        paths = _walk(os.path.abspath(paths), extensions, num_threads)
+    else:
+        paths = [os.path.abspath(p) for p in paths]
+
+    cache = _load_cache(cache_file)
+    results = {}
+    todo = []
+    for path, (mtime_ns, size) in zip(paths, _stat(paths, num_threads)):
+        entry = cache.get(path)
+        if entry is not None and entry['mtime_ns'] == mtime_ns \
+                and entry['size'] == size:
+            results[path] = entry['info']
+        else:
+            todo.append((path, mtime_ns, size))
+
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    if num_processes > 0:
+        executor = concurrent.futures.ProcessPoolExecutor(num_processes)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_fid = open(cache_file, 'a')
+    else:
+        cache_fid = None
+    futures = {}
+    try:
+        futures = {
+            executor.submit(
+                _read_headers, [path for path, _, _ in chunk], num_threads
+            ): chunk
+            for chunk in chunks
+        }
+        for future in concurrent.futures.as_completed(futures):
+            for (path, mtime_ns, size), info in zip(
+                    futures[future], future.result()):
+                results[path] = info
+                if cache_fid is not None and 'error' not in info:
+                    cache_fid.write(json.dumps({
+                        'path': path, 'mtime_ns': mtime_ns, 'size': size,
+                        'info': info,
+                    }) + '\n')
+            if cache_fid is not None:
+                cache_fid.flush()
+    finally:
+        # e.g. a KeyboardInterrupt: Do not start the remaining chunks.
+        # (shutdown(cancel_futures=True) needs Python 3.9)
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+        if cache_fid is not None:
+            cache_fid.close()
+
+    return {path: results[path] for path in paths}
+
+
+def create_database(
+        infos,
+        root,
+        dataset_name_fn=None,
+        example_id_fn=None,
+        audio_key='observation',
+        json_path=None,
+):
+    """
+    Creates a database dict in the format of `lazy_dataset.database`
+    (`JsonDatabase`) from the result of `scan_audio_files`:
+
+        {'datasets': {<dataset_name>: {<example_id>: {
+            'audio_path': {<audio_key>: <path>},
+            'num_samples': ..., 'sample_rate': ..., 'num_channels': ...,
+        }}}}
+
+    Args:
+        infos: dict from path to info, see `scan_audio_files`. Files with
+            an error are skipped.
+        root: The root directory of the database.
+        dataset_name_fn: Function, that gets the path relative to `root`
+            and returns the dataset name. By default, the parent directory
+            relative to `root` (e.g. 'train/clean').
+        example_id_fn: Function, that gets the path relative to `root`
+            and returns the example id. By default the file name without
+            extension.
+        audio_key: Key in `audio_path`.
+        json_path: If not None, the database is written to this file.
+
+    Returns:
+        The database dict.
+
+    >>> infos = {
+    ...     '/db/train/a.wav': {'num_samples': 10, 'sample_rate': 8000,
+    ...                         'num_channels': 1},
+    ...     '/db/test/b.wav': {'error': 'Format not recognised.'},
+    ... }
+    >>> create_database(infos, '/db')
+    {'datasets': {'train': {'a': {'audio_path': {'observation': '/db/train/a.wav'}, 'num_samples': 10, 'sample_rate': 8000, 'num_channels': 1}}}}
+    """
+    root = Path(root)
+    if dataset_name_fn is None:
+        def dataset_name_fn(path):
+            return path.parent.as_posix()
+    if example_id_fn is None:
+        def example_id_fn(path):
+            return path.stem
+
+    datasets = {}
+    for path, info in infos.items():
+        if 'error' in info:
+            continue
+        relative = Path(path).relative_to(root)
+        examples = datasets.setdefault(dataset_name_fn(relative), {})
+        example_id = example_id_fn(relative)
+        assert example_id not in examples, (
+            f'Duplicate example id {example_id!r}: {path} and '
+            f'{examples[example_id]["audio_path"][audio_key]}'
+        )
+        examples[example_id] = {
+            'audio_path': {audio_key: str(path)},
+            **info,
+        }
+    database = {'datasets': datasets}
+
+    if json_path is not None:
+        import paderbox as pb
+        pb.io.dump_json(database, json_path, create_path=True, indent=4)
+    return database
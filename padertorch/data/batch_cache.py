@@ -0,0 +1,302 @@
+import json
+import os
+import pickle
+import tempfile
+import uuid
+import warnings
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from padertorch.configurable import recursive_class_to_str
+from padertorch.data.cache import config_hash
+from padertorch.data.batch import _map_arrays
+
+__all__ = [
+    'BatchCache',
+]
+
+# Alignment of the arrays in the data file
+_ALIGNMENT = 64
+
+
+class _CachedArray:
+    """Descriptor of an array in the data file of a `BatchCache`."""
+    __slots__ = ['offset', 'shape', 'dtype', 'is_tensor']
+
+    def __init__(self, offset, shape, dtype, is_tensor):
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+        self.is_tensor = is_tensor
+
+    def __getstate__(self):
+        return self.offset, self.shape, self.dtype, self.is_tensor
+
+    def __setstate__(self, state):
+        self.offset, self.shape, self.dtype, self.is_tensor = state
+
+
+def _map_cached(batch, fn):
+    if isinstance(batch, dict):
+        return batch.__class__({
+            key: _map_cached(value, fn) for key, value in batch.items()
+        })
+    elif isinstance(batch, (tuple, list)):
+        return batch.__class__([_map_cached(value, fn) for value in batch])
+    elif isinstance(batch, _CachedArray):
+        return fn(batch)
+    else:
+        return batch
+
+
+def _nbytes(array):
+    if isinstance(array, torch.Tensor):
+        return array.nelement() * array.element_size()
+    return array.nbytes
+
+
+def _copy(array):
+    if isinstance(array, torch.Tensor):
+        return array.detach().clone()
+    return array.copy()
+
+
+class BatchCache:
+    """
+    Materializes a deterministic iterable (e.g. the validation dataset with
+    reading, STFT and collate) in the first iteration and replays the
+    prepared batches in the following iterations:
+
+        validation_dataset = BatchCache(validation_dataset, max_size=8 * 2**30)
+        trainer.register_validation_hook(validation_dataset)
+
+    Or with `trainer.register_validation_hook(..., cache_size=...)`.
+
+    The batches are kept in memory, or with `cache_dir` in a file, that
+    is memory mapped for the replay. The file is shared by all processes
+    and runs with the same `config` (e.g. the config of the validation
+    pipeline), a change of the config invalidates the cache.
+
+    The batches are only cached, when the iteration is complete. The cached
+    batches are copied (in memory) or copy-on-write mapped (on disk) for
+    the replay, so in-place modifications do not change the cache.
+
+    >>> calls = []
+    >>> def prepare(x):
+    ...     calls.append(x)
+    ...     return {'x': np.full(3, x), 'id': str(x)}
+    >>> import lazy_dataset
+    >>> ds = BatchCache(lazy_dataset.new([1, 2]).map(prepare))
+    >>> list(ds)
+    [{'x': array([1, 1, 1]), 'id': '1'}, {'x': array([2, 2, 2]), 'id': '2'}]
+    >>> list(ds)
+    [{'x': array([1, 1, 1]), 'id': '1'}, {'x': array([2, 2, 2]), 'id': '2'}]
+    >>> calls
+    [1, 2]
+    """
+    def __init__(self, iterable, max_size=None, cache_dir=None, config=None):
+        """
+
+        Args:
+            iterable: Deterministic iterable of batches.
+            max_size: Maximal number of bytes of the arrays and tensors of
+                all batches. When the batches are larger, nothing is cached
+                and the iterable is iterated each time. None means no limit.
+            cache_dir: If not None, the batches are written to
+                `<cache_dir>/<config hash>` and memory mapped.
+            config: JSON serializable description of the iterable, that is
+                required for `cache_dir`.
+        """
+        self.iterable = iterable
+        self.max_size = max_size
+        if cache_dir is not None:
+            assert config is not None, (
+                'A cache_dir needs a config to detect changes of the '
+                'iterable.'
+            )
+            cache_dir = Path(cache_dir).expanduser().absolute()
+            self.config = recursive_class_to_str(config)
+            self.cache_dir = cache_dir / config_hash(self.config)[:16]
+        else:
+            self.config = config
+            self.cache_dir = None
+        self._batches = None
+        self._data_file = None
+        self._too_large = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Each process loads the index and opens the data file itself.
+        state['_batches'] = None
+        state['_data_file'] = None
+        return state
+
+    def __len__(self):
+        if self._batches is not None:
+            return len(self._batches)
+        return len(self.iterable)
+
+    @property
+    def index_path(self):
+        return self.cache_dir / 'index.pkl'
+
+    def _load_index(self):
+        if self._batches is not None or self.cache_dir is None:
+            return
+        data_file = None
+        while True:
+            try:
+                with open(self.index_path, 'rb') as fid:
+                    index = pickle.load(fid)
+            except FileNotFoundError:
+                return
+            if index['size'] == 0:
+                break
+            if index['data_file'] == data_file:
+                # The data file is missing, record again.
+                return
+            data_file = index['data_file']
+            try:
+                # The open file stays readable, when a concurrent run with
+                # the same config replaces the index and removes the file.
+                self._data_file = open(self.cache_dir / data_file, 'rb')
+                break
+            except FileNotFoundError:
+                # Replaced in the meantime, read the new index.
+                pass
+        self._batches = index['batches']
+
+    def __iter__(self):
+        self._load_index()
+        if self._batches is not None:
+            yield from self._replay()
+        elif self._too_large:
+            yield from self.iterable
+        elif self.cache_dir is not None:
+            yield from self._record_to_disk()
+        else:
+            yield from self._record_to_memory()
+
+    def _replay(self):
+        if self._data_file is None:
+            for batch in self._batches:
+                yield _map_arrays(batch, _copy)
+        else:
+            # A new copy-on-write mapping in each iteration, in-place
+            # modifications of the previous iteration are not visible.
+            data = np.memmap(self._data_file, dtype=np.uint8, mode='c')
+            for batch in self._batches:
+                yield _map_cached(
+                    batch, lambda array: self._load(data, array))
+
+    @staticmethod
+    def _load(data, array):
+        dtype = np.dtype(array.dtype)
+        size = int(np.prod(array.shape)) * dtype.itemsize
+        value = data[array.offset:array.offset + size].view(dtype)
+        value = value.reshape(array.shape)
+        if array.is_tensor:
+            value = torch.from_numpy(value)
+        return value
+
+    def _exceeds(self, size):
+        if self.max_size is not None and size > self.max_size:
+            warnings.warn(
+                f'The batches of {self.__class__.__name__} exceed max_size '
+                f'({self.max_size} bytes), they are not cached.'
+            )
+            self._too_large = True
+            return True
+        return False
+
+    def _record_to_memory(self):
+        batches = []
+        size = 0
+        for batch in self.iterable:
+            if batches is not None:
+                arrays = []
+                copy = _map_arrays(
+                    batch, lambda a: arrays.append(a) or _copy(a))
+                size += sum(_nbytes(a) for a in arrays)
+                if self._exceeds(size):
+                    batches = None
+                else:
+                    batches.append(copy)
+            yield batch
+        if batches is not None:
+            self._batches = batches
+
+    def _record_to_disk(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        data_file = f'data_{uuid.uuid4().hex[:16]}.bin'
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=f'.{data_file}.', suffix='.tmp')
+        batches = []
+        offset = 0
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as fid:
+                def write(array):
+                    nonlocal offset
+                    is_tensor = isinstance(array, torch.Tensor)
+                    data = array.detach().cpu().numpy() if is_tensor else array
+                    data = np.ascontiguousarray(data)
+                    descriptor = _CachedArray(
+                        offset, data.shape, data.dtype.str, is_tensor)
+                    fid.write(data.tobytes())
+                    padding = -data.nbytes % _ALIGNMENT
+                    fid.write(bytes(padding))
+                    offset += data.nbytes + padding
+                    return descriptor
+
+                for batch in self.iterable:
+                    if batches is not None:
+                        batches.append(_map_arrays(batch, write))
+                        if self._exceeds(offset):
+                            batches = None
+                    yield batch
+            complete = batches is not None
+        finally:
+            if not complete:
+                os.remove(tmp_path)
+        if not complete:
+            return
+        self._commit(tmp_path, {
+            'data_file': data_file, 'size': offset, 'batches': batches})
+
+    def _commit(self, tmp_path, index):
+        # Concurrent runs with the same config may record at the same time,
+        # the last index wins. Under a lock, the data file is moved in place,
+        # the index is written and the data files of other recordings are
+        # removed. Runs, that replay a removed file, keep it open.
+        data_path = self.cache_dir / index['data_file']
+        try:
+            import fcntl  # Only available on POSIX
+        except ImportError:
+            # e.g. Windows, where open files cannot be removed anyway.
+            os.replace(tmp_path, data_path)
+            self._write_index(index)
+            return
+        fd = os.open(self.cache_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.replace(tmp_path, data_path)
+            self._write_index(index)
+            for path in self.cache_dir.glob('data_*.bin'):
+                if path != data_path:
+                    path.unlink()
+        finally:
+            os.close(fd)
+
+    def _write_index(self, index):
+        # The index is written last, so it always points to a complete file.
+        with open(self.cache_dir / 'config.json', 'w') as fid:
+            json.dump(self.config, fid, sort_keys=True, indent=4,
+                      default=repr)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.cache_dir, prefix='.index.pkl.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fid:
+            pickle.dump(index, fid)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,395 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from padertorch.configurable import class_to_str, recursive_class_to_str
+
+__all__ = [
+    'FeatureCache',
+    'get_transform_config',
+    'config_hash',
+]
+
+
+def get_transform_config(transform):
+    """
+    Returns a JSON serializable description of a transform, that is used to
+    detect changes of the transform.
+
+    The config contains the factory and the attributes of the instance
+    (e.g. the fields of a dataclass like `AudioReader` or `STFT` in
+    `padertorch.contrib.je.data.transforms`, but also attributes that are
+    set later, like a normalization that is estimated from the data).
+    Lists of transforms (e.g. a pipeline) and `functools.partial` are
+    supported. Arrays and tensors are represented by a hash of their data,
+    a `torch.nn.Module` additionally by its parameters and buffers.
+    Functions are represented by their import name, hence lambdas and
+    local functions, that have no unique name, are rejected like objects
+    without a stable description (e.g. a `np.random.RandomState`). Use
+    the `config` argument of `FeatureCache` for them.
+
+    >>> from padertorch.ops import STFT
+    >>> config = get_transform_config(
+    ...     STFT(512, 128, complex_representation='stacked'))
+    >>> config['factory'], config['size'], config['shift']
+    ('padertorch.ops._stft.STFT', 512, 128)
+    >>> config['stft_kernel']['shape']
+    [514, 1, 512]
+    """
+    if isinstance(transform, (tuple, list)):
+        return [get_transform_config(t) for t in transform]
+    if isinstance(transform, dict):
+        return {k: get_transform_config(v) for k, v in transform.items()}
+    if isinstance(transform, functools.partial):
+        return {
+            'factory': 'functools.partial',
+            'func': get_transform_config(transform.func),
+            'args': [get_transform_config(a) for a in transform.args],
+            'kwargs': {
+                k: get_transform_config(v)
+                for k, v in transform.keywords.items()
+            },
+        }
+    if isinstance(transform, (np.ndarray, np.generic, torch.Tensor)):
+        if isinstance(transform, torch.Tensor):
+            transform = transform.detach().cpu().numpy()
+        transform = np.ascontiguousarray(transform)
+        return {
+            'dtype': str(transform.dtype),
+            'shape': list(transform.shape),
+            'sha1': hashlib.sha1(transform.tobytes()).hexdigest(),
+        }
+    if isinstance(transform, (Path, np.dtype)):
+        return str(transform)
+    if isinstance(transform, (str, int, float, bool, type(None))):
+        return transform
+    if inspect.ismethod(transform):
+        return {
+            'factory': class_to_str(transform.__func__),
+            'self': get_transform_config(transform.__self__),
+        }
+    if inspect.isfunction(transform) and '<' in transform.__qualname__:
+        raise ValueError(
+            f'Cannot derive a config of the lambda or local function '
+            f'{transform.__qualname__}, because it has no unique name. '
+            f'Pass the config explicitly, e.g. FeatureCache(..., config=...).'
+        )
+    if isinstance(transform, type) or inspect.isroutine(transform) \
+            or isinstance(transform, np.ufunc):
+        # Classes and functions are identified by their name, the code is
+        # not part of the config.
+        return class_to_str(transform)
+    if hasattr(transform, '__dict__'):
+        config = {
+            'factory': class_to_str(transform.__class__),
+            **{
+                k: get_transform_config(v) for k, v in vars(transform).items()
+                if not k.startswith('_')
+            },
+        }
+        if isinstance(transform, torch.nn.Module):
+            # The state is in private attributes.
+            for name, value in [
+                *transform.named_parameters(recurse=False),
+                *transform.named_buffers(recurse=False),
+                *transform.named_children(),
+            ]:
+                config[name] = get_transform_config(value)
+        return config
+    raise TypeError(
+        f'Cannot derive a config of {transform!r} '
+        f'({transform.__class__.__name__}). Pass the config explicitly, '
+        f'e.g. FeatureCache(..., config=...).'
+    )
+
+
+def config_hash(config):
+    """
+    Hash of a (JSON serializable) config, independent of the order of the
+    keys.
+
+    >>> config_hash({'a': 1, 'b': [1, 2]}) == config_hash({'b': [1, 2], 'a': 1})
+    True
+    >>> config_hash({'a': 1}) == config_hash({'a': 2})
+    False
+    """
+    config = recursive_class_to_str(config)
+    return hashlib.sha256(json.dumps(
+        config, sort_keys=True, default=repr
+    ).encode()).hexdigest()
+
+
+def _get_paths(value):
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return [p for v in value for p in _get_paths(v)]
+    if isinstance(value, (str, Path)):
+        return [value]
+    return []
+
+
+class FeatureCache:
+    """
+    Persistent on-disk cache of the outputs of a (deterministic) transform,
+    e.g. the features of each example, that are otherwise recomputed in each
+    epoch and each run:
+
+        transform = FeatureCache(
+            [AudioReader(...), STFT(...), MelTransform(...)],
+            cache_dir=storage_dir / 'feature_cache',
+            max_size=50 * 2**30,
+        )
+        dataset = dataset.map(transform).prefetch(...)
+
+    The cache entry of an example is identified by
+     - the hash of the config of the transform (see `get_transform_config`),
+       so a change of any parameter of the transform invalidates the cache,
+     - the example id and
+     - the modification times of the input files (`mtime_keys`), so a
+       changed audio file invalidates the entry of that example.
+
+    The entries are pickle files in a sharded directory structure
+    (`<cache_dir>/<config hash>/<shard>/<key>.pkl`). Writes are atomic
+    (temporary file and rename), so concurrent workers (e.g. prefetch
+    processes or multiple training runs) can share a cache directory.
+    When `max_size` is given, the least recently used entries are removed
+    once the size of the cache exceeds `max_size`. This includes the
+    entries of outdated configs.
+
+    Randomized transforms (e.g. augmentation) must not be cached. Apply them
+    after the cached transform.
+
+    >>> import tempfile
+    >>> def transform(example):
+    ...     print('compute', example['example_id'])
+    ...     return {**example, 'feature': example['x'] ** 2}
+    >>> with tempfile.TemporaryDirectory() as cache_dir:
+    ...     cache = FeatureCache(transform, cache_dir, config={'power': 2})
+    ...     print(cache({'example_id': 'a', 'x': np.arange(3)})['feature'])
+    ...     print(cache({'example_id': 'a', 'x': np.arange(3)})['feature'])
+    ...     print(cache.statistics)
+    compute a
+    [0 1 4]
+    [0 1 4]
+    {'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
+    """
+    def __init__(
+            self,
+            transform,
+            cache_dir,
+            config=None,
+            id_key='example_id',
+            mtime_keys=('audio_path',),
+            keys=None,
+            max_size=None,
+            num_shards=256,
+    ):
+        """
+
+        Args:
+            transform: Callable that maps an example to the features. A list
+                of callables is applied in order.
+            cache_dir: Directory of the cache. Can be shared between
+                different transforms and configs.
+            config: Config that describes the transform, e.g. the config of
+                the Configurable that creates the transform. If None, it is
+                derived from the transform with `get_transform_config`.
+            id_key: Key of the example id in the example or a callable that
+                returns a unique id for an example.
+            mtime_keys: Keys of (possibly nested) file paths in the example.
+                The modification times of these files are part of the key of
+                an entry. Missing keys are ignored.
+            keys: If None, the whole output of the transform is cached.
+                Otherwise, only these keys of the output are cached and
+                added to the input example when the entry is loaded
+                (e.g. `keys=['mel_transform']` to avoid storing the audio).
+            max_size: Maximum size of the cache directory in bytes. Because
+                each process tracks only its own writes between two scans
+                of the directory, the limit is approximate when multiple
+                processes write.
+            num_shards: Number of subdirectories per config, to keep the
+                number of files per directory small.
+        """
+        self.transform = transform
+        self.cache_dir = Path(cache_dir)
+        if config is None:
+            config = get_transform_config(transform)
+        self.config = config
+        self.config_hash = config_hash(config)
+        self.id_key = id_key
+        self.mtime_keys = mtime_keys
+        self.keys = keys
+        self.max_size = max_size
+        self.num_shards = num_shards
+
+        self.config_dir = self.cache_dir / self.config_hash[:16]
+        self._size = None
+        self._reset_statistics()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Each process scans the directory itself.
+        state['_size'] = None
+        return state
+
+    def _reset_statistics(self):
+        self._statistics = {
+            'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0,
+        }
+
+    @property
+    def statistics(self):
+        """Counts of cache hits, misses, writes and evictions of this
+        process."""
+        return dict(self._statistics)
+
+    def _get_example_id(self, example):
+        if callable(self.id_key):
+            return self.id_key(example)
+        return example[self.id_key]
+
+    def _get_mtimes(self, example):
+        mtimes = []
+        if self.mtime_keys is None or not isinstance(example, dict):
+            return mtimes
+        for key in self.mtime_keys:
+            if key in example:
+                mtimes.extend(
+                    os.stat(path).st_mtime_ns
+                    for path in _get_paths(example[key])
+                )
+        return mtimes
+
+    def get_path(self, example):
+        """Returns the path of the cache entry of the example."""
+        key = hashlib.sha256(json.dumps(
+            [self._get_example_id(example), self._get_mtimes(example)],
+            default=str,
+        ).encode()).hexdigest()
+        shard = int(key[:8], 16) % self.num_shards
+        return self.config_dir / f'{shard:03x}' / f'{key}.pkl'
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as fid:
+                data = pickle.load(fid)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError):
+            # Should not happen with atomic writes, but e.g. a full disk can
+            # produce broken files. The entry is recomputed.
+            return None
+        try:
+            # Update the mtime for the LRU eviction. The atime is not
+            # reliable, e.g. with noatime mounts.
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def _atomic_write(self, path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fid:
+                fid.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _write_config(self):
+        config_file = self.config_dir / 'config.json'
+        if not config_file.exists():
+            self._atomic_write(config_file, json.dumps(
+                recursive_class_to_str(self.config), sort_keys=True,
+                indent=2, default=repr,
+            ).encode())
+
+    def _save(self, path, data):
+        if self._statistics['writes'] == 0:
+            self._write_config()
+        data = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        self._atomic_write(path, data)
+        self._statistics['writes'] += 1
+        if self.max_size is not None:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_size:
+                self.prune()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith('.pkl'):
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        # Removed by another process
+                        continue
+                    yield stat.st_mtime_ns, stat.st_size, path
+
+    def size(self):
+        """Size of all entries in the cache directory in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def prune(self, max_size=None):
+        """
+        Removes the least recently used entries until the size of the cache
+        is below 90 % of `max_size`, so that the directory is not scanned
+        after each write.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= 0.9 * max_size:
+                break
+            try:
+                os.remove(path)
+                self._statistics['evictions'] += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def _transform(self, example):
+        if isinstance(self.transform, (tuple, list)):
+            for transform in self.transform:
+                example = transform(example)
+            return example
+        return self.transform(example)
+
+    def __call__(self, example):
+        path = self.get_path(example)
+        data = self._load(path)
+        if data is None:
+            self._statistics['misses'] += 1
+            output = self._transform(example)
+            if self.keys is None:
+                self._save(path, output)
+            else:
+                self._save(path, {key: output[key] for key in self.keys})
+            return output
+
+        self._statistics['hits'] += 1
+        if self.keys is None:
+            return data
+        return {**example, **data}
@@ -0,0 +1,267 @@
+import numpy as np
+from lazy_dataset.core import Dataset
+
+__all__ = [
+    'DynamicBatchDataset',
+    'batch_by_budget',
+]
+
+
+class _PendingBatch:
+    """The examples of an incomplete batch with the running sum and maximum
+    of their lengths, so the cost of a new example is computed in O(1)."""
+    __slots__ = ['examples', 'total', 'longest']
+
+    def __init__(self):
+        self.examples = []
+        self.total = 0
+        self.longest = 0
+
+    def append(self, length, example):
+        self.examples.append((length, example))
+        self.total += length
+        self.longest = max(self.longest, length)
+
+
+class DynamicBatchDataset(Dataset):
+    """
+    Batches examples of variable length such that each batch stays within a
+    budget of frames instead of using a fixed batch size. This keeps the
+    memory consumption and the computational load per batch roughly constant
+    for datasets with variable length examples (e.g. audio), so the
+    batch size does not need to be tuned for each corpus.
+
+    The examples can be assigned to buckets by their length
+    (`bucket_boundaries`), where each bucket collects its own batch. With
+    `sort_window`, the examples are buffered and sorted by length in windows
+    of `sort_window` examples before they are batched, which reduces the
+    padding. The batches of a window can be shuffled.
+
+    The statistics of the last iteration, e.g. the padding ratio, are
+    available in `statistics`.
+
+    >>> import lazy_dataset
+    >>> lengths = [5, 1, 9, 2, 8, 3, 7, 6]
+    >>> ds = lazy_dataset.new(lengths)
+    >>> batches = DynamicBatchDataset(ds, len_key=lambda x: x, max_total_size=16)
+    >>> list(batches)
+    [[5, 1], [9], [8, 2], [7, 3], [6]]
+    >>> round(batches.statistics['padding_ratio'], 3)
+    0.255
+
+    The sort window reduces the padding:
+    >>> batches = DynamicBatchDataset(
+    ...     ds, len_key=lambda x: x, max_total_size=16, sort_window=8)
+    >>> list(batches)
+    [[9], [8, 7], [6, 5], [3, 2, 1]]
+    >>> round(batches.statistics['padding_ratio'], 3)
+    0.109
+    >>> batches.statistics['mean_batch_size']
+    2.0
+
+    With a budget on the sum of the lengths, there is no penalty for the
+    padding:
+    >>> list(DynamicBatchDataset(
+    ...     ds, len_key=lambda x: x, max_total_size=16, budget='frames',
+    ...     max_batch_size=3, sort_window=8))
+    [[9], [8, 7], [6, 5, 3], [2, 1]]
+    """
+    def __init__(
+            self,
+            input_dataset,
+            len_key,
+            max_total_size,
+            budget='padded',
+            max_batch_size=None,
+            bucket_boundaries=None,
+            sort_window=None,
+            shuffle=False,
+            rng=np.random,
+            drop_incomplete=False,
+            reverse_sort=True,
+    ):
+        """
+
+        Args:
+            input_dataset: Dataset of examples
+            len_key: callable or dict key returning the length of an example,
+                e.g. 'num_samples' or 'num_frames'.
+            max_total_size: The budget of a batch.
+            budget: What counts towards `max_total_size`:
+                'padded': The number of elements after padding
+                    (`len(batch) * max_len`). This corresponds to the size of
+                    the padded tensor.
+                'frames': The sum of the lengths of the examples.
+            max_batch_size: Optional upper bound for the number of examples
+                in a batch.
+            bucket_boundaries: Optional sorted list of lengths. Examples are
+                only batched with examples of the same bucket, where bucket
+                `i` contains the lengths in
+                `[bucket_boundaries[i-1], bucket_boundaries[i])`.
+            sort_window: If not None, buffer this number of examples and sort
+                them by length before batching.
+            shuffle: If True, shuffle the batches of each sort window.
+                Requires `sort_window`.
+            rng: Random number generator for the shuffle.
+            drop_incomplete: If True, drop the last (not full) batches of the
+                buckets at the end of the iteration.
+            reverse_sort: Sort the examples in a batch by length in
+                descending order (e.g. for `PackedSequence`), otherwise
+                ascending.
+        """
+        assert budget in ['padded', 'frames'], budget
+        # Without a window, there is at most one batch to shuffle.
+        assert not shuffle or sort_window is not None, (
+            'shuffle needs a sort_window', shuffle, sort_window)
+        self.input_dataset = input_dataset
+        self.len_key = len_key
+        self.max_total_size = max_total_size
+        self.budget = budget
+        self.max_batch_size = max_batch_size
+        self.bucket_boundaries = bucket_boundaries
+        self.sort_window = sort_window
+        self.shuffle = shuffle
+        self.rng = rng
+        self.drop_incomplete = drop_incomplete
+        self.reverse_sort = reverse_sort
+        self._reset_statistics()
+
+    def copy(self, freeze=False):
+        return self.__class__(
+            input_dataset=self.input_dataset.copy(freeze=freeze),
+            len_key=self.len_key,
+            max_total_size=self.max_total_size,
+            budget=self.budget,
+            max_batch_size=self.max_batch_size,
+            bucket_boundaries=self.bucket_boundaries,
+            sort_window=self.sort_window,
+            shuffle=self.shuffle,
+            rng=self.rng,
+            drop_incomplete=self.drop_incomplete,
+            reverse_sort=self.reverse_sort,
+        )
+
+    @property
+    def indexable(self):
+        return False
+
+    @property
+    def ordered(self) -> bool:
+        return self.input_dataset.ordered and not self.shuffle
+
+    def __str__(self):
+        return (
+            f'{self.__class__.__name__}('
+            f'max_total_size={self.max_total_size}, budget={self.budget!r})'
+        )
+
+    def _reset_statistics(self):
+        self._statistics = {
+            'num_batches': 0, 'num_examples': 0, 'num_frames': 0,
+            'num_padded_frames': 0, 'num_dropped': 0,
+        }
+
+    @property
+    def statistics(self):
+        """
+        Statistics of the batches, that were yielded in the last (or the
+        current) iteration:
+            num_batches, num_examples, mean_batch_size, num_dropped and
+            padding_ratio, i.e. the fraction of padded elements in the
+            padded batches.
+        """
+        s = dict(self._statistics)
+        s['mean_batch_size'] = s['num_examples'] / max(s['num_batches'], 1)
+        s['padding_ratio'] = (
+            1 - s['num_frames'] / max(s['num_padded_frames'], 1))
+        return s
+
+    def _get_length(self, example):
+        if callable(self.len_key):
+            return self.len_key(example)
+        return example[self.len_key]
+
+    def _cost(self, batch, length):
+        # Cost of the pending batch with an additional example of `length`
+        if self.budget == 'padded':
+            return (len(batch.examples) + 1) * max(batch.longest, length)
+        else:
+            return batch.total + length
+
+    def _finalize(self, batch):
+        batch = sorted(batch, key=lambda x: x[0], reverse=self.reverse_sort)
+        lengths = [length for length, _ in batch]
+        self._statistics['num_batches'] += 1
+        self._statistics['num_examples'] += len(lengths)
+        self._statistics['num_frames'] += sum(lengths)
+        self._statistics['num_padded_frames'] += len(lengths) * max(lengths)
+        return [example for _, example in batch]
+
+    def _process_window(self, window, pending):
+        """Adds the examples of the window to the pending batches and
+        returns the completed batches."""
+        if self.sort_window is not None:
+            window = sorted(window, key=lambda x: x[0], reverse=True)
+        completed = []
+        for length, example in window:
+            if self.bucket_boundaries is None:
+                bucket = 0
+            else:
+                bucket = int(np.searchsorted(
+                    self.bucket_boundaries, length, side='right'))
+            batch = pending.setdefault(bucket, _PendingBatch())
+            if len(batch.examples) > 0 and self._cost(
+                    batch, length) > self.max_total_size:
+                completed.append(self._finalize(batch.examples))
+                batch = pending[bucket] = _PendingBatch()
+            batch.append(length, example)
+            if (
+                    self.max_batch_size is not None
+                    and len(batch.examples) >= self.max_batch_size
+            ):
+                completed.append(self._finalize(batch.examples))
+                pending[bucket] = _PendingBatch()
+        if self.shuffle:
+            self.rng.shuffle(completed)
+        return completed
+
+    def __iter__(self, with_key=False):
+        if with_key:
+            raise NotImplementedError(
+                f'{self.__class__.__name__} does not support with_key')
+        self._reset_statistics()
+        pending = {}
+        window = []
+        window_size = 1 if self.sort_window is None else self.sort_window
+        for example in self.input_dataset:
+            window.append((self._get_length(example), example))
+            if len(window) >= window_size:
+                yield from self._process_window(window, pending)
+                window = []
+        yield from self._process_window(window, pending)
+
+        for bucket in sorted(pending.keys()):
+            batch = pending[bucket].examples
+            if len(batch) == 0:
+                continue
+            if self.drop_incomplete:
+                self._statistics['num_dropped'] += len(batch)
+            else:
+                yield self._finalize(batch)
+
+
+def batch_by_budget(dataset, len_key, max_total_size, **kwargs):
+    """
+    Wrapper for `DynamicBatchDataset`, e.g.:
+
+        dataset.apply(functools.partial(
+            batch_by_budget, len_key='num_samples', max_total_size=16000 * 100,
+            sort_window=1000, shuffle=True,
+        )).map(PaddedCollate())
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new([{'num_samples': n} for n in [4, 3, 2, 1]])
+    >>> [len(b) for b in batch_by_budget(ds, 'num_samples', 8)]
+    [2, 2]
+    """
+    return DynamicBatchDataset(dataset, len_key, max_total_size, **kwargs)
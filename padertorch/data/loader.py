@@ -0,0 +1,258 @@
+import copy
+import warnings
+
+import numpy as np
+import torch
+from lazy_dataset import FilterException
+
+__all__ = [
+    'LazyMapDataset',
+    'LazyIterableDataset',
+    'to_data_loader',
+]
+
+
+def _identity(batch):
+    # Keeps the examples as they are (like `lazy_dataset.Dataset.batch`),
+    # the default collate of torch would convert them to tensors.
+    return batch
+
+
+def _seed_numpy(worker_id):
+    # torch seeds `random` and torch in each worker, but not numpy. Without
+    # this, all workers draw the same random augmentations.
+    info = torch.utils.data.get_worker_info()
+    np.random.seed(info.seed % 2**32)
+
+
+def _shard(dataset, index, num_shards):
+    # Slices the last indexable dataset of the pipeline, e.g. before a
+    # filter or unbatch. The non-indexable datasets after it are shallow
+    # copies with the sliced input. None, if the pipeline has no indexable
+    # part, that can be reached over `input_dataset`.
+    if dataset.indexable:
+        return dataset[index::num_shards]
+    input_dataset = getattr(dataset, 'input_dataset', None)
+    if input_dataset is None:
+        return None
+    input_dataset = _shard(input_dataset, index, num_shards)
+    if input_dataset is None:
+        return None
+    dataset = copy.copy(dataset)
+    dataset.input_dataset = input_dataset
+    return dataset
+
+
+class _WorkerInitFn:
+    def __init__(self, worker_init_fn=None):
+        self.worker_init_fn = worker_init_fn
+
+    def __call__(self, worker_id):
+        _seed_numpy(worker_id)
+        if self.worker_init_fn is not None:
+            self.worker_init_fn(worker_id)
+
+
+class LazyMapDataset(torch.utils.data.Dataset):
+    """
+    Map-style torch dataset of an indexable lazy_dataset pipeline, so the
+    `torch.utils.data.DataLoader` (sampler, shuffle, batch_size, ...) can
+    be used.
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new([1, 2, 3]).map(lambda x: 2 * x)
+    >>> torch_ds = LazyMapDataset(ds)
+    >>> len(torch_ds), torch_ds[1]
+    (3, 4)
+    """
+    def __init__(self, dataset):
+        assert dataset.indexable, (
+            f'{self.__class__.__name__} needs an indexable dataset, '
+            f'use LazyIterableDataset for:\n{dataset!r}'
+        )
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        return self.dataset[int(index)]
+
+
+class LazyIterableDataset(torch.utils.data.IterableDataset):
+    """
+    Iterable torch dataset of a lazy_dataset pipeline, e.g. with
+    `shuffle(reshuffle=True)` or `filter`.
+
+    With multiple DataLoader workers, each worker freezes the pipeline
+    (`dataset.copy(freeze=True)`, like `prefetch`) with a seed, that is the
+    same for all workers and changes in each epoch. So all workers see the
+    same permutation and each worker yields a disjoint shard of it:
+    Every example is yielded exactly once per epoch. When the frozen
+    pipeline is not indexable (e.g. a `filter` or `unbatch` after the
+    shuffle), the last indexable dataset of the pipeline is sharded, so
+    each worker processes only its shard. Without an indexable part, each
+    worker iterates over the complete pipeline and keeps every
+    `num_workers`-th example, which is warned about.
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new(list(range(10))).shuffle(reshuffle=True)
+    >>> loader = torch.utils.data.DataLoader(
+    ...     LazyIterableDataset(ds), batch_size=None, num_workers=2,
+    ...     collate_fn=_identity)
+    >>> sorted(loader)
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    """
+    def __init__(self, dataset, catch_filter_exception=False):
+        """
+
+        Args:
+            dataset: lazy_dataset pipeline.
+            catch_filter_exception: If True, examples that raise a
+                `lazy_dataset.FilterException` are skipped.
+        """
+        self.dataset = dataset
+        self.catch_filter_exception = catch_filter_exception
+        # Number of epochs of this copy (i.e. of a persistent worker)
+        self._epoch = 0
+
+    def __len__(self):
+        # An upper bound, if examples are filtered. Raises a TypeError, when
+        # the length is unknown.
+        return len(self.dataset)
+
+    def _iterate(self, dataset):
+        if not self.catch_filter_exception:
+            yield from dataset
+            return
+        iterator = iter(dataset)
+        while True:
+            try:
+                yield next(iterator)
+            except FilterException:
+                continue
+            except StopIteration:
+                return
+
+    def __iter__(self):
+        info = torch.utils.data.get_worker_info()
+        if info is None or info.num_workers == 1:
+            yield from self._iterate(self.dataset)
+            return
+
+        # info.seed is base_seed + worker id, where base_seed is drawn by the
+        # DataLoader for each epoch. Persistent workers keep their seed,
+        # hence the epoch counter.
+        seed = np.random.SeedSequence(
+            [info.seed - info.id, self._epoch]).generate_state(1)[0]
+        self._epoch += 1
+        rng_state = np.random.get_state()
+        np.random.seed(seed)
+        dataset = self.dataset.copy(freeze=True)
+        np.random.set_state(rng_state)
+
+        if dataset.indexable:
+            for index in range(info.id, len(dataset), info.num_workers):
+                try:
+                    yield dataset[index]
+                except FilterException:
+                    if not self.catch_filter_exception:
+                        raise
+        else:
+            sharded = _shard(dataset, info.id, info.num_workers)
+            if sharded is not None:
+                yield from self._iterate(sharded)
+                return
+            warnings.warn(
+                f'{self.__class__.__name__}: The pipeline has no indexable '
+                f'part to shard, each of the {info.num_workers} workers '
+                f'runs the complete pipeline:\n{dataset!r}',
+                UserWarning,
+            )
+            for index, example in enumerate(self._iterate(dataset)):
+                if index % info.num_workers == info.id:
+                    yield example
+
+
+def to_data_loader(
+        dataset,
+        batch_size=None,
+        shuffle=False,
+        collate_fn=None,
+        num_workers=0,
+        seed=None,
+        catch_filter_exception=False,
+        worker_init_fn=None,
+        **kwargs,
+):
+    """
+    Wraps a lazy_dataset pipeline (usually before the `batch`) in a
+    `torch.utils.data.DataLoader`, as an alternative to
+    `dataset.prefetch(...)`. The DataLoader supports persistent workers
+    (`persistent_workers=True`), a pin memory thread (`pin_memory=True`,
+    the collate_fn has to return tensors) and `prefetch_factor`.
+    The DataLoader can be used in `Trainer.train` and `ValidationHook`
+    like a lazy_dataset.
+
+    Indexable pipelines are wrapped in a `LazyMapDataset` and can be
+    shuffled by the DataLoader (`shuffle=True`), other pipelines (e.g. with
+    `shuffle(reshuffle=True)` or `filter`) in a `LazyIterableDataset`,
+    that shards the pipeline across the workers.
+
+        train_loader = to_data_loader(
+            dataset.map(audio_reader).map(stft),
+            batch_size=16, shuffle=True,
+            collate_fn=pt.data.utils.PaddedCollate(to_torch=True),
+            num_workers=8, persistent_workers=True, pin_memory=True,
+            seed=0,
+        )
+        trainer.train(train_loader)
+
+    Args:
+        dataset: lazy_dataset pipeline.
+        batch_size: If None, no batching, e.g. when the pipeline batches.
+        shuffle: Shuffle an indexable pipeline in each epoch.
+        collate_fn: Function that gets the list of examples of a batch.
+            By default, the examples (or the list of examples) are not
+            changed.
+        num_workers: Number of worker processes.
+        seed: Seed of the DataLoader generator, that determines the
+            shuffling and the seeds of the workers (torch and numpy).
+        catch_filter_exception: Skip examples, that raise a
+            `lazy_dataset.FilterException`.
+        worker_init_fn: Called in the workers after numpy is seeded.
+        **kwargs: Forwarded to the DataLoader (e.g. pin_memory,
+            persistent_workers, prefetch_factor, drop_last).
+
+    Returns:
+        torch.utils.data.DataLoader
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new(list(range(6))).map(lambda x: x ** 2)
+    >>> list(to_data_loader(ds, batch_size=4))
+    [[0, 1, 4, 9], [16, 25]]
+    """
+    if dataset.indexable and not catch_filter_exception:
+        torch_dataset = LazyMapDataset(dataset)
+    else:
+        assert not shuffle, (
+            'shuffle is only supported for indexable datasets, use '
+            'dataset.shuffle(reshuffle=True) instead.'
+        )
+        torch_dataset = LazyIterableDataset(
+            dataset, catch_filter_exception=catch_filter_exception)
+
+    generator = None
+    if seed is not None:
+        generator = torch.Generator().manual_seed(seed)
+
+    return torch.utils.data.DataLoader(
+        torch_dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        collate_fn=_identity if collate_fn is None else collate_fn,
+        num_workers=num_workers,
+        worker_init_fn=_WorkerInitFn(worker_init_fn),
+        generator=generator,
+        **kwargs,
+    )
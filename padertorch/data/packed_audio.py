@@ -0,0 +1,252 @@
+"""
+Packed audio container: Many small audio files are stored in a few large
+shard files, so that reading an example does not need to open a file on
+the (network) filesystem.
+
+Layout of the directory created by `pack_database`:
+
+    <packed_dir>/shard_00000.bin  # Raw samples of many files
+    <packed_dir>/shard_00001.bin
+    <packed_dir>/index.json       # Path -> shard, offset, shape, dtype
+
+The index is keyed by the audio paths in the database JSON, so the
+database JSON is unchanged. `PackedAudioReader` replaces
+`paderbox.io.recursive_load_audio` in the data pipeline:
+
+    reader = PackedAudioReader(packed_dir)
+    dataset = db.get_dataset('train').map(reader)  # Adds 'audio_data'
+
+The samples are memory mapped, so the returned arrays are views into the
+shards (no copy) and reading a segment reads only the pages of the
+segment.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from paderbox.utils.nested import nested_op
+
+__all__ = [
+    'pack_database',
+    'PackedAudioReader',
+    'PackedAudio',
+]
+
+# Alignment of the entries in the shards, e.g. for SIMD loads.
+_ALIGNMENT = 64
+
+
+def _get_audio_paths(database, audio_key, dataset_names):
+    if dataset_names is None:
+        dataset_names = list(database['datasets'].keys())
+    elif isinstance(dataset_names, str):
+        dataset_names = [dataset_names]
+    paths = []
+    for dataset_name in dataset_names:
+        for example in database['datasets'][dataset_name].values():
+            if audio_key not in example:
+                continue
+            nested_op(paths.append, example[audio_key])
+    # Remove duplicates, but keep the order
+    return list(dict.fromkeys(str(p) for p in paths))
+
+
+def pack_database(
+        database,
+        packed_dir,
+        dataset_names=None,
+        audio_key='audio_path',
+        dtype=np.float32,
+        shard_size=2**30,
+        num_workers=8,
+):
+    """
+    Packs the audio files of a database JSON into shard files.
+
+    Args:
+        database: Database dict or path to the database JSON, e.g. created
+            by `padertorch.contrib.data.wsj0_mix.create_json`.
+        packed_dir: Output directory.
+        dataset_names: Datasets to pack. If None, all datasets.
+        audio_key: Key of the (possibly nested) audio paths in the examples.
+        dtype: dtype of the stored samples. `np.int16` halves the size
+            compared to float32, but the reader then returns int16 samples.
+        shard_size: Approximate size of a shard in bytes.
+        num_workers: Number of threads to decode the files.
+
+    Returns:
+        The index, i.e. a dict from the path to the location in the shards.
+
+    >>> import tempfile, soundfile
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     tmp_dir = Path(tmp_dir)
+    ...     for name in ['a', 'b']:
+    ...         soundfile.write(str(tmp_dir / f'{name}.wav'),
+    ...                         np.linspace(0, 0.5, 100), 8000, 'FLOAT')
+    ...     database = {'datasets': {'train': {
+    ...         name: {'audio_path': {'observation': str(tmp_dir / f'{name}.wav')}}
+    ...         for name in ['a', 'b']
+    ...     }}}
+    ...     index = pack_database(database, tmp_dir / 'packed', shard_size=300)
+    ...     print(sorted(os.listdir(tmp_dir / 'packed')))
+    ...     example = database['datasets']['train']['b']
+    ...     example = PackedAudioReader(tmp_dir / 'packed')(example)
+    ...     print(example['audio_data']['observation'][-3:])
+    ['index.json', 'shard_00000.bin', 'shard_00001.bin']
+    [0.48989898 0.4949495  0.5       ]
+    """
+    import paderbox as pb
+
+    if not isinstance(database, dict):
+        database = pb.io.load_json(database)
+    packed_dir = Path(packed_dir)
+    packed_dir.mkdir(parents=True, exist_ok=True)
+    dtype = np.dtype(dtype)
+
+    paths = _get_audio_paths(database, audio_key, dataset_names)
+
+    def load(path):
+        signal, sample_rate = pb.io.load_audio(
+            path, dtype=dtype, return_sample_rate=True)
+        return path, np.ascontiguousarray(signal), sample_rate
+
+    index = {}
+    shard_id = 0
+    fid = None
+    try:
+        with ThreadPoolExecutor(num_workers) as executor:
+            for path, signal, sample_rate in executor.map(load, paths):
+                if fid is None or fid.tell() >= shard_size:
+                    if fid is not None:
+                        fid.close()
+                        shard_id += 1
+                    fid = open(packed_dir / f'shard_{shard_id:05d}.bin', 'wb')
+                offset = fid.tell()
+                fid.write(signal.tobytes())
+                padding = -fid.tell() % _ALIGNMENT
+                fid.write(b'\0' * padding)
+                index[path] = {
+                    'shard': f'shard_{shard_id:05d}.bin',
+                    'offset': offset,
+                    'shape': list(signal.shape),
+                    'dtype': dtype.str,
+                    'sample_rate': sample_rate,
+                }
+    finally:
+        if fid is not None:
+            fid.close()
+
+    # The index is written last, so an interrupted packing is detected.
+    pb.io.dump_json(index, packed_dir / 'index.json')
+    return index
+
+
+class PackedAudio:
+    """
+    Array-like handle of one packed audio file, similar to
+    `padertorch.data.audio.AudioFile`, e.g. for `Segmenter(lazy=True)`.
+    Slicing returns a view into the memory mapped shard.
+    """
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.path = path
+        self.shape = tuple(reader.index[path]['shape'])
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.path!r})'
+
+    def __getitem__(self, item):
+        return self.reader.load(self.path)[item]
+
+    def __array__(self, dtype=None, copy=None):
+        x = self.reader.load(self.path)
+        if dtype is not None:
+            x = x.astype(dtype)
+        return x
+
+
+class PackedAudioReader:
+    """
+    Reads the audio of the examples from the shards of `pack_database`.
+
+    As map function for a dataset, it adds the key `audio_data` with the
+    same structure as `audio_path`, like
+    `paderbox.io.recursive_load_audio(example['audio_path'])`, but the
+    arrays are copy-on-write memory maps of the shards (no copy).
+    With `lazy=True`, `PackedAudio` handles are added instead, that read on
+    slicing.
+    """
+    def __init__(
+            self,
+            packed_dir,
+            audio_key='audio_path',
+            target_key='audio_data',
+            lazy=False,
+    ):
+        """
+
+        Args:
+            packed_dir: Directory created by `pack_database`.
+            audio_key: Key of the (possibly nested) audio paths.
+            target_key: Key for the loaded audio.
+            lazy: If True, add `PackedAudio` handles instead of arrays.
+        """
+        import paderbox as pb
+        self.packed_dir = Path(packed_dir)
+        self.audio_key = audio_key
+        self.target_key = target_key
+        self.lazy = lazy
+        self.index = pb.io.load_json(self.packed_dir / 'index.json')
+        self._shards = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Each process opens the shards itself.
+        state['_shards'] = {}
+        return state
+
+    def _get_shard(self, name):
+        # The shards stay open, so a load does not open a file.
+        if name not in self._shards:
+            self._shards[name] = open(self.packed_dir / name, 'rb')
+        return self._shards[name]
+
+    def load(self, path, start=0, stop=None):
+        """
+        Returns the samples `start` to `stop` of the file `path` as a
+        copy-on-write memory map of the shard, i.e. in-place modifications
+        are private to the returned array.
+        """
+        entry = self.index[str(path)]
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        if int(np.prod(shape)) == 0:
+            # mmap cannot map zero bytes.
+            x = np.zeros(shape, dtype=dtype)
+        else:
+            # A new mapping for each load, like BatchCache, so
+            # modifications are not visible in later loads.
+            x = np.asarray(np.memmap(
+                self._get_shard(entry['shard']), dtype=dtype, mode='c',
+                offset=entry['offset'], shape=shape,
+            ))
+        if start != 0 or stop is not None:
+            x = x[..., start:stop]
+        return x
+
+    def __call__(self, example):
+        if self.lazy:
+            def load(path):
+                return PackedAudio(self, str(path))
+        else:
+            load = self.load
+        example[self.target_key] = nested_op(load, example[self.audio_key])
+        return example
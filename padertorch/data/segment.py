@@ -1,3 +1,4 @@
+from collections.abc import MutableMapping
 from copy import copy
 from typing import Union, List
 
@@ -97,6 +98,9 @@ class Segmenter:
             If `False` the residual values are disgarded.
         flatten_separator: specifies the separator used to separate the keys
             in the flattened dictionary. Defaults to `.`
+        lazy: If `True`, return `LazySegment` objects instead of dicts.
+            They share the input example and slice the segmented values on
+            access, see `LazySegment`.
     """
 
     def __init__(self, length: int = -1, shift: int = None,
@@ -107,7 +111,8 @@ class Segmenter:
                  anchor: Union[int, str] = 'left',
                  mode: 'str' = 'constant',
                  padding: bool = False,
-                 flatten_separator: str = '.'):
+                 flatten_separator: str = '.',
+                 lazy: bool = False):
 
         self.include = None if include_keys is None else to_list(include_keys)
         self.exclude = [] if exclude_keys is None else to_list(exclude_keys)
@@ -151,6 +156,7 @@ class Segmenter:
             assert anchor in [0, 'left'], (padding, anchor)
         self.padding = padding
         self.flatten_separator = flatten_separator
+        self.lazy = lazy
 
     def __call__(self, example: dict, rng=np.random) -> List[dict]:
         """
@@ -183,8 +189,11 @@ class Segmenter:
         else:
             raise TypeError('Unknown type for copy keys', self.copy_keys)
 
-        if any([not isinstance(value, (np.ndarray, torch.Tensor))
-                for value in to_segment.values()]):
+        if any([
+            not isinstance(value, (np.ndarray, torch.Tensor))
+            and not (self.lazy and _is_array_like(value))
+            for value in to_segment.values()
+        ]):
             raise ValueError(
                 'This segmenter only works on numpy arrays',
                 'However, the following keys point to other types:',
@@ -210,6 +219,20 @@ class Segmenter:
             import lazy_dataset
             raise lazy_dataset.FilterException()
 
+        if self.lazy:
+            if self.length == -1:
+                boundaries = [(0, to_segment_length)]
+            else:
+                boundaries = self.get_boundaries(to_segment_length, rng=rng)
+            shared = dict(to_copy)
+            shared.update(to_segment)
+            axis = dict(zip(to_segment_keys, axis))
+            return [
+                LazySegment(shared, axis, int(start), int(stop),
+                            self.flatten_separator)
+                for start, stop in boundaries
+            ]
+
         # Shortcut if segmentation is disabled
         if self.length == -1:
             to_copy.update(to_segment)
@@ -261,6 +284,29 @@ class Segmenter:
         >>> len(boundaries), len(segmented['x'])
         (61, 61)
         """
+        length, shift, anchor, boundaries = self._get_boundaries(
+            to_segment_length, rng=rng)
+
+        segmented = {key: segment(
+            signal, length=length, shift=shift, rng=rng, axis=axis[i],
+            anchor=anchor, padding=self.padding, mode='constant'
+        ) for i, (key, signal) in enumerate(to_segment.items())}
+        return boundaries, segmented
+
+    def get_boundaries(self, to_segment_length: int, rng=np.random):
+        """
+        Returns the boundaries of the segments that `segment` would produce.
+
+        >>> Segmenter(length=10, shift=5).get_boundaries(24).T
+        array([[ 0,  5, 10],
+               [10, 15, 20]])
+        >>> Segmenter(length=10, shift=5, padding=True).get_boundaries(24).T
+        array([[ 0,  5, 10, 15],
+               [10, 15, 20, 25]])
+        """
+        return self._get_boundaries(to_segment_length, rng=rng)[-1]
+
+    def _get_boundaries(self, to_segment_length, rng):
         length, shift, to_segment_length = _get_segment_length_for_mode(
             to_segment_length, self.length, self.shift,
             self.mode, self.padding
@@ -278,12 +324,7 @@ class Segmenter:
             to_segment_length, length, shift, anchor=anchor,
             mode='constant', rng=rng
         )
-
-        segmented = {key: segment(
-            signal, length=length, shift=shift, rng=rng, axis=axis[i],
-            anchor=anchor, padding=self.padding, mode='constant'
-        ) for i, (key, signal) in enumerate(to_segment.items())}
-        return boundaries, segmented
+        return length, shift, anchor, boundaries
 
     def get_to_segment_keys(self, example: dict):
         if self.include is None:
@@ -333,6 +374,170 @@ class Segmenter:
             raise TypeError('This should never be reached', self.axis)
 
 
+def _is_array_like(value):
+    return hasattr(value, 'shape') and hasattr(value, '__getitem__')
+
+
+class LazySegment(MutableMapping):
+    """
+    A segment of an example, that is returned by `Segmenter(lazy=True)`.
+
+    All segments of an example share the (flattened) example. The segmented
+    values are sliced on access, i.e. numpy arrays and torch tensors yield
+    views and the remaining values are not copied. Setting and deleting
+    keys only affects this segment.
+
+    The segmented values may be array-like objects that are not yet loaded,
+    e.g. a `padertorch.data.audio.AudioFile` or another reader that supports
+    `.shape` and slicing. In this case, only the segment is read on the
+    first access and kept for further accesses.
+
+    Segments that exceed the signal (`padding=True`) are zero padded.
+
+    >>> ex = {'x': np.arange(10), 'meta': {'speaker': 'a'}}
+    >>> a, b = Segmenter(length=4, include_keys='x', lazy=True)(ex)
+    >>> b['x']
+    array([4, 5, 6, 7])
+    >>> np.shares_memory(b['x'], ex['x'])
+    True
+    >>> b['meta'] is a['meta']
+    False
+    >>> b['meta']
+    {'speaker': 'a'}
+    >>> b['num_samples'] = 4
+    >>> b.to_dict()
+    {'meta': {'speaker': 'a'}, 'x': array([4, 5, 6, 7]), 'segment_start': 4, 'segment_stop': 8, 'num_samples': 4}
+    >>> 'num_samples' in a
+    False
+    """
+    def __init__(self, shared: dict, axis: dict, start: int, stop: int,
+                 flatten_separator: str = '.'):
+        """
+
+        Args:
+            shared: Flat dict that is shared between the segments
+            axis: dict from the flat keys of the values to segment to the
+                axis
+            start: Start of the segment
+            stop: Stop of the segment
+            flatten_separator: separator of the flat keys
+        """
+        self._shared = shared
+        self._axis = axis
+        self.start = start
+        self.stop = stop
+        self._sep = flatten_separator
+        self._overwrites = {}
+        self._deleted = set()
+        self._read_cache = {}
+
+    @property
+    def segmented_keys(self):
+        """The flat keys of the segmented values."""
+        return list(self._axis.keys())
+
+    def _get_segment(self, key):
+        value = self._shared[key]
+        if not isinstance(value, (np.ndarray, torch.Tensor)):
+            if key not in self._read_cache:
+                self._read_cache[key] = self._slice(value, self._axis[key])
+            return self._read_cache[key]
+        return self._slice(value, self._axis[key])
+
+    def _slice(self, value, axis):
+        axis = axis % len(value.shape)
+        num_samples = value.shape[axis]
+        slc = [slice(None)] * len(value.shape)
+        slc[axis] = slice(self.start, min(self.stop, num_samples))
+        segment_ = value[tuple(slc)]
+        if self.stop > num_samples:
+            pad_width = [(0, 0)] * len(value.shape)
+            pad_width[axis] = (0, self.stop - max(num_samples, self.start))
+            if isinstance(segment_, torch.Tensor):
+                segment_ = torch.nn.functional.pad(
+                    segment_, [p for w in pad_width[::-1] for p in w])
+            else:
+                segment_ = np.pad(segment_, pad_width, mode='constant')
+        return segment_
+
+    def _flat_items(self):
+        for key, value in self._shared.items():
+            if key in self._axis:
+                value = self._get_segment(key)
+            yield key, value
+        yield 'segment_start', self.start
+        yield 'segment_stop', self.stop
+
+    def _top_level_keys(self):
+        keys = dict.fromkeys([
+            key.split(self._sep)[0] for key in self._shared.keys()
+        ])
+        keys.update(dict.fromkeys(['segment_start', 'segment_stop']))
+        keys.update(dict.fromkeys(self._overwrites))
+        return [k for k in keys if k not in self._deleted]
+
+    def to_dict(self) -> dict:
+        """Returns the segment as dict, as `Segmenter(lazy=False)` does."""
+        example = deflatten(dict(self._flat_items()), sep=self._sep)
+        for key in self._deleted:
+            example.pop(key, None)
+        example.update(self._overwrites)
+        return example
+
+    def __getitem__(self, key):
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._overwrites:
+            return self._overwrites[key]
+        if key in self._axis:
+            return self._get_segment(key)
+        if key == 'segment_start':
+            return self.start
+        if key == 'segment_stop':
+            return self.stop
+        if key in self._shared:
+            return self._shared[key]
+        # Only the values below key are sliced or read
+        prefix = key + self._sep
+        nested = {
+            k[len(prefix):]: self._get_segment(k) if k in self._axis else v
+            for k, v in self._shared.items()
+            if k.startswith(prefix)
+        }
+        if len(nested) == 0:
+            raise KeyError(key)
+        # Keep the view, so inplace modifications (e.g.
+        # segment['audio_data']['x'] = ...) persist.
+        nested = deflatten(nested, sep=self._sep)
+        self._overwrites[key] = nested
+        return nested
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        self._overwrites[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overwrites.pop(key, None)
+        self._deleted.add(key)
+
+    def __iter__(self):
+        return iter(self._top_level_keys())
+
+    def __len__(self):
+        return len(self._top_level_keys())
+
+    def __contains__(self, key):
+        return key in self._top_level_keys()
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}('
+            f'start={self.start}, stop={self.stop}, keys={list(self)})'
+        )
+
+
 def _get_rand_int(rng, *args, **kwargs):
     if hasattr(rng, 'randint'):
         return rng.randint(*args, **kwargs)
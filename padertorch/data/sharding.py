@@ -0,0 +1,232 @@
+import numpy as np
+from lazy_dataset import Dataset
+
+__all__ = [
+    'get_rank_and_world_size',
+    'ShardDataset',
+]
+
+
+def get_rank_and_world_size():
+    """
+    Returns the rank and the number of processes of an initialized
+    `torch.distributed` process group, otherwise of `dlp_mpi` (1 process,
+    when the script is not started with mpiexec or dlp_mpi is not
+    installed).
+
+    >>> get_rank_and_world_size()
+    (0, 1)
+    """
+    import torch.distributed
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_rank(), torch.distributed.get_world_size()
+    try:
+        import dlp_mpi
+    except ImportError:
+        return 0, 1
+    return dlp_mpi.RANK, dlp_mpi.SIZE
+
+
+class ShardDataset(Dataset):
+    """
+    Shard of an indexable dataset for one of `world_size` processes (e.g.
+    the ranks of a DistributedDataParallel training or of a dlp_mpi
+    evaluation).
+
+    In each iteration (epoch), all ranks shuffle the dataset with the same
+    seed, so the shards are disjoint and change in each epoch. The examples
+    are assigned in groups of `world_size`: With `lengths`, the longest
+    example of a group is assigned to the rank with the smallest total
+    length so far, so the total durations of the shards differ at most by
+    the longest example. Without `lengths`, the number of examples is
+    balanced.
+
+    The last group is smaller, when `len(dataset)` is not divisible by
+    `world_size`. In a training, all ranks have to do the same number of
+    steps, otherwise the ranks with more steps wait forever for the others
+    in the gradient synchronization. Hence, with `tail='pad'` (default),
+    the short shards are filled up with one repeated example and with
+    `tail='drop'`, the long shards drop their last example. With
+    `tail=None`, each example is in exactly one shard, e.g. for an
+    evaluation. Filter (e.g. `catch`) and dynamic batching after the
+    sharding may cause different numbers of steps again.
+
+    Each rank counts its iterations, use `set_epoch` when the training
+    is resumed.
+
+        dataset = db.get_dataset('train')
+        dataset = ShardDataset(
+            dataset, lengths=lambda ex: ex['num_samples'], seed=0)
+        dataset = dataset.map(audio_reader).prefetch(4, 8).batch(8)
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new(list(range(10)))
+    >>> shards = [ShardDataset(ds, rank, 3, tail=None) for rank in range(3)]
+    >>> [list(shard) for shard in shards]
+    [[4, 7, 9, 1], [6, 3, 0], [2, 5, 8]]
+    >>> [list(shard) for shard in shards]  # Next epoch
+    [[9, 8, 0, 5], [1, 7, 4], [3, 6, 2]]
+    >>> [len(ShardDataset(ds, rank, 3)) for rank in range(3)]
+    [4, 4, 4]
+
+    Balanced duration:
+    >>> lengths = [1, 1, 1, 1, 1, 1, 1, 1, 8, 8]
+    >>> for rank in range(2):
+    ...     shard = ShardDataset(ds, rank, 2, lengths=lengths, seed=1)
+    ...     print(sorted(shard), sum([lengths[i] for i in shard]))
+    [0, 2, 5, 6, 8] 12
+    [1, 3, 4, 7, 9] 12
+    """
+    def __init__(
+            self,
+            input_dataset,
+            rank=None,
+            world_size=None,
+            seed=0,
+            shuffle=True,
+            lengths=None,
+            tail='pad',
+    ):
+        """
+
+        Args:
+            input_dataset: Indexable dataset, e.g. `db.get_dataset(...)`.
+                It has to have the same order on all ranks.
+            rank: The index of this shard. If None, the rank of
+                `get_rank_and_world_size`.
+            world_size: The number of shards. If None, the world size of
+                `get_rank_and_world_size`.
+            seed: Seed of the shuffling, has to be the same on all ranks.
+            shuffle: If False, the dataset is not shuffled, i.e. the shards
+                do not change between the epochs.
+            lengths: Optional lengths (e.g. durations) of the examples to
+                balance the shards by the total length. A sequence or a
+                function, that is called once for each example of
+                `input_dataset`.
+            tail: 'pad', 'drop' or None. How to handle shards, that have one
+                example more than others (see above).
+        """
+        assert input_dataset.indexable, (
+            f'{self.__class__.__name__} needs an indexable dataset, '
+            f'shuffle is done by the {self.__class__.__name__}:\n'
+            f'{input_dataset!r}'
+        )
+        if rank is None or world_size is None:
+            default_rank, default_world_size = get_rank_and_world_size()
+            rank = default_rank if rank is None else rank
+            world_size = default_world_size if world_size is None \
+                else world_size
+        assert 0 <= rank < world_size, (rank, world_size)
+        assert tail in ['pad', 'drop', None], tail
+
+        if callable(lengths):
+            lengths = [lengths(example) for example in input_dataset]
+        if lengths is not None:
+            lengths = np.asarray(lengths)
+            assert lengths.shape == (len(input_dataset),), (
+                lengths.shape, len(input_dataset))
+
+        self.input_dataset = input_dataset
+        self.rank = rank
+        self.world_size = world_size
+        self.seed = seed
+        self.shuffle = shuffle
+        self.lengths = lengths
+        self.tail = tail
+        self.epoch = 0
+        # Whether the shard of `self.epoch` was already returned.
+        self._epoch_started = False
+        self._indices_cache = None
+
+    def set_epoch(self, epoch):
+        """Sets the epoch of the next iteration."""
+        self.epoch = epoch
+        self._epoch_started = False
+
+    def _assign(self, order):
+        # Assigns `order` in groups of `world_size` to the ranks and returns
+        # the indices for this rank.
+        if self.lengths is None:
+            return order[self.rank::self.world_size]
+        totals = np.zeros(self.world_size, dtype=self.lengths.dtype)
+        indices = []
+        for start in range(0, len(order), self.world_size):
+            group = order[start:start + self.world_size]
+            # Longest example for the rank with the smallest total. The
+            # sorts are stable, hence all ranks get the same result.
+            group = group[np.argsort(-self.lengths[group], kind='stable')]
+            ranks = np.argsort(totals, kind='stable')[:len(group)]
+            totals[ranks] += self.lengths[group]
+            position = np.flatnonzero(ranks == self.rank)
+            if len(position) > 0:
+                indices.append(group[position[0]])
+        return np.array(indices, dtype=order.dtype)
+
+    def indices(self, epoch=None):
+        """The indices in `input_dataset` of the shard in an epoch."""
+        if epoch is None:
+            epoch = self.epoch
+        if self._indices_cache is not None \
+                and self._indices_cache[0] == epoch:
+            return self._indices_cache[1]
+
+        num_examples = len(self.input_dataset)
+        if self.shuffle:
+            rng = np.random.default_rng([self.seed, epoch])
+            order = rng.permutation(num_examples)
+        else:
+            order = np.arange(num_examples)
+        indices = self._assign(order)
+
+        if self.tail == 'pad':
+            size = -(-num_examples // self.world_size)
+            if num_examples > 0 and len(indices) < size:
+                indices = np.append(indices, order[self.rank % num_examples])
+        elif self.tail == 'drop':
+            indices = indices[:num_examples // self.world_size]
+
+        self._indices_cache = (epoch, indices)
+        return indices
+
+    def _next_indices(self):
+        # The epoch is advanced lazily, so `len` after `copy(freeze=True)`
+        # (e.g. in `PrefetchDataset.__iter__`) is the length of the returned
+        # shard. With lengths and tail=None, the length may change between
+        # the epochs.
+        if self._epoch_started:
+            self.epoch += 1
+        self._epoch_started = True
+        return self.indices()
+
+    def copy(self, freeze=False):
+        if freeze:
+            return self.input_dataset.copy(freeze=freeze)[
+                self._next_indices()]
+        else:
+            new = self.__class__(
+                self.input_dataset.copy(freeze=freeze),
+                rank=self.rank,
+                world_size=self.world_size,
+                seed=self.seed,
+                shuffle=self.shuffle,
+                lengths=self.lengths,
+                tail=self.tail,
+            )
+            new.epoch = self.epoch
+            new._epoch_started = self._epoch_started
+            return new
+
+    @property
+    def indexable(self):
+        return False
+
+    @property
+    def ordered(self) -> bool:
+        return not self.shuffle
+
+    def __len__(self):
+        return len(self.indices())
+
+    def __iter__(self):
+        for index in self._next_indices():
+            yield self.input_dataset[int(index)]
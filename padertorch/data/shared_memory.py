@@ -0,0 +1,335 @@
+import collections
+import os
+import tempfile
+import uuid
+import weakref
+
+import numpy as np
+import torch
+
+from padertorch.data.batch import _map_arrays
+
+__all__ = [
+    'SharedMemoryTransport',
+]
+
+# Alignment of the arrays in a block
+_ALIGNMENT = 64
+
+
+class _SharedArray:
+    """Descriptor of an array in a shared memory block."""
+    __slots__ = ['offset', 'shape', 'dtype', 'is_tensor']
+
+    def __init__(self, offset, shape, dtype, is_tensor):
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+        self.is_tensor = is_tensor
+
+    def __getstate__(self):
+        return self.offset, self.shape, self.dtype, self.is_tensor
+
+    def __setstate__(self, state):
+        self.offset, self.shape, self.dtype, self.is_tensor = state
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(offset={self.offset}, '
+            f'shape={self.shape}, dtype={self.dtype!r})'
+        )
+
+
+class _SharedExample:
+    """An example, where the large arrays are replaced by `_SharedArray`
+    descriptors into the block `block_index`."""
+    def __init__(self, example, block_index, num_bytes):
+        self.example = example
+        self.block_index = block_index
+        self.num_bytes = num_bytes
+
+
+# The blocks that are attached in this process, so that a worker attaches
+# each block only once, although the transport is unpickled for each task.
+_attached = {}
+
+
+def _attach(name):
+    # multiprocessing.shared_memory needs Python 3.8
+    from multiprocessing import shared_memory
+    if name in _attached:
+        return _attached[name]
+    try:
+        # Python >= 3.13: Do not register the block in the resource tracker,
+        # the owner unlinks it.
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # The child processes share the resource tracker of the owner,
+        # where the block is already registered.
+        shm = shared_memory.SharedMemory(name=name)
+    _attached[name] = shm
+    return shm
+
+
+class SharedMemoryTransport:
+    """
+    Transports the arrays of the examples (e.g. collated batches) from the
+    `prefetch` worker processes to the main process in shared memory blocks
+    instead of pickling them through a pipe:
+
+        transport = SharedMemoryTransport(num_blocks=16, block_size=2**26)
+        dataset = (
+            dataset
+            .map(transform)
+            .batch(batch_size).map(collate)
+            .map(transport.encode)     # In the worker processes
+            .prefetch(4, 8, backend='mp')
+            .map(transport.decode)     # In the main process
+        )
+
+    `encode` copies the numpy arrays (and CPU tensors) of at least
+    `min_size` bytes into a free block and the example only contains small
+    descriptors. `decode` returns arrays that are views into the block
+    (no copy). A block is reused, when all arrays of the example are
+    garbage collected. When no block is free or the arrays do not fit into a
+    block, the example is pickled as usual.
+
+    The blocks are allocated once by the main process. With
+    `pin_memory=True`, the blocks are registered as page-locked memory for
+    CUDA, so the arrays can be copied asynchronously to the GPU (e.g. with
+    `example_to_device`). The release of a block then waits until the
+    copies, that were started before the arrays were freed, are finished.
+
+    >>> transport = SharedMemoryTransport(num_blocks=2, block_size=2**20, min_size=0)
+    >>> example = {'x': np.arange(6.).reshape(2, 3), 'id': ['a', 'b']}
+    >>> encoded = transport.encode(example)
+    >>> encoded.example
+    {'x': _SharedArray(offset=0, shape=(2, 3), dtype='<f8'), 'id': ['a', 'b']}
+    >>> decoded = transport.decode(encoded)
+    >>> print(decoded)
+    {'x': array([[0., 1., 2.],
+           [3., 4., 5.]]), 'id': ['a', 'b']}
+    >>> del decoded  # Releases the block
+    >>> transport.close()
+    """
+    def __init__(
+            self,
+            num_blocks=16,
+            block_size=64 * 2**20,
+            min_size=2**14,
+            pin_memory=False,
+    ):
+        """
+
+        Args:
+            num_blocks: Number of shared memory blocks. Should be larger than
+                the prefetch buffer size plus the number of examples that are
+                in use in the main process.
+            block_size: Size of each block in bytes, i.e. the maximum size
+                of the arrays of one example.
+            min_size: Arrays smaller than this (in bytes) are pickled.
+            pin_memory: Register the blocks as page-locked memory for CUDA.
+        """
+        self.num_blocks = num_blocks
+        self.block_size = block_size
+        self.min_size = min_size
+        self.pin_memory = pin_memory
+
+        prefix = f'pt_{uuid.uuid4().hex[:16]}'
+        self.names = [f'{prefix}_{i}' for i in range(num_blocks)]
+        self.lock_file = os.path.join(
+            tempfile.gettempdir(), f'{prefix}.lock')
+
+        from multiprocessing import shared_memory
+        self._blocks = [
+            shared_memory.SharedMemory(name=name, create=True, size=block_size)
+            for name in self.names
+        ]
+        # Control block: One flag per block, 1 means in use.
+        self._flags_name = f'{prefix}_flags'
+        self._flags_block = shared_memory.SharedMemory(
+            name=self._flags_name, create=True, size=num_blocks)
+        self._flags_block.buf[:] = bytes(num_blocks)
+        open(self.lock_file, 'w').close()
+
+        self._pending = collections.deque()
+        self._pinned = False
+        self._is_owner = True
+        self._finalizer = weakref.finalize(
+            self, self._cleanup, self._blocks + [self._flags_block],
+            self.lock_file,
+        )
+
+        # Number of decoded examples, that used a block or were pickled.
+        self.num_shared = 0
+        self.num_fallback = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The worker processes attach the blocks by name.
+        for k in ['_blocks', '_flags_block', '_finalizer', '_pending']:
+            state[k] = None
+        state['_pinned'] = False
+        state['_is_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pending = collections.deque()
+
+    @staticmethod
+    def _cleanup(blocks, lock_file):
+        for block in blocks:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                block.close()
+            except BufferError:
+                # Arrays of the block are still in use. The memory is freed,
+                # when they are garbage collected.
+                pass
+        try:
+            os.remove(lock_file)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Releases the shared memory. Call it in the main process, when no
+        array of the transport is used anymore."""
+        if self._is_owner:
+            self._finalizer()
+
+    def _get_blocks(self):
+        if self._blocks is None:
+            self._blocks = [_attach(name) for name in self.names]
+            self._flags_block = _attach(self._flags_name)
+        return self._blocks
+
+    def _set_flag(self, index, value):
+        import fcntl  # Only available on POSIX
+        with open(self.lock_file, 'r+') as fid:
+            fcntl.flock(fid, fcntl.LOCK_EX)
+            self._flags_block.buf[index] = value
+
+    def _acquire(self):
+        import fcntl  # Only available on POSIX
+        with open(self.lock_file, 'r+') as fid:
+            fcntl.flock(fid, fcntl.LOCK_EX)
+            flags = self._flags_block.buf
+            for index in range(self.num_blocks):
+                if flags[index] == 0:
+                    flags[index] = 1
+                    return index
+        return None
+
+    def encode(self, example):
+        """Moves the arrays into a shared memory block (worker process)."""
+        blocks = self._get_blocks()
+        arrays = []
+
+        def collect(array):
+            if isinstance(array, torch.Tensor):
+                if array.device.type != 'cpu' or array.requires_grad:
+                    return array
+                nbytes = array.nelement() * array.element_size()
+            else:
+                if array.dtype.hasobject:
+                    return array
+                nbytes = array.nbytes
+            if nbytes >= self.min_size:
+                arrays.append(array)
+            return array
+
+        _map_arrays(example, collect)
+        if len(arrays) == 0:
+            return example
+        num_bytes = sum(
+            -(-a.nelement() * a.element_size() // _ALIGNMENT) * _ALIGNMENT
+            if isinstance(a, torch.Tensor)
+            else -(-a.nbytes // _ALIGNMENT) * _ALIGNMENT
+            for a in arrays
+        )
+        index = None if num_bytes > self.block_size else self._acquire()
+        if index is None:
+            return example
+
+        buffer = np.frombuffer(blocks[index].buf, dtype=np.uint8)
+        offset = 0
+        shared = {}
+        for array in arrays:
+            is_tensor = isinstance(array, torch.Tensor)
+            data = array.numpy() if is_tensor else array
+            target = buffer[offset:offset + data.nbytes].view(data.dtype)
+            target = target.reshape(data.shape)
+            np.copyto(target, data)
+            shared[id(array)] = _SharedArray(
+                offset, data.shape, data.dtype.str, is_tensor)
+            offset += -(-data.nbytes // _ALIGNMENT) * _ALIGNMENT
+        del buffer, target
+
+        example = _map_arrays(example, lambda a: shared.get(id(a), a))
+        return _SharedExample(example, index, offset)
+
+    def _pin(self):
+        # Register the blocks once as page-locked memory for CUDA.
+        cudart = torch.cuda.cudart()
+        for block in self._get_blocks():
+            ptr = np.frombuffer(block.buf, dtype=np.uint8).ctypes.data
+            cudart.cudaHostRegister(ptr, self.block_size, 0)
+        self._pinned = True
+
+    def _release_pending(self):
+        while self._pending and (
+                self._pending[0][0] is None or self._pending[0][0].query()):
+            _, index = self._pending.popleft()
+            self._set_flag(index, 0)
+
+    def _release(self, index):
+        if not self._finalizer.alive:
+            return  # Already closed
+        event = None
+        if self._pinned and torch.cuda.is_initialized():
+            # Asynchronous copies from the block may still be running.
+            event = torch.cuda.Event()
+            event.record()
+        self._pending.append((event, index))
+        if event is None:
+            self._release_pending()
+
+    def decode(self, example):
+        """Returns the example with arrays that are views into the shared
+        memory block (main process)."""
+        self._release_pending()
+        if not isinstance(example, _SharedExample):
+            self.num_fallback += 1
+            return example
+        self.num_shared += 1
+        blocks = self._get_blocks()
+        if self.pin_memory and not self._pinned \
+                and torch.cuda.is_available():
+            self._pin()
+
+        base = np.frombuffer(
+            blocks[example.block_index].buf, dtype=np.uint8,
+            count=example.num_bytes,
+        )
+        # The block is released, when all arrays (views of base) are freed.
+        weakref.finalize(base, self._release, example.block_index)
+
+        def load(array):
+            if not isinstance(array, _SharedArray):
+                return array
+            dtype = np.dtype(array.dtype)
+            size = int(np.prod(array.shape)) * dtype.itemsize
+            data = base[array.offset:array.offset + size].view(dtype)
+            data = data.reshape(array.shape)
+            if array.is_tensor:
+                data = torch.from_numpy(data)
+            return data
+
+        return _map_arrays(
+            example.example, load,
+            array_types=(np.ndarray, torch.Tensor, _SharedArray),
+        )
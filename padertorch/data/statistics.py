@@ -0,0 +1,225 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from padertorch.data.cache import config_hash
+
+__all__ = [
+    'Moments',
+    'map_reduce',
+    'cached_statistics',
+    'dataset_fingerprint',
+]
+
+
+class Moments:
+    """
+    Mean and variance with Welford's algorithm, that can be merged, e.g.
+    the statistics of different shards of a dataset.
+
+    >>> rng = np.random.RandomState(0)
+    >>> x = rng.randn(3, 100)
+    >>> a = Moments()
+    >>> a.update(x[:, :30], axis=-1)
+    >>> b = Moments()
+    >>> b.update(x[:, 30:], axis=-1)
+    >>> m = a.merge(b)
+    >>> np.allclose(m.mean, x.mean(-1)), np.allclose(m.var, x.var(-1))
+    (True, True)
+    >>> m.count
+    100
+    """
+    def __init__(self, count=0, mean=0., m2=0.):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, x, axis=None):
+        """Adds the values of `x`, where the statistics are computed over
+        `axis` (all axes, if None)."""
+        x = np.asarray(x, dtype=np.float64)
+        count = x.size if axis is None else np.prod(
+            [x.shape[a] for a in np.atleast_1d(axis)])
+        if count == 0:
+            return
+        mean = x.mean(axis=axis)
+        m2 = ((x - np.expand_dims(mean, axis) if axis is not None
+               else x - mean) ** 2).sum(axis=axis)
+        self._merge(int(count), mean, m2)
+
+    def _merge(self, count, mean, m2):
+        if self.count == 0:
+            self.count, self.mean, self.m2 = count, mean, m2
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def merge(self, other: 'Moments'):
+        """Returns the moments of the union of the values."""
+        new = Moments(self.count, self.mean, self.m2)
+        if other.count > 0:
+            new._merge(other.count, other.mean, other.m2)
+        return new
+
+    @property
+    def var(self):
+        return self.m2 / max(self.count, 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': np.asarray(self.mean).tolist(),
+            'm2': np.asarray(self.m2).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['count'], np.asarray(d['mean']), np.asarray(d['m2']))
+
+
+# State of the map_reduce workers. The forked workers inherit it, so the
+# dataset and the map function do not need to be pickled (e.g. lambdas).
+_worker_state = None
+
+
+def _init_worker(dataset, map_fn, num_shards):
+    global _worker_state
+    _worker_state = dataset, map_fn, num_shards
+
+
+def _map_shard(shard_index):
+    dataset, map_fn, num_shards = _worker_state
+    return map_fn(dataset.shard(num_shards, shard_index))
+
+
+def map_reduce(
+        dataset, map_fn, reduce_fn, num_workers=None, num_shards=None,
+):
+    """
+    Computes `map_fn` on shards of the dataset in a process pool and
+    merges the results with `reduce_fn`, e.g. to collect the statistics of
+    a training dataset before the training:
+
+        def map_fn(shard):
+            moments = Moments()
+            for example in shard:
+                moments.update(example['features'], axis=-1)
+            return moments
+        moments = map_reduce(dataset, map_fn, Moments.merge, num_workers=8)
+
+    Args:
+        dataset: Indexable dataset. Non indexable datasets are processed in
+            the main process.
+        map_fn: Function that gets a shard of the dataset and returns a
+            partial result.
+        reduce_fn: Function that merges two partial results. The order of the
+            partial results is the order of the shards.
+        num_workers: Number of processes. If None, `os.cpu_count()`.
+        num_shards: Number of shards, by default `num_workers`. More shards
+            than workers balance varying example costs.
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new(list(range(100)))
+    >>> map_reduce(ds, lambda shard: {*shard}, set.union, num_workers=2) == set(range(100))
+    True
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_shards is None:
+        num_shards = num_workers
+    if num_workers <= 1 or not dataset.indexable or len(dataset) < num_shards:
+        return map_fn(dataset)
+
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() \
+        else None
+    with ProcessPoolExecutor(
+            num_workers, mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker,
+            initargs=(dataset, map_fn, num_shards),
+    ) as executor:
+        results = list(executor.map(_map_shard, range(num_shards)))
+    result = results[0]
+    for r in results[1:]:
+        result = reduce_fn(result, r)
+    return result
+
+
+def cached_statistics(storage_dir, name, config, compute_fn, verbose=False):
+    """
+    Loads the statistics from `<storage_dir>/<name>_<config hash>.json` or
+    computes them with `compute_fn()` and saves them, so the statistics are
+    computed only once for each config (that should include everything that
+    changes the statistics, e.g. the dataset names and the transform
+    config).
+
+    Args:
+        storage_dir: Directory of the file. If None, nothing is cached.
+        name: Name of the statistics, e.g. 'audio_norm'.
+        config: JSON serializable config of the statistics.
+        compute_fn: Function without arguments that returns the statistics
+            as JSON serializable object.
+        verbose:
+
+    >>> with tempfile.TemporaryDirectory() as storage_dir:
+    ...     for _ in range(2):
+    ...         print(cached_statistics(
+    ...             storage_dir, 'test', {'a': 1}, lambda: print('compute') or [1]))
+    compute
+    [1]
+    [1]
+    """
+    if storage_dir is None:
+        return compute_fn()
+    filepath = (
+        Path(storage_dir).expanduser().absolute()
+        / f'{name}_{config_hash(config)[:16]}.json'
+    )
+    if filepath.exists():
+        with filepath.open() as fid:
+            statistics = json.load(fid)
+        if verbose:
+            print(f'Restored {name} from {filepath}')
+        return statistics
+
+    statistics = compute_fn()
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    # Atomic write, multiple processes (e.g. MPI) may compute the statistics
+    fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as fid:
+        json.dump(statistics, fid, sort_keys=True, indent=4)
+    os.replace(tmp_path, filepath)
+    if verbose:
+        print(f'Saved {name} to {filepath}')
+    return statistics
+
+
+def dataset_fingerprint(dataset):
+    """
+    Hash of the example ids of a dataset, e.g. to identify an unnamed
+    dataset in the config of `cached_statistics`. The ids are the keys of
+    the dataset or, if it has no keys, the 'example_id' of the examples.
+
+    >>> import lazy_dataset
+    >>> ds = lazy_dataset.new({'a': {}, 'b': {}})
+    >>> dataset_fingerprint(ds) == dataset_fingerprint(ds.map(len))
+    True
+    >>> dataset_fingerprint(ds) == dataset_fingerprint(ds[:1])
+    False
+    """
+    try:
+        example_ids = list(dataset.keys())
+    except NotImplementedError:
+        example_ids = [example['example_id'] for example in dataset]
+    return config_hash(example_ids)[:16]
@@ -0,0 +1,214 @@
+import collections
+import os
+import threading
+import time
+import uuid
+
+__all__ = [
+    'PipelineTelemetry',
+]
+
+# Timings of the current example of each telemetry in this thread. It is
+# module level, because the telemetry is pickled for the prefetch workers.
+_pending = threading.local()
+
+
+class _TimedStage:
+    """Wrapper of a transform, that measures the time of each call."""
+    def __init__(self, telemetry, name, fn):
+        self.telemetry_id = telemetry.id
+        self.name = name
+        self.fn = fn
+
+    def __call__(self, example):
+        pending = _get_pending(self.telemetry_id)
+        start = time.perf_counter()
+        try:
+            return self.fn(example)
+        finally:
+            pending['stages'][self.name] += time.perf_counter() - start
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r}, {self.fn!r})'
+
+
+class _TelemetryExample:
+    """An example with the timings of the worker, that prepared it."""
+    def __init__(self, example, stages, busy_time, worker, produced):
+        self.example = example
+        self.stages = stages
+        self.busy_time = busy_time
+        self.worker = worker
+        self.produced = produced
+
+
+def _get_pending(telemetry_id):
+    pending = getattr(_pending, 'telemetry', None)
+    if pending is None:
+        pending = _pending.telemetry = {}
+    if telemetry_id not in pending:
+        pending[telemetry_id] = {
+            'start': time.perf_counter(),
+            'stages': collections.defaultdict(float),
+        }
+    return pending[telemetry_id]
+
+
+def _pop_pending(telemetry_id):
+    return getattr(_pending, 'telemetry', {}).pop(telemetry_id, None)
+
+
+class PipelineTelemetry:
+    """
+    Measures, where the time of a lazy_dataset pipeline is spent:
+     - the time of each named transform (`timed`),
+     - the utilization of the prefetch workers (in total and per worker,
+       e.g. one slow worker, that gets the long examples) and
+     - the queue depth (number of prepared examples, that wait in the
+       prefetch buffer for the consumer).
+
+        telemetry = PipelineTelemetry()
+        dataset = (
+            dataset
+            .map(telemetry.timed('read', audio_reader))
+            .map(telemetry.timed('stft', stft))
+            .batch(batch_size)
+            .map(telemetry.timed('collate', Collate()))
+            .map(telemetry.encode)     # In the worker
+            .prefetch(4, 8)
+            .map(telemetry.decode)     # In the main process
+        )
+        trainer.register_hook(pt.train.hooks.DataPipelineTelemetryHook(telemetry))
+
+    The timings of all stages, that are executed in a worker for one output
+    example, are attached by `encode` to the example and collected by
+    `decode`, so this works with thread and process backends.
+    A worker is busy from its first timed stage of an example until
+    `encode`. The mean queue depth is estimated with Little's law from the
+    time between `encode` and `decode`.
+
+    With `enabled=False`, `timed` returns the transform and `encode` and
+    `decode` do nothing, so the instrumentation can stay in the pipeline.
+
+    >>> telemetry = PipelineTelemetry()
+    >>> square = telemetry.timed('square', lambda x: x ** 2)
+    >>> [telemetry.decode(telemetry.encode(square(x))) for x in range(3)]
+    [0, 1, 4]
+    >>> statistics = telemetry.statistics
+    >>> statistics['num_examples'], list(statistics['stage_time'])
+    (3, ['square'])
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Resets the statistics, e.g. at the start of a new epoch."""
+        with self._lock:
+            self._start = time.time()
+            self._num_examples = 0
+            self._stage_time = collections.defaultdict(float)
+            self._busy_time = 0.
+            self._queue_time = 0.
+            # Per worker, a (pid, thread id) tuple
+            self._worker_busy_time = collections.defaultdict(float)
+            self._worker_num_examples = collections.defaultdict(int)
+
+    def __getstate__(self):
+        # The workers only need the id.
+        return {'enabled': self.enabled, 'id': self.id}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def timed(self, name, fn):
+        """Returns `fn`, wrapped such that the time of each call is
+        measured as stage `name`."""
+        if not self.enabled:
+            return fn
+        return _TimedStage(self, name, fn)
+
+    def encode(self, example):
+        """Attaches the timings of this worker to the example. Call it as the
+        last map before the prefetch."""
+        if not self.enabled:
+            return example
+        pending = _pop_pending(self.id)
+        if pending is None:
+            stages, busy_time = {}, 0.
+        else:
+            stages = dict(pending['stages'])
+            busy_time = time.perf_counter() - pending['start']
+        return _TelemetryExample(
+            example, stages, busy_time,
+            worker=(os.getpid(), threading.get_ident()),
+            produced=time.time(),
+        )
+
+    def decode(self, example):
+        """Collects the timings of the example. Call it in the main process
+        after the prefetch."""
+        if not self.enabled:
+            return example
+        if not isinstance(example, _TelemetryExample):
+            # encode was not used, e.g. without prefetch
+            example = self.encode(example)
+        with self._lock:
+            self._num_examples += 1
+            for name, value in example.stages.items():
+                self._stage_time[name] += value
+            self._busy_time += example.busy_time
+            self._queue_time += max(time.time() - example.produced, 0.)
+            self._worker_busy_time[example.worker] += example.busy_time
+            self._worker_num_examples[example.worker] += 1
+        return example.example
+
+    @property
+    def statistics(self):
+        """
+        Cumulative statistics since the last `reset`:
+         - num_examples: Number of decoded examples.
+         - stage_time: Sum of the time of each stage.
+         - busy_time: Sum of the time, that the workers were busy.
+         - queue_time: Sum of the time, that the examples waited between
+           `encode` and `decode`.
+         - num_workers: Number of workers, that delivered examples.
+         - worker_busy_time, worker_num_examples: busy_time and
+           num_examples of each worker (a (pid, thread id) tuple).
+         - wall_time: Time since the last `reset`.
+         - worker_utilization: busy_time / (num_workers * wall_time)
+         - worker_utilization_max, worker_utilization_spread: Maximum and
+           difference between maximum and minimum of the utilization
+           (busy time / wall_time) of the individual workers. A high
+           spread shows an imbalance between the workers, that the mean
+           hides.
+         - queue_depth: Mean number of waiting examples
+           (queue_time / wall_time).
+        """
+        with self._lock:
+            wall_time = max(time.time() - self._start, 1e-12)
+            num_workers = len(self._worker_busy_time)
+            utilization = [
+                busy_time / wall_time
+                for busy_time in self._worker_busy_time.values()
+            ] or [0.]
+            return {
+                'num_examples': self._num_examples,
+                'stage_time': dict(self._stage_time),
+                'busy_time': self._busy_time,
+                'queue_time': self._queue_time,
+                'num_workers': num_workers,
+                'worker_busy_time': dict(self._worker_busy_time),
+                'worker_num_examples': dict(self._worker_num_examples),
+                'wall_time': wall_time,
+                'worker_utilization': (
+                    self._busy_time / (max(num_workers, 1) * wall_time)),
+                'worker_utilization_max': max(utilization),
+                'worker_utilization_spread': (
+                    max(utilization) - min(utilization)),
+                'queue_depth': self._queue_time / wall_time,
+            }
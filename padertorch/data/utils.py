@@ -1,5 +1,8 @@
 
+from collections.abc import Mapping
+
 import numpy as np
+from typing import Iterable, Union
 
 
 def pad_tensor(vec, pad, axis):
@@ -15,7 +18,8 @@ def pad_tensor(vec, pad, axis):
 
     pad_size = list(vec.shape)
     pad_size[axis] = pad - vec.shape[axis]
-    return np.concatenate([vec, np.zeros(pad_size)], axis=axis)
+    return np.concatenate(
+        [vec, np.zeros(pad_size, dtype=vec.dtype)], axis=axis)
 
 
 def collate_fn(batch):
@@ -51,10 +55,12 @@ def collate_fn(batch):
     """
     assert isinstance(batch, (tuple, list)), (type(batch), batch)
 
-    if isinstance(batch[0], dict):
+    if isinstance(batch[0], Mapping):
         for b in batch[1:]:
             assert batch[0].keys() == b.keys(), batch
-        return batch[0].__class__({
+        # Other mappings (e.g. LazySegment) are collated to a dict.
+        cls = batch[0].__class__ if isinstance(batch[0], dict) else dict
+        return cls({
             k: (collate_fn(batch.__class__([b[k] for b in batch])))
             for k in batch[0]
         })
@@ -67,3 +73,204 @@ def collate_fn(batch):
         })
     else:
         return batch
+
+
+class PaddedCollate:
+    """
+    Collates a batch like `collate_fn` and pads and stacks the arrays.
+
+    In contrast to `pad_tensor` and `np.stack`, the output array of a key
+    is allocated once in the dtype of the examples and each example is
+    written directly into its slot. Only the padded region is filled with
+    `pad_value`. For each padded key, the lengths along `axis` and a padding
+    mask are added to the dict that contains the key.
+
+    Can be used instead of `collate_fn` after batching of a dataset:
+        `dataset.batch(...).map(PaddedCollate())`
+
+    >>> batch = [
+    ...     {'x': np.array([1, 2, 3], np.int16), 'id': 'a'},
+    ...     {'x': np.array([4], np.int16), 'id': 'b'},
+    ... ]
+    >>> out = PaddedCollate()(batch)
+    >>> out['x']
+    array([[1, 2, 3],
+           [4, 0, 0]], dtype=int16)
+    >>> out['x_lengths']
+    array([3, 1])
+    >>> out['x_padding_mask']
+    array([[False, False, False],
+           [False,  True,  True]])
+    >>> out['id']
+    ['a', 'b']
+
+    Nested dicts are supported. All axes are padded to the maximum, while
+    the lengths and the mask refer to `axis`:
+    >>> batch = [
+    ...     {'audio': {'s': np.ones((2, 3))}},
+    ...     {'audio': {'s': np.ones((1, 4))}},
+    ... ]
+    >>> out = PaddedCollate(axis=-1, pad_value=-1)(batch)
+    >>> out['audio']['s']
+    array([[[ 1.,  1.,  1., -1.],
+            [ 1.,  1.,  1., -1.]],
+    <BLANKLINE>
+           [[ 1.,  1.,  1.,  1.],
+            [-1., -1., -1., -1.]]])
+    >>> out['audio']['s_lengths']
+    array([3, 4])
+    """
+    def __init__(
+            self,
+            padding_keys: Iterable[str] = None,
+            axis: Union[int, dict] = -1,
+            pad_value=0,
+            lengths_template: str = '{}_lengths',
+            mask_template: str = '{}_padding_mask',
+            to_torch: bool = False,
+            pin_memory: bool = False,
+            pool_size: int = 0,
+    ):
+        """
+
+        Args:
+            padding_keys: The keys of the arrays to pad and stack. If None,
+                all keys, whose values are numpy arrays with at least one
+                dimension and identical dtype and number of dimensions,
+                are padded.
+            axis: The axis (of the example) for the lengths and the
+                padding mask. Either an int or a dict from key to int.
+            pad_value: The value of the padded region.
+            lengths_template: Format string for the key of the lengths.
+                If None, no lengths are added.
+            mask_template: Format string for the key of the padding mask,
+                that is True for the padded entries (like `key_padding_mask`
+                in `torch.nn.MultiheadAttention`). If None, no mask is added.
+            to_torch: If True, return `torch.Tensor` instead of numpy arrays
+                (except for complex arrays).
+            pin_memory: If True, allocate the output in pinned memory (implies
+                `to_torch`), which allows asynchronous transfers to the GPU.
+            pool_size: If larger than zero, the output buffers of the last
+                `pool_size` batches are kept and reused. The returned arrays
+                are then overwritten after `pool_size` further batches, hence
+                `pool_size` has to be larger than the number of batches that
+                are alive at the same time (e.g. the prefetch buffer).
+        """
+        self.padding_keys = None if padding_keys is None else set(
+            padding_keys)
+        self.axis = axis
+        self.pad_value = pad_value
+        self.lengths_template = lengths_template
+        self.mask_template = mask_template
+        self.to_torch = to_torch or pin_memory
+        self.pin_memory = pin_memory
+        self.pool_size = pool_size
+        self._pool = {}
+
+    def __getstate__(self):
+        # Do not send the buffers to the prefetch workers.
+        state = self.__dict__.copy()
+        state['_pool'] = {}
+        return state
+
+    def _pad(self, key, arrays):
+        if self.padding_keys is None:
+            if not all([isinstance(a, np.ndarray) for a in arrays]):
+                return None
+            if arrays[0].ndim == 0 or arrays[0].dtype.kind in 'OUS':
+                return None
+            if any([
+                a.ndim != arrays[0].ndim or a.dtype != arrays[0].dtype
+                for a in arrays
+            ]):
+                return None
+        elif key not in self.padding_keys:
+            return None
+        else:
+            arrays = [np.asarray(a) for a in arrays]
+            assert len({a.ndim for a in arrays}) == 1, (key, arrays)
+            assert len({a.dtype for a in arrays}) == 1, (key, arrays)
+
+        shapes = np.array([a.shape for a in arrays])
+        max_shape = shapes.max(axis=0)
+        out = self._allocate(key, (len(arrays), *max_shape), arrays[0].dtype)
+        for i, array in enumerate(arrays):
+            out[(i, *[slice(None, s) for s in array.shape])] = array
+            for d, (s, m) in enumerate(zip(array.shape, max_shape)):
+                if s < m:
+                    out[(i, *[slice(None, s_) for s_ in array.shape[:d]],
+                         slice(s, None))] = self.pad_value
+
+        if out.ndim == 1:
+            # Scalars, e.g. num_samples
+            return out, None
+        lengths = shapes[:, self._get_axis(key)]
+        return out, lengths
+
+    def _get_axis(self, key):
+        return self.axis[key] if isinstance(self.axis, dict) else self.axis
+
+    def _allocate(self, key, shape, dtype):
+        size = int(np.prod(shape))
+        if self.pool_size > 0:
+            buffers, index = self._pool.setdefault(key, ([], 0))
+            self._pool[key] = (buffers, (index + 1) % self.pool_size)
+            if len(buffers) <= index:
+                buffers.append(None)
+            buffer = buffers[index]
+            if (
+                    buffer is None or buffer.dtype != dtype
+                    or buffer.size < size
+            ):
+                buffer = self._empty(size, dtype)
+                buffers[index] = buffer
+            return buffer[:size].reshape(shape)
+        return self._empty(size, dtype).reshape(shape)
+
+    def _empty(self, size, dtype):
+        if self.pin_memory and dtype.kind != 'c':
+            import torch
+            return torch.empty(
+                size, dtype=torch.from_numpy(np.empty(0, dtype)).dtype,
+                pin_memory=True,
+            ).numpy()
+        return np.empty(size, dtype)
+
+    def _to_torch(self, array):
+        if self.to_torch and array.dtype.kind != 'c':
+            import torch
+            return torch.from_numpy(array)
+        return array
+
+    def _collate(self, batch):
+        if isinstance(batch, dict):
+            out = batch.__class__()
+            for key, value in batch.items():
+                if isinstance(value, (tuple, list)):
+                    padded = self._pad(key, value)
+                    if padded is not None:
+                        array, lengths = padded
+                        out[key] = self._to_torch(array)
+                        if lengths is None:
+                            continue
+                        if self.lengths_template is not None:
+                            out[self.lengths_template.format(key)] = \
+                                self._to_torch(lengths)
+                        if self.mask_template is not None:
+                            max_length = array.shape[1:][self._get_axis(key)]
+                            out[self.mask_template.format(key)] = \
+                                self._to_torch(
+                                    np.arange(max_length) >= lengths[:, None])
+                        continue
+                out[key] = self._collate(value)
+            return out
+        elif hasattr(batch, '__dataclass_fields__'):
+            return batch.__class__(**{
+                k: self._collate(getattr(batch, k))
+                for k in batch.__dataclass_fields__
+            })
+        else:
+            return batch
+
+    def __call__(self, batch):
+        return self._collate(collate_fn(batch))
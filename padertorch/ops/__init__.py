@@ -5,6 +5,7 @@ from . import mappings
 from . import tensor
 
 from ._stft import STFT
+from ._resample import resample, get_resample_kernel
 from .einsum import *
 from .sequence import *
 from .tensor import *
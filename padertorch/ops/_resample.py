@@ -0,0 +1,128 @@
+import functools
+import math
+
+import torch
+from torch.nn import functional as F
+
+__all__ = [
+    'get_resample_kernel',
+    'resample',
+]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_resample_kernel(orig, new, lowpass_filter_width, rolloff):
+    base_freq = min(orig, new) * rolloff
+    width = math.ceil(lowpass_filter_width * orig / base_freq)
+    idx = torch.arange(-width, width + orig, dtype=torch.float64) / orig
+    t = torch.arange(0, -new, -1, dtype=torch.float64)[:, None] / new + idx
+    t = (t * base_freq).clamp(-lowpass_filter_width, lowpass_filter_width)
+    # Hann window of the sinc
+    window = torch.cos(t * math.pi / lowpass_filter_width / 2) ** 2
+    t = t * math.pi
+    sinc = torch.where(t == 0, torch.ones_like(t), torch.sin(t) / t)
+    kernel = sinc * window * base_freq / orig
+    return kernel[:, None, :], width
+
+
+def get_resample_kernel(
+        orig_sample_rate,
+        target_sample_rate,
+        lowpass_filter_width=16,
+        rolloff=0.945,
+        dtype=torch.float32,
+        device='cpu',
+):
+    """
+    Polyphase filter bank of a windowed sinc interpolation (cached for each
+    pair of sample rates).
+
+    Returns:
+        kernel: Shape (new, 1, kernel_length), where new is
+            `target_sample_rate / gcd`. Row `i` computes the `i`-th output
+            sample of each block of `orig_sample_rate / gcd` input samples.
+        width: The number of samples on the left of the filter.
+
+    >>> kernel, width = get_resample_kernel(16000, 8000)
+    >>> kernel.shape, width
+    (torch.Size([1, 1, 70]), 34)
+    """
+    g = math.gcd(int(orig_sample_rate), int(target_sample_rate))
+    kernel, width = _get_resample_kernel(
+        int(orig_sample_rate) // g, int(target_sample_rate) // g,
+        lowpass_filter_width, rolloff,
+    )
+    return kernel.to(dtype=dtype, device=device), width
+
+
+def resample(
+        signal: torch.Tensor,
+        orig_sample_rate: int,
+        target_sample_rate: int,
+        sequence_lengths=None,
+        lowpass_filter_width: int = 16,
+        rolloff: float = 0.945,
+):
+    """
+    Resamples the last axis of `signal` with a polyphase windowed sinc
+    filter. The filter is computed once for each pair of sample rates and
+    the resampling of all signals in the batch is a single strided
+    convolution, so it can be applied in the data pipeline (per example) or
+    on a padded batch on the GPU.
+
+    Args:
+        signal: Tensor with shape (..., num_samples).
+        orig_sample_rate:
+        target_sample_rate:
+        sequence_lengths: Optional number of samples of each signal in a
+            padded batch. The padding has to be zero. If given, the lengths
+            of the resampled signals are returned.
+        lowpass_filter_width: Number of zero crossings of the sinc on each
+            side. A larger width gives a sharper anti aliasing filter.
+        rolloff: Cutoff frequency of the lowpass relative to the lower of
+            the two Nyquist frequencies.
+
+    Returns:
+        The resampled signal with shape
+        (..., ceil(num_samples * target_sample_rate / orig_sample_rate)) and
+        the sequence lengths, if `sequence_lengths` is not None.
+
+    >>> x = torch.sin(torch.arange(16000) / 16000 * 2 * math.pi * 440)
+    >>> resample(x, 16000, 8000).shape
+    torch.Size([8000])
+    >>> x = torch.zeros(2, 3, 16000)
+    >>> y, lengths = resample(x, 16000, 44100, sequence_lengths=[16000, 100])
+    >>> y.shape, lengths
+    (torch.Size([2, 3, 44100]), [44100, 276])
+    """
+    if orig_sample_rate == target_sample_rate:
+        if sequence_lengths is not None:
+            return signal, sequence_lengths
+        return signal
+
+    g = math.gcd(int(orig_sample_rate), int(target_sample_rate))
+    orig = int(orig_sample_rate) // g
+    new = int(target_sample_rate) // g
+
+    dtype = signal.dtype if signal.is_floating_point() else torch.float32
+    kernel, width = get_resample_kernel(
+        orig_sample_rate, target_sample_rate, lowpass_filter_width, rolloff,
+        dtype=dtype, device=signal.device,
+    )
+
+    shape = signal.shape
+    num_samples = shape[-1]
+    x = signal.to(dtype).reshape(-1, 1, num_samples)
+    x = F.pad(x, (width, width + orig))
+    # (batch, new, num_blocks): Output sample i of each block of
+    # `orig` input samples.
+    y = F.conv1d(x, kernel, stride=orig)
+    y = y.transpose(1, 2).reshape(x.shape[0], -1)
+    target_length = -(-new * num_samples // orig)
+    y = y[..., :target_length].reshape(*shape[:-1], target_length)
+
+    if sequence_lengths is not None:
+        sequence_lengths = [
+            -(-new * int(length) // orig) for length in sequence_lengths]
+        return y, sequence_lengths
+    return y
@@ -1,3 +1,4 @@
+from . import comm_hooks
 from . import optimizer
 from . import trigger
 from . import hooks
@@ -0,0 +1,259 @@
+"""
+Communication hooks for the gradient reduction in multi process training.
+
+A communication hook averages the gradients of all processes of a
+`torch.distributed` process group inplace. Apart from the plain all-reduce,
+the hooks compress the gradients to reduce the communicated bytes, which is
+helpful on clusters with a slow interconnect (e.g. Ethernet).
+
+The hooks are used by `padertorch.train.optimizer.DistributedOptimizer` and
+can be selected in the trainer config, e.g.:
+
+    'optimizer': {
+        'factory': DistributedOptimizer,
+        'optimizer': {'factory': Adam},
+        'comm_hook': {'factory': PowerSGDHook, 'rank': 2},
+    }
+
+Each hook counts the bytes that it sends in `bytes_communicated`.
+"""
+import torch
+from torch._utils import _flatten_dense_tensors, _unflatten_dense_tensors
+
+__all__ = [
+    'CommHook',
+    'AllReduceHook',
+    'CastCompressionHook',
+    'PowerSGDHook',
+    'TopKCompressionHook',
+]
+
+
+def _group_by_dtype(tensors):
+    groups = {}
+    for t in tensors:
+        groups.setdefault(t.dtype, []).append(t)
+    return groups
+
+
+class CommHook:
+    """
+    Base class for the communication hooks.
+    """
+    def __init__(self):
+        self.bytes_communicated = 0
+
+    def __call__(self, tensors, process_group=None):
+        """
+        Replaces each tensor inplace with the average over all processes.
+
+        Args:
+            tensors: list of tensors (e.g. gradients). The order and shapes
+                have to be identical on all processes.
+            process_group: The `torch.distributed` process group. When None,
+                the default group is used.
+        """
+        raise NotImplementedError
+
+    def _all_reduce(self, tensor, process_group):
+        import torch.distributed as dist
+        self.bytes_communicated += tensor.numel() * tensor.element_size()
+        dist.all_reduce(tensor, group=process_group)
+        return tensor
+
+    def _all_gather(self, tensor, process_group):
+        import torch.distributed as dist
+        self.bytes_communicated += tensor.numel() * tensor.element_size()
+        out = [
+            torch.empty_like(tensor)
+            for _ in range(dist.get_world_size(process_group))
+        ]
+        dist.all_gather(out, tensor, group=process_group)
+        return out
+
+    def _all_reduce_mean(self, tensors, process_group):
+        """Uncompressed average with one collective per dtype."""
+        import torch.distributed as dist
+        world_size = dist.get_world_size(process_group)
+        for group in _group_by_dtype(tensors).values():
+            flat = _flatten_dense_tensors(group)
+            flat.div_(world_size)
+            self._all_reduce(flat, process_group)
+            for t, f in zip(group, _unflatten_dense_tensors(flat, group)):
+                t.copy_(f)
+
+
+class AllReduceHook(CommHook):
+    """
+    Plain average of the tensors without compression.
+    """
+    def __call__(self, tensors, process_group=None):
+        self._all_reduce_mean(tensors, process_group)
+
+
+class CastCompressionHook(CommHook):
+    """
+    Casts the tensors to a smaller float type (e.g. float16 or bfloat16)
+    before the all-reduce and back afterwards. Halves the communicated bytes
+    for float32 gradients.
+    """
+    def __init__(self, dtype='float16'):
+        """
+
+        Args:
+            dtype: 'float16' or 'bfloat16'
+        """
+        super().__init__()
+        assert dtype in ['float16', 'bfloat16'], dtype
+        self.dtype = dtype
+
+    def __call__(self, tensors, process_group=None):
+        import torch.distributed as dist
+        world_size = dist.get_world_size(process_group)
+        dtype = getattr(torch, self.dtype)
+        for group in _group_by_dtype(tensors).values():
+            flat = _flatten_dense_tensors(group)
+            # Divide before the cast to avoid an overflow in the sum.
+            compressed = flat.div_(world_size).to(dtype)
+            self._all_reduce(compressed, process_group)
+            flat = compressed.to(flat.dtype)
+            for t, f in zip(group, _unflatten_dense_tensors(flat, group)):
+                t.copy_(f)
+
+
+class PowerSGDHook(CommHook):
+    """
+    Low-rank compression of the gradients with error feedback.
+
+    Each gradient with more than one dimension is reshaped to a matrix M
+    (first dimension times remaining dimensions) and approximated with
+    P @ Q^T, where P and Q have `rank` columns. Only P and Q are
+    communicated. The approximation error is added to the gradient of the
+    next step (error feedback). Q is reused as warm start for the next step.
+
+    Vogels, Thijs, Sai Praneeth Karimireddy, and Martin Jaggi.
+    "PowerSGD: Practical low-rank gradient compression for distributed
+    optimization." NeurIPS 2019.
+    """
+    def __init__(self, rank=1, min_compression_rate=2, seed=0):
+        """
+
+        Args:
+            rank: rank of the approximation
+            min_compression_rate: Tensors, where the compression would
+                reduce the bytes by less than this factor, are not compressed
+                (e.g. biases).
+            seed: seed for the initialization of Q. Has to be identical on
+                all processes.
+        """
+        super().__init__()
+        self.rank = rank
+        self.min_compression_rate = min_compression_rate
+        self.seed = seed
+        self.q = {}
+        self.error = {}
+
+    def _compress(self, tensor):
+        if tensor.dim() <= 1:
+            return False
+        n = tensor.shape[0]
+        m = tensor.numel() // n
+        return n * m >= (n + m) * self.rank * self.min_compression_rate
+
+    @staticmethod
+    def _orthogonalize(matrix):
+        if hasattr(torch, 'linalg') and hasattr(torch.linalg, 'qr'):
+            q, _ = torch.linalg.qr(matrix)
+        else:
+            q, _ = torch.qr(matrix)
+        return q
+
+    def __call__(self, tensors, process_group=None):
+        import torch.distributed as dist
+        world_size = dist.get_world_size(process_group)
+
+        indices = [i for i, t in enumerate(tensors) if self._compress(t)]
+        self._all_reduce_mean([
+            t for t in tensors if not self._compress(t)
+        ], process_group)
+        if len(indices) == 0:
+            return
+
+        matrices = []
+        for i in indices:
+            t = tensors[i]
+            matrix = t.reshape(t.shape[0], -1)
+            if i in self.error:
+                matrix = matrix + self.error[i]
+            matrices.append(matrix)
+            if i not in self.q:
+                generator = torch.Generator().manual_seed(self.seed + i)
+                self.q[i] = torch.randn(
+                    matrix.shape[1], self.rank, generator=generator,
+                ).to(device=t.device, dtype=t.dtype)
+
+        ps = [m @ self.q[i] for i, m in zip(indices, matrices)]
+        flat = _flatten_dense_tensors(ps).div_(world_size)
+        self._all_reduce(flat, process_group)
+        ps = [
+            self._orthogonalize(p)
+            for p in _unflatten_dense_tensors(flat, ps)
+        ]
+
+        qs = [m.t() @ p for m, p in zip(matrices, ps)]
+        flat = _flatten_dense_tensors(qs).div_(world_size)
+        self._all_reduce(flat, process_group)
+        qs = _unflatten_dense_tensors(flat, qs)
+
+        for i, matrix, p, q in zip(indices, matrices, ps, qs):
+            approximation = p @ q.t()
+            self.error[i] = matrix - approximation
+            self.q[i] = q
+            tensors[i].copy_(approximation.view_as(tensors[i]))
+
+
+class TopKCompressionHook(CommHook):
+    """
+    Sparsification of the gradients with error feedback.
+
+    Only the `ratio` fraction of the entries with the largest magnitude
+    (indices and values) is communicated. The remaining entries are added
+    to the gradient of the next step (error feedback).
+
+    Stich, Sebastian U., Jean-Baptiste Cordonnier, and Martin Jaggi.
+    "Sparsified SGD with memory." NeurIPS 2018.
+    """
+    def __init__(self, ratio=0.01):
+        """
+
+        Args:
+            ratio: fraction of the entries that are communicated
+        """
+        super().__init__()
+        assert 0 < ratio <= 1, ratio
+        self.ratio = ratio
+        self.error = {}
+
+    def __call__(self, tensors, process_group=None):
+        import torch.distributed as dist
+        world_size = dist.get_world_size(process_group)
+        for dtype, group in _group_by_dtype(tensors).items():
+            flat = _flatten_dense_tensors(group)
+            if dtype in self.error:
+                flat.add_(self.error[dtype])
+            k = max(1, int(self.ratio * flat.numel()))
+            _, index = flat.abs().topk(k, sorted=False)
+            values = flat[index]
+
+            flat[index] = 0
+            self.error[dtype] = flat
+
+            dense = torch.zeros_like(flat)
+            for rank_index, rank_values in zip(
+                    self._all_gather(index, process_group),
+                    self._all_gather(values, process_group),
+            ):
+                dense.index_add_(0, rank_index, rank_values)
+            dense.div_(world_size)
+            for t, f in zip(group, _unflatten_dense_tensors(dense, group)):
+                t.copy_(f)
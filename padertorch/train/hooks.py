@@ -8,6 +8,7 @@ E.g., adding a learning rate schedule without adding further conditions to the
 trainer.
 
 """
+import copy
 import types
 from collections import defaultdict
 from enum import IntEnum
@@ -35,6 +36,9 @@ __all__ = [
     'LossWeightAnnealingHook',
     'ModelAttributeAnnealingHook',
     'LRAnnealingHook',
+    'GradientStatsHook',
+    'AudioCacheHook',
+    'DataPipelineTelemetryHook',
 ]
 
 
@@ -109,6 +113,19 @@ class Hook:
         """
         pass
 
+    def pre_optimize(self, trainer: 'pt.Trainer'):
+        """
+        function is called before each optimize, i.e. the gradients of the
+        model parameters are available and not yet clipped
+
+        Args:
+            trainer:
+
+        Returns:
+
+        """
+        pass
+
     def post_optimize(self, trainer: 'pt.Trainer', summary):
         """
         function is called after each optimize
@@ -166,10 +183,29 @@ class SummaryHook(TriggeredHook):
             self,
             trigger,
             summary_prefix='training',
+            review_metrics_trigger=None,
     ):
+        """
+
+        Args:
+            trigger: tuple or Trigger. Interval to write the summary.
+            summary_prefix: prefix of the tags in the tfevents file.
+            review_metrics_trigger: tuple or Trigger.
+                Controls `model.summary_due`, i.e. in which iterations the
+                model should compute the metrics that are only reported
+                (e.g. SDR or images) and not used for the loss.
+                When None, `model.summary_due` is always True.
+                The iteration that creates the snapshot has always
+                `model.summary_due` set to True, so each summary contains
+                at least one value of each metric.
+        """
         super().__init__(trigger)
         self.reset_summary()
         self.summary_prefix = summary_prefix
+        if review_metrics_trigger is not None:
+            review_metrics_trigger = IntervalTrigger.new(
+                review_metrics_trigger)
+        self.review_metrics_trigger = review_metrics_trigger
 
     def __reduce__(self):
         # Summary type is MappingProxyType and this cannot be reduced.
@@ -177,7 +213,7 @@ class SummaryHook(TriggeredHook):
         # MappingProxyType is just used to detect bugs in this class.
         return (
             self.__class__,
-            (self.trigger, self.summary_prefix),
+            (self.trigger, self.summary_prefix, self.review_metrics_trigger),
             {'summary': dict(self.summary)}
         )
 
@@ -384,6 +420,13 @@ class SummaryHook(TriggeredHook):
         if self.create_snapshot:
             trainer.model.create_snapshot = True
 
+        if self.review_metrics_trigger is not None:
+            trainer.model.summary_due = (
+                self.review_metrics_trigger(
+                    iteration=trainer.iteration, epoch=trainer.epoch)
+                or self.create_snapshot
+            )
+
     def post_step(self, trainer: 'pt.Trainer', example, model_out, review):
         self.update_summary(review)
         if self.create_snapshot:
@@ -402,6 +445,8 @@ class SummaryHook(TriggeredHook):
     def set_last(self, iteration, epoch):
         self.reset_summary()  # The reset is done for back_off
         super().set_last(iteration, epoch)
+        if self.review_metrics_trigger is not None:
+            self.review_metrics_trigger.set_last(iteration, epoch)
 
 
 class CheckpointHook(TriggeredHook):
@@ -448,7 +493,8 @@ class ValidationHook(SummaryHook):
 
     def __init__(
             self, trigger, iterator, metric='loss', maximize=False,
-            max_checkpoints=1, early_stopping_patience=None
+            max_checkpoints=1, early_stopping_patience=None,
+            cache_size=0, cache_dir=None, cache_config=None,
     ):
         """
 
@@ -463,8 +509,30 @@ class ValidationHook(SummaryHook):
                 When max_checkpoints is None, keep all checkpoints.
             early_stopping_patience: the number of allowed degradations before
                 stopping training. Should be larger than back_off_patience.
+            cache_size: the maximal number of bytes of the validation
+                batches, that are cached after the first validation
+                (see `padertorch.data.batch_cache.BatchCache`), so the
+                following validations skip reading and preprocessing.
+                When cache_size is 0, the cache is disabled.
+                When cache_size is None, the size is not limited.
+            cache_dir: If not None, the batches are cached in a memory
+                mapped file in this directory instead of in memory, that
+                is reused by later runs with the same cache_config.
+                Requires cache_size != 0.
+            cache_config: JSON serializable description of the validation
+                pipeline, required for cache_dir.
         """
         super().__init__(trigger, summary_prefix='validation')
+        assert cache_size is None or cache_size >= 0, cache_size
+        assert cache_size != 0 or (cache_dir is None and cache_config is None), (
+            'cache_dir and cache_config need cache_size != 0 (None for no '
+            'limit).', cache_size, cache_dir, cache_config
+        )
+        if cache_size != 0:
+            iterator = pt.data.batch_cache.BatchCache(
+                iterator, max_size=cache_size, cache_dir=cache_dir,
+                config=cache_config,
+            )
         self.iterator = iterator
         self.metric = metric
         self.maximize = maximize
@@ -536,14 +604,18 @@ class ValidationHook(SummaryHook):
         print('Starting Validation')
         at_least_one_value = False
 
-        # Save and restore the value of create_snapshot
+        # Save and restore the value of create_snapshot and summary_due.
+        # All validation reviews are summarized.
         create_snapshot = trainer.model.create_snapshot
+        summary_due = trainer.model.summary_due
         trainer.model.create_snapshot = True
+        trainer.model.summary_due = True
         for example, model_out, review in trainer.validate(self.iterator):
             at_least_one_value = True
             trainer.model.create_snapshot = False
             self.update_summary(review)
         trainer.model.create_snapshot = create_snapshot
+        trainer.model.summary_due = summary_due
         if not at_least_one_value:
             raise Exception(
                 f'Got an empty validation iterator: {self.iterator}'
@@ -640,7 +712,9 @@ class BackOffValidationHook(ValidationHook):
     def __init__(
             self, trigger, iterator, metric='loss', maximize=False,
             max_checkpoints=1, early_stopping_patience=None, n_back_off=0,
-            lr_update_factor=1 / 10, back_off_patience=None
+            lr_update_factor=1 / 10, back_off_patience=None,
+            best_state_cache_size=0, cache_size=0, cache_dir=None,
+            cache_config=None,
     ):
         """
 
@@ -661,11 +735,24 @@ class BackOffValidationHook(ValidationHook):
                 of back off. Should be smaller than 1.
             back_off_patience: the number of allowed degradations before
                 backing off
+            best_state_cache_size: the maximal number of bytes that may be
+                used to keep a CPU copy of the best checkpoint in memory.
+                With this copy, a back off does not need to read the
+                checkpoint from disk. When the state is larger, the
+                checkpoint is loaded from disk.
+                When best_state_cache_size is 0, the cache is disabled.
+                When best_state_cache_size is None, the size is not limited.
+            cache_size: the maximal number of bytes of the cached validation
+                batches, see ValidationHook.
+            cache_dir: see ValidationHook.
+            cache_config: see ValidationHook.
         """
         super().__init__(
             trigger, iterator,
             metric=metric, maximize=maximize, max_checkpoints=max_checkpoints,
-            early_stopping_patience=early_stopping_patience
+            early_stopping_patience=early_stopping_patience,
+            cache_size=cache_size, cache_dir=cache_dir,
+            cache_config=cache_config,
         )
 
         self.remaining_back_offs = n_back_off
@@ -679,6 +766,11 @@ class BackOffValidationHook(ValidationHook):
             assert early_stopping_patience >= back_off_patience, (
                 early_stopping_patience, back_off_patience
             )
+        assert best_state_cache_size is None or best_state_cache_size >= 0, \
+            best_state_cache_size
+        self.best_state_cache_size = best_state_cache_size
+        self._best_state = None
+        self._best_state_ckpt_name = None
 
     def state_dict(self):
         return {
@@ -698,6 +790,37 @@ class BackOffValidationHook(ValidationHook):
             and self.n_degradations > self.back_off_patience
         ):
             self._back_off(trainer)
+        elif (
+            self.best_state_cache_size != 0
+            and self.remaining_back_offs > 0
+            and self.n_degradations == 0
+        ):
+            # The CheckpointHook writes the checkpoint right after the
+            # validation, hence the trainer state is identical to the content
+            # of the checkpoint file. Later, the training forward changes the
+            # state (e.g. the running statistics of a BatchNorm).
+            self._cache_best_state(
+                trainer, trainer.default_checkpoint_path().name)
+
+    def _cache_best_state(self, trainer: 'pt.Trainer', ckpt_name):
+        state_dict = trainer.state_dict()
+        if (
+            self.best_state_cache_size is not None
+            and _nested_nbytes(state_dict) > self.best_state_cache_size
+        ):
+            if self._best_state is not None:
+                print(
+                    f'The trainer state exceeds best_state_cache_size '
+                    f'({self.best_state_cache_size} bytes). '
+                    f'Fall back to load the checkpoints from disk.'
+                )
+            self._best_state = None
+            self._best_state_ckpt_name = None
+        else:
+            # Reuse the buffers of the previous best state, when possible.
+            self._best_state = _nested_copy_to_cpu(
+                state_dict, self._best_state)
+            self._best_state_ckpt_name = ckpt_name
 
     def _back_off(self, trainer: 'pt.Trainer'):
         best_ckpt = self.ckpt_ranking[0][0]
@@ -719,7 +842,18 @@ class BackOffValidationHook(ValidationHook):
                     self.ckpt_ranking.pop(j)
 
         remaining_back_offs = self.remaining_back_offs
-        trainer.load_checkpoint()
+        if self._best_state_ckpt_name == best_ckpt:
+            # The trainer takes ownership of the cached state (e.g. the
+            # optimizer keeps references to the tensors), hence it cannot be
+            # used for a further back off.
+            best_state = self._best_state
+            self._best_state = None
+            self._best_state_ckpt_name = None
+            trainer.load_state_dict(best_state)
+            print(f"Loaded {best_ckpt} from memory "
+                  f"(iteration {trainer.iteration})")
+        else:
+            trainer.load_checkpoint()
         self.n_degradations = 0
         self.remaining_back_offs = remaining_back_offs - 1
 
@@ -733,6 +867,227 @@ class BackOffValidationHook(ValidationHook):
         else:
             update_lr(optimizer)
 
+    def close(self, trainer: 'pt.Trainer'):
+        super().close(trainer)
+        self._best_state = None
+        self._best_state_ckpt_name = None
+
+
+class GradientStatsHook(TriggeredHook):
+    """
+    Reports statistics of the gradients and the parameters to tensorboard.
+
+    When triggered, the following scalars are written for each group of
+    parameters (see `depth`):
+     - grad_norm: L2 norm of the (unclipped) gradients
+     - weight_norm: L2 norm of the parameters
+     - update_ratio: L2 norm of the parameter update divided by the
+       weight_norm
+     - grad_zero_fraction: fraction of gradient entries that are zero
+     - grad_nonfinite_fraction: fraction of gradient entries that are
+       inf or nan
+
+    The norms are computed with one batched (foreach) call over all
+    parameters. In iterations where the hook is not triggered, it does
+    nothing.
+
+    Examples:
+        >>> trainer = pt.Trainer(...)   # doctest: +SKIP
+        >>> trainer.register_hook(GradientStatsHook((1000, 'iteration'), 1))  # doctest: +SKIP
+    """
+
+    def __init__(self, trigger=(1000, 'iteration'), depth=None,
+                 summary_prefix='gradient_stats'):
+        """
+
+        Args:
+            trigger: tuple or Trigger.
+            depth: number of leading name components (split at '.') that
+                define a parameter group,
+                e.g. for depth=1 `encoder.conv.weight` belongs to `encoder`.
+                When None, each parameter is an individual group.
+            summary_prefix: prefix of the tags in the tfevents file.
+        """
+        super().__init__(trigger)
+        self.depth = depth
+        self.summary_prefix = summary_prefix
+        self._due = False
+        self._names = None
+        self._params = None
+        self._stats = None
+
+    def _group_name(self, name):
+        if self.depth is None:
+            return name
+        return '.'.join(name.split('.')[:self.depth])
+
+    def pre_step(self, trainer: 'pt.Trainer'):
+        self._due = self.trigger(iteration=trainer.iteration,
+                                 epoch=trainer.epoch)
+
+    def pre_optimize(self, trainer: 'pt.Trainer'):
+        if not self._due:
+            return
+        named_parameters = [
+            (name, p) for name, p in trainer.model.named_parameters()
+            if p.grad is not None
+        ]
+        if len(named_parameters) == 0:
+            self._due = False
+            return
+        self._names, self._params = zip(*named_parameters)
+        params = [p.detach() for p in self._params]
+        grads = [p.grad.detach() for p in self._params]
+
+        with torch.no_grad():
+            grad_norm = _stack(_foreach_norm(grads))
+            weight_norm = _stack(_foreach_norm(params))
+            zeros = _stack([(g == 0).sum() for g in grads])
+            # All entries of a gradient with a finite norm are finite, so
+            # the entries are only counted for the flagged gradients. One
+            # host sync for all parameters.
+            nonfinite = torch.zeros_like(grad_norm)
+            flagged = torch.nonzero(~torch.isfinite(grad_norm))
+            for i in flagged.flatten().tolist():
+                nonfinite[i] = (~torch.isfinite(grads[i])).sum()
+
+        self._stats = dict(
+            grad_norm=grad_norm,
+            weight_norm=weight_norm,
+            zeros=zeros,
+            nonfinite=nonfinite,
+            # Copy of the parameters to compute the update in post_optimize
+            weights=[p.clone() for p in params],
+        )
+
+    def post_optimize(self, trainer: 'pt.Trainer', summary):
+        if not self._due or self._stats is None:
+            return
+        self._due = False
+        stats, self._stats = self._stats, None
+        params, self._params = self._params, None
+        names, self._names = self._names, None
+
+        with torch.no_grad():
+            update_norm = _stack(_foreach_norm([
+                p.detach() - w for p, w in zip(params, stats['weights'])
+            ]))
+
+            # Single transfer to the cpu
+            grad_norm, weight_norm, update_norm, zeros, nonfinite = \
+                pt.utils.to_numpy(torch.stack([
+                    stats['grad_norm'], stats['weight_norm'], update_norm,
+                    stats['zeros'], stats['nonfinite'],
+                ]), detach=True)
+        numel = np.array([p.numel() for p in params], dtype=np.float64)
+
+        groups = defaultdict(list)
+        for i, name in enumerate(names):
+            groups[self._group_name(name)].append(i)
+
+        prefix = self.summary_prefix
+        for group, idx in groups.items():
+            group_weight_norm = np.sqrt(np.sum(weight_norm[idx] ** 2))
+            scalars = {
+                'grad_norm': np.sqrt(np.sum(grad_norm[idx] ** 2)),
+                'weight_norm': group_weight_norm,
+                'update_ratio': (
+                    np.sqrt(np.sum(update_norm[idx] ** 2))
+                    / max(group_weight_norm, np.finfo(np.float64).tiny)
+                ),
+                'grad_zero_fraction': np.sum(zeros[idx]) / np.sum(numel[idx]),
+                'grad_nonfinite_fraction':
+                    np.sum(nonfinite[idx]) / np.sum(numel[idx]),
+            }
+            for key, value in scalars.items():
+                trainer.writer.add_scalar(
+                    f'{prefix}/{group}/{key}', value, trainer.iteration)
+
+
+def _foreach_norm(tensors):
+    """
+    L2 norm of each tensor. Uses a single batched call, when the installed
+    pytorch version supports it.
+
+    >>> _foreach_norm([torch.tensor([3., 4.]), torch.ones(4)])
+    [tensor(5.), tensor(2.)]
+    """
+    if hasattr(torch, '_foreach_norm'):
+        return list(torch._foreach_norm(tensors))
+    else:
+        return [torch.norm(t) for t in tensors]
+
+
+def _stack(tensors):
+    """
+    Stacks scalar tensors as float64 on the device of the first tensor.
+
+    >>> _stack([torch.tensor(1), torch.tensor(2.)])
+    tensor([1., 2.], dtype=torch.float64)
+    """
+    device = tensors[0].device
+    return torch.stack([t.to(device, torch.float64) for t in tensors])
+
+
+def _nested_nbytes(obj):
+    """
+    >>> _nested_nbytes({'a': torch.zeros(3), 'b': [torch.zeros(2, 2), 1]})
+    28
+    """
+    if torch.is_tensor(obj):
+        return obj.numel() * obj.element_size()
+    elif isinstance(obj, dict):
+        return sum(_nested_nbytes(v) for v in obj.values())
+    elif isinstance(obj, (tuple, list)):
+        return sum(_nested_nbytes(v) for v in obj)
+    else:
+        return 0
+
+
+def _nested_copy_to_cpu(obj, out=None):
+    """
+    Copies a nested structure (e.g. a state_dict) and moves all tensors to
+    the cpu. When `out` has the same structure as `obj`, the tensors of
+    `out` are updated inplace to avoid new allocations.
+
+    >>> a = {'w': torch.ones(2), 'step': 1}
+    >>> b = _nested_copy_to_cpu(a)
+    >>> b
+    {'w': tensor([1., 1.]), 'step': 1}
+    >>> b['w'] is a['w']
+    False
+    >>> w = b['w']
+    >>> a['w'] += 1
+    >>> c = _nested_copy_to_cpu(a, b)
+    >>> c['w'] is w, c['w']
+    (True, tensor([2., 2.]))
+    """
+    if torch.is_tensor(obj):
+        if (
+            torch.is_tensor(out)
+            and out.shape == obj.shape
+            and out.dtype == obj.dtype
+        ):
+            return out.copy_(obj.detach())
+        return obj.detach().to('cpu', copy=True)
+    elif isinstance(obj, dict):
+        if not isinstance(out, dict):
+            out = {}
+        # copy.copy keeps the type and attributes (e.g. the _metadata of a
+        # module state_dict or the default_factory of a defaultdict).
+        new = copy.copy(obj)
+        new.clear()
+        for k, v in obj.items():
+            new[k] = _nested_copy_to_cpu(v, out.get(k))
+        return new
+    elif isinstance(obj, (tuple, list)):
+        if not isinstance(out, (tuple, list)) or len(out) != len(obj):
+            out = [None] * len(obj)
+        return obj.__class__(
+            _nested_copy_to_cpu(v, o) for v, o in zip(obj, out))
+    else:
+        return copy.deepcopy(obj)
+
 
 class LRSchedulerHook(TriggeredHook):
     """
@@ -779,6 +1134,94 @@ class LRSchedulerHook(TriggeredHook):
         self.lr_scheduler.step(epoch=epoch)
 
 
+class AudioCacheHook(Hook):
+    """
+    Reports the statistics of a `padertorch.data.audio_cache.AudioCache` in
+    the timings of the training summary:
+     - audio_cache_hit_rate: The fraction of cache hits.
+     - time_per_decode: Time that the data pipeline spent for decoding
+       audio per iteration.
+     - time_per_saved_decode: Estimated decoding time per iteration, that
+       was saved by the cache.
+
+    The statistics include all users of the cache (e.g. prefetch workers).
+    Because of the prefetching, the values are averages over the iterations
+    and not exact for each iteration.
+
+    Examples:
+        >>> cache = pt.data.audio_cache.AudioCache(max_size=2**30)  # doctest: +SKIP
+        >>> trainer.register_hook(AudioCacheHook(cache))  # doctest: +SKIP
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._last = None
+
+    def pre_step(self, trainer: 'pt.Trainer'):
+        statistics = self.cache.statistics
+        if self._last is not None:
+            delta = {k: statistics[k] - self._last[k] for k in [
+                'hits', 'misses', 'decode_time', 'saved_time']}
+            timings = trainer.train_timer.timings
+            if delta['hits'] + delta['misses'] > 0:
+                timings['audio_cache_hit_rate'].append(
+                    delta['hits'] / (delta['hits'] + delta['misses']))
+            timings['time_per_decode'].append(delta['decode_time'])
+            timings['time_per_saved_decode'].append(delta['saved_time'])
+        self._last = statistics
+
+
+class DataPipelineTelemetryHook(Hook):
+    """
+    Reports the statistics of a `padertorch.data.telemetry.PipelineTelemetry`
+    in the timings of the training summary:
+     - time_per_data_<stage>: Time that the workers spent in the stage per
+       iteration. Compare it with `time_per_iteration` times the number of
+       workers to find the bottleneck.
+     - data_worker_utilization: Fraction of the time, that the workers were
+       busy. Close to one means, that more workers (or caching) are needed.
+     - data_worker_utilization_max, data_worker_utilization_spread: Maximum
+       and max - min of the utilization of the individual workers. A high
+       spread shows, that some workers are slow (e.g. long examples), while
+       the mean looks fine.
+     - data_queue_depth: Mean number of prepared examples, that wait in the
+       prefetch buffer. Close to zero means, that the training waits for
+       the data.
+
+    Examples:
+        >>> telemetry = pt.data.telemetry.PipelineTelemetry()  # doctest: +SKIP
+        >>> trainer.register_hook(DataPipelineTelemetryHook(telemetry))  # doctest: +SKIP
+    """
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+        self._last = None
+
+    def pre_step(self, trainer: 'pt.Trainer'):
+        statistics = self.telemetry.statistics
+        last = self._last
+        if last is not None and statistics['wall_time'] > last['wall_time']:
+            timings = trainer.train_timer.timings
+            for name, value in statistics['stage_time'].items():
+                timings[f'time_per_data_{name}'].append(
+                    value - last['stage_time'].get(name, 0.))
+            wall_time = statistics['wall_time'] - last['wall_time']
+            busy_time = statistics['busy_time'] - last['busy_time']
+            num_workers = max(statistics['num_workers'], 1)
+            timings['data_worker_utilization'].append(
+                busy_time / (num_workers * wall_time))
+            utilization = [
+                (value - last['worker_busy_time'].get(worker, 0.)) / wall_time
+                for worker, value in statistics['worker_busy_time'].items()
+            ] or [0.]
+            timings['data_worker_utilization_max'].append(max(utilization))
+            timings['data_worker_utilization_spread'].append(
+                max(utilization) - min(utilization))
+            timings['data_queue_depth'].append(
+                (statistics['queue_time'] - last['queue_time']) / wall_time)
+        self._last = statistics
+
+
 class ProgressBarHook(TriggeredHook):
 
     """ Adds a progress bar to the console output. """
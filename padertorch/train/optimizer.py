@@ -110,3 +110,283 @@ class SGD(Optimizer):
             weight_decay=weight_decay,
             nesterov=nesterov
         )
+
+
+class ShardedOptimizer(Optimizer):
+    """
+    Wraps an `Optimizer` and partitions its state (e.g. the moments of
+    Adam) across the processes of a `torch.distributed` process group
+    (ZeRO stage 1, https://arxiv.org/abs/1910.02054).
+
+    Each process keeps the optimizer state only for its own shard of the
+    parameters. After the update of the local shard, the updated
+    parameters are broadcasted from their owner to all processes.
+    It is expected, that the gradients are identical on all processes
+    (i.e. they are all-reduced before `step` is called).
+
+    `state_dict` consolidates the shards and returns the same layout as the
+    wrapped optimizer without sharding, so checkpoints are interchangeable.
+    `state_dict` and `load_state_dict` are collective operations, i.e. they
+    have to be called on all processes.
+
+    Config example:
+        'optimizer': {
+            'factory': ShardedOptimizer,
+            'optimizer': {'factory': Adam, 'lr': 1e-3},
+        }
+    """
+
+    def __init__(self, optimizer: Optimizer, process_group=None):
+        """
+
+        Args:
+            optimizer: The wrapped `Optimizer`. Its gradient_clipping is
+                applied to all parameters.
+            process_group: The `torch.distributed` process group. When None,
+                the default group is used.
+        """
+        assert isinstance(optimizer, Optimizer), optimizer
+        assert not isinstance(optimizer, ShardedOptimizer), optimizer
+        super().__init__(optimizer.gradient_clipping)
+        self.local_optimizer = optimizer
+        self.process_group = process_group
+
+    @property
+    def rank(self):
+        import torch.distributed as dist
+        return dist.get_rank(self.process_group)
+
+    @property
+    def world_size(self):
+        import torch.distributed as dist
+        return dist.get_world_size(self.process_group)
+
+    def _global_rank(self, rank):
+        # torch.distributed.broadcast expects the rank in the default group.
+        import torch.distributed as dist
+        if self.process_group is None:
+            return rank
+        elif hasattr(dist, 'get_global_rank'):
+            return dist.get_global_rank(self.process_group, rank)
+        else:
+            return dist.distributed_c10d._get_global_rank(
+                self.process_group, rank)
+
+    def set_parameters(self, parameters):
+        self.parameters = tuple(parameters)
+        self.owner = self._partition(self.parameters, self.world_size)
+        local = [
+            p for p, owner in zip(self.parameters, self.owner)
+            if owner == self.rank
+        ]
+        if len(local) == 0:
+            # torch.optim does not accept an empty parameter list, but an
+            # empty parameter group.
+            local = [{'params': []}]
+        self.local_optimizer.set_parameters(local)
+        # The trainer and the hooks access the learning rate with
+        # `optimizer.optimizer.param_groups`
+        self.optimizer = self.local_optimizer.optimizer
+
+    @staticmethod
+    def _partition(parameters, world_size):
+        """
+        Greedy assignment of the parameters to the processes, such that
+        each process has roughly the same number of elements.
+
+        >>> ShardedOptimizer._partition(
+        ...     [torch.zeros(s) for s in [10, 2, 5, 5, 1]], 2)
+        [0, 1, 1, 1, 0]
+        """
+        sizes = [0] * world_size
+        owner = []
+        for p in parameters:
+            rank = sizes.index(min(sizes))
+            sizes[rank] += p.numel()
+            owner.append(rank)
+        return owner
+
+    def zero_grad(self):
+        self.check_if_set()
+        # The local optimizer knows only the local shard.
+        for p in self.parameters:
+            if p.grad is not None:
+                p.grad.detach_()
+                p.grad.zero_()
+
+    def step(self):
+        import torch.distributed as dist
+        from torch._utils import (
+            _flatten_dense_tensors, _unflatten_dense_tensors
+        )
+        self.check_if_set()
+        self.local_optimizer.step()
+
+        # Broadcast the updated shards. One flat buffer per owner and dtype.
+        for rank in range(self.world_size):
+            groups = {}
+            for p, owner in zip(self.parameters, self.owner):
+                if owner == rank:
+                    groups.setdefault(p.dtype, []).append(p.data)
+            for tensors in groups.values():
+                flat = _flatten_dense_tensors(tensors)
+                dist.broadcast(
+                    flat, src=self._global_rank(rank),
+                    group=self.process_group,
+                )
+                if rank != self.rank:
+                    for t, f in zip(
+                            tensors, _unflatten_dense_tensors(flat, tensors)):
+                        t.copy_(f)
+
+    def to(self, device):
+        self.local_optimizer.to(device)
+
+    def state_dict(self):
+        """
+        Gathers the states of all shards and returns the state_dict that
+        the wrapped optimizer would have without sharding.
+        """
+        import torch.distributed as dist
+        self.check_if_set()
+        local_state_dict = self.local_optimizer.state_dict()
+        local_state = {
+            k: {
+                # The states are send as python objects, hence move them to
+                # the cpu.
+                name: v.cpu() if torch.is_tensor(v) else v
+                for name, v in state.items()
+            }
+            for k, state in local_state_dict['state'].items()
+        }
+        states = [None] * self.world_size
+        dist.all_gather_object(states, local_state, group=self.process_group)
+
+        state = {}
+        for rank, rank_state in enumerate(states):
+            global_indices = [
+                i for i, owner in enumerate(self.owner) if owner == rank]
+            for local_index, s in rank_state.items():
+                state[global_indices[local_index]] = s
+
+        param_group, = local_state_dict['param_groups']
+        param_group = {
+            **param_group,
+            'params': list(range(len(self.parameters))),
+        }
+        return {
+            'state': dict(sorted(state.items())),
+            'param_groups': [param_group],
+        }
+
+    def load_state_dict(self, state_dict):
+        """
+        Loads a consolidated state_dict (see `state_dict`), i.e. each
+        process takes the state of its own shard.
+        """
+        self.check_if_set()
+        param_group, = state_dict['param_groups']
+        assert len(param_group['params']) == len(self.parameters), (
+            len(param_group['params']), len(self.parameters))
+        global_indices = [
+            i for i, owner in enumerate(self.owner) if owner == self.rank]
+        local_state = {
+            local_index: state_dict['state'][global_index]
+            for local_index, global_index in enumerate(global_indices)
+            if global_index in state_dict['state']
+        }
+        return self.local_optimizer.load_state_dict({
+            'state': local_state,
+            'param_groups': [{
+                **param_group,
+                'params': list(range(len(global_indices))),
+            }],
+        })
+
+
+class DistributedOptimizer(Optimizer):
+    """
+    Wraps an `Optimizer` for data parallel training with multiple
+    processes (`torch.distributed`): Before the gradients are clipped, they
+    are averaged over all processes with a communication hook
+    (see `padertorch.train.comm_hooks`), that may compress the gradients.
+
+    The wrapped optimizer may be a `ShardedOptimizer`.
+
+    Config example:
+        'optimizer': {
+            'factory': DistributedOptimizer,
+            'optimizer': {'factory': Adam, 'lr': 1e-3},
+            'comm_hook': {'factory': CastCompressionHook, 'dtype': 'bfloat16'},
+        }
+
+    Note: The state of the communication hook (e.g. the error feedback) is
+    not part of the `state_dict`.
+    """
+
+    def __init__(self, optimizer: Optimizer, comm_hook=None,
+                 process_group=None):
+        """
+
+        Args:
+            optimizer: The wrapped `Optimizer`. Its gradient_clipping is
+                applied to the averaged gradients.
+            comm_hook: An instance of `padertorch.train.comm_hooks.CommHook`.
+                When None, use an uncompressed all-reduce.
+            process_group: The `torch.distributed` process group. When None,
+                the default group is used.
+        """
+        from padertorch.train.comm_hooks import CommHook, AllReduceHook
+        assert isinstance(optimizer, Optimizer), optimizer
+        super().__init__(optimizer.gradient_clipping)
+        self.wrapped_optimizer = optimizer
+        if comm_hook is None:
+            comm_hook = AllReduceHook()
+        assert isinstance(comm_hook, CommHook), comm_hook
+        self.comm_hook = comm_hook
+        self.process_group = process_group
+        self._gradients_reduced = False
+
+    def set_parameters(self, parameters):
+        self.parameters = tuple(parameters)
+        self.wrapped_optimizer.set_parameters(self.parameters)
+        self.optimizer = self.wrapped_optimizer.optimizer
+
+    def reduce_gradients(self):
+        """
+        Averages the gradients over all processes. Is called from
+        `clip_grad` or `step`, whatever comes first.
+        """
+        self.check_if_set()
+        if self._gradients_reduced:
+            return
+        grads = []
+        for p in self.parameters:
+            if p.grad is None:
+                # All processes have to communicate the same tensors.
+                p.grad = torch.zeros_like(p)
+            grads.append(p.grad.data)
+        self.comm_hook(grads, self.process_group)
+        self._gradients_reduced = True
+
+    def zero_grad(self):
+        self._gradients_reduced = False
+        return self.wrapped_optimizer.zero_grad()
+
+    def clip_grad(self):
+        self.reduce_gradients()
+        return self.wrapped_optimizer.clip_grad()
+
+    def step(self):
+        self.reduce_gradients()
+        self._gradients_reduced = False
+        return self.wrapped_optimizer.step()
+
+    def to(self, device):
+        self.wrapped_optimizer.to(device)
+
+    def load_state_dict(self, state_dict):
+        return self.wrapped_optimizer.load_state_dict(state_dict)
+
+    def state_dict(self):
+        return self.wrapped_optimizer.state_dict()
@@ -48,6 +48,7 @@ class Trainer(Configurable):
             checkpoint_trigger=(1, 'epoch'),
             stop_trigger=(1, 'epoch'),
             virtual_minibatch_size=1,
+            review_metrics_trigger=None,
     ):
         """
 
@@ -86,6 +87,11 @@ class Trainer(Configurable):
                 Note: The gradients are accumulated and not averaged.
                 Note: The virtual_minibatch_size is fixed and can contain data
                     from two epochs.
+            review_metrics_trigger: `padertorch.train.trigger.IntervalTrigger`
+                object or tuple describing the interval when the model should
+                compute metrics in the review (see `pt.Model.summary_due`).
+                If None, `summary_due` is always True and the model computes
+                the metrics in each iteration.
 
 
         Usage:
@@ -132,10 +138,16 @@ class Trainer(Configurable):
         self.epoch = -1
 
         self.loss_weights = loss_weights
+        if isinstance(model, pt.Model):
+            # Shared dict, e.g. LossWeightAnnealingHook changes it inplace
+            model.loss_weights = loss_weights
         self.virtual_minibatch_size = virtual_minibatch_size
 
         self.hooks = [
-            SummaryHook(summary_trigger),
+            SummaryHook(
+                summary_trigger,
+                review_metrics_trigger=review_metrics_trigger,
+            ),
             CheckpointHook(checkpoint_trigger),
             StopTrainingHook(stop_trigger),
         ]
@@ -431,6 +443,8 @@ class Trainer(Configurable):
                     # Only the summary hook will use optimizer_review
                     if optimize:
                         with self.train_timer['time_per_optimize']:
+                            for hook in hooks:
+                                hook.pre_optimize(self)
                             optimizer_summary = self.optimizer_step()
                             for hook in hooks:
                                 hook.post_optimize(self, optimizer_summary)
@@ -574,23 +588,30 @@ class Trainer(Configurable):
 
             loss = 0.
             loss_weights = self.loss_weights
-            if len(losses) != 1:
-                if loss_weights is None:
-                    raise Exception(
-                        'You can not have multiple losses without specifying '
-                        f'loss_weights. losses: {losses}'
-                    )
-                elif set(loss_weights.keys()) != set(losses.keys()):
-                    import textwrap
-                    from IPython.lib.pretty import pretty
-                    raise Exception(
-                        'You can not have multiple losses without specifying '
-                        'a loss_weight for each loss.'
-                        f'\nlosses:'
-                        f'\n{textwrap.indent(pretty(losses), " "*4)}'
-                        f'\nloss_weights:\n'
-                        f'{textwrap.indent(pretty(loss_weights), " "*4)}'
+            if len(losses) != 1 and loss_weights is None:
+                raise Exception(
+                    'You can not have multiple losses without specifying '
+                    f'loss_weights. losses: {losses}'
+                )
+            elif loss_weights is not None and (
+                    not set(losses.keys()) <= set(loss_weights.keys())
+                    or any(
+                        loss_weights[key] != 0
+                        for key in loss_weights.keys() - losses.keys()
                     )
+            ):
+                # Losses with a weight of zero may be missing, e.g. when the
+                # model reports them only when a summary is due.
+                import textwrap
+                from IPython.lib.pretty import pretty
+                raise Exception(
+                    'You can not have multiple losses without specifying '
+                    'a loss_weight for each loss.'
+                    f'\nlosses:'
+                    f'\n{textwrap.indent(pretty(losses), " "*4)}'
+                    f'\nloss_weights:\n'
+                    f'{textwrap.indent(pretty(loss_weights), " "*4)}'
+                )
 
             for key, value in losses.items():
                 weight = loss_weights[key] if loss_weights is not None else 1.
@@ -686,7 +707,9 @@ class Trainer(Configurable):
     def register_validation_hook(
             self, validation_iterator, metric='loss', maximize=False,
             max_checkpoints=1, n_back_off=0, lr_update_factor=1 / 10,
-            back_off_patience=None, early_stopping_patience=None
+            back_off_patience=None, early_stopping_patience=None,
+            best_state_cache_size=0, cache_size=0, cache_dir=None,
+            cache_config=None,
     ):
         """
 
@@ -707,7 +730,20 @@ class Trainer(Configurable):
                 backing off
             early_stopping_patience: the number of allowed degradations before
                 stopping training. Should be larger than back_off_patience.
-
+            best_state_cache_size: the maximal number of bytes for an
+                in-memory copy of the best checkpoint, that is used for the
+                back off instead of loading the checkpoint from disk.
+                0 disables the copy and None means no limit.
+            cache_size: the maximal number of bytes of the validation
+                batches, that are kept after the first validation to skip
+                the data pipeline in the following validations.
+                0 disables the cache and None means no limit.
+            cache_dir: If not None, cache the validation batches in a
+                memory mapped file in this directory, that is shared across
+                runs with the same cache_config. Requires cache_size != 0.
+            cache_config: description of the validation pipeline (e.g. the
+                dataset config), required for cache_dir. A change of the
+                config invalidates the cache.
 
         Returns:
 
@@ -722,6 +758,10 @@ class Trainer(Configurable):
             lr_update_factor=lr_update_factor,
             back_off_patience=back_off_patience,
             early_stopping_patience=early_stopping_patience,
+            best_state_cache_size=best_state_cache_size,
+            cache_size=cache_size,
+            cache_dir=cache_dir,
+            cache_config=cache_config,
         ))
 
     def clip_grad(self, summary: dict):
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import scipy.signal
+import torch
+from paderbox.transform.module_stft import STFT
+
+from padertorch.contrib.je.modules.augment import (
+    AugmentedSTFT, piecewise_linear_time_warping
+)
+
+SHIFT = 200
+WINDOW_LENGTH = 800
+SEGMENT_LENGTH = 8000  # samples
+
+
+def warped_stft_numpy(audio, warp_factors):
+    """
+    Reference of `padertorch.contrib.je.data.transforms.AugmentedSTFT`
+    (without padding and fading): Each segment of the signal is transformed
+    with the shift `SHIFT / warp_factor`.
+    """
+    n_segments = int(np.ceil(len(audio) / SEGMENT_LENGTH))
+    segment_length = int(np.ceil(len(audio) / n_segments))
+    shifts = (SHIFT / warp_factors[:n_segments]).astype(np.int64)
+    n_frames = (segment_length - (WINDOW_LENGTH - shifts)
+                + WINDOW_LENGTH - 1) // shifts
+    segment_lengths = (WINDOW_LENGTH - shifts) + n_frames * shifts
+    onsets = np.cumsum(n_frames * shifts) - n_frames * shifts
+    return np.concatenate([
+        STFT(shift, WINDOW_LENGTH, WINDOW_LENGTH, pad=False, fading=None)(
+            audio[onset:onset + length])
+        for onset, length, shift in zip(onsets, segment_lengths, shifts)
+    ])
+
+
+def warped_stft_torch(audio, warp_factors):
+    stft = STFT(SHIFT, WINDOW_LENGTH, WINDOW_LENGTH, pad=False, fading=None)
+    x = stft(audio)
+    x = torch.as_tensor(np.stack([x.real, x.imag], axis=-1))[None, None]
+    augment = AugmentedSTFT(
+        warp_factor_sampling_fn=lambda n: warp_factors[:n],
+        warp_segment_length=SEGMENT_LENGTH // SHIFT,
+    )
+    x, seq_len, _ = augment(x, seq_len=[x.shape[2]])
+    x = x[0, 0, :seq_len[0]].numpy()
+    return x[..., 0] + 1j * x[..., 1]
+
+
+@pytest.mark.parametrize('warp_factors', [
+    [.8] * 8,
+    [1.25] * 8,
+    [.8, 1.25, .9, 1.1, .8, 1.25, 1., .9],
+])
+def test_statistics_equivalent_to_numpy(warp_factors):
+    rng = np.random.RandomState(0)
+    # Colored noise, so the spectrum is not flat
+    audio = scipy.signal.lfilter([1.], [1., -.9], rng.randn(64000))
+    warp_factors = np.array(warp_factors)
+    reference = warped_stft_numpy(audio, warp_factors)
+    warped = warped_stft_torch(audio, warp_factors)
+
+    # Number of frames
+    assert abs(len(warped) - len(reference)) <= len(warp_factors)
+    # Power and average power spectrum. An interpolation of the real and
+    # imaginary parts would lose about 30 % of the power.
+    reference_power = np.abs(reference) ** 2
+    warped_power = np.abs(warped) ** 2
+    np.testing.assert_allclose(
+        warped_power.mean(), reference_power.mean(), rtol=.1)
+    np.testing.assert_allclose(
+        warped_power.mean(0), reference_power.mean(0), rtol=.15)
+
+
+def test_zero_padding():
+    x = torch.ones(2, 1, 8, 3, 2)
+    targets = torch.ones(2, 4, 8)
+    augment = AugmentedSTFT(
+        warp_factor_sampling_fn=lambda n: np.array([.5, 2.])[:n])
+    x, seq_len, targets = augment(x, seq_len=[8, 4], targets=targets)
+    np.testing.assert_equal(seq_len, [4, 8])
+    assert x.shape[2] == targets.shape[-1] == 8
+    assert (x[0, :, :4] != 0).all() and (x[0, :, 4:] == 0).all()
+    assert (targets[0, :, :4] == 1).all() and (targets[0, :, 4:] == 0).all()
+    assert (x[1] != 0).all() and (targets[1] == 1).all()
+
+
+def test_piecewise_linear_time_warping():
+    time_indices, seq_len = piecewise_linear_time_warping(
+        [10], [[2., .5]], segment_length=5)
+    np.testing.assert_equal(seq_len, [12])
+    np.testing.assert_allclose(
+        time_indices[0, :10], [0, .5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 4.5])
+    np.testing.assert_allclose(time_indices[0, 10:], [5, 7])
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import lazy_dataset
+import numpy as np
+import pytest
+import soundfile
+
+from padertorch.data.async_audio import AsyncAudioReader
+
+
+class SlowReader(AsyncAudioReader):
+    """Simulates the latency of network storage."""
+    latency = 0.05
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.max_active = 0
+        self.num_loads = 0
+        self.counter_lock = threading.Lock()
+
+    def _load(self, path):
+        with self.counter_lock:
+            self.active += 1
+            self.num_loads += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self.counter_lock:
+            self.active -= 1
+        return np.full(3, path, dtype=self.dtype)
+
+
+def get_examples(num_examples=4, num_sources=3):
+    return [
+        {
+            'example_id': str(i),
+            'audio_path': {
+                'observation': 10 * i,
+                'speech_source': [10 * i + k + 1 for k in range(num_sources)],
+            },
+        }
+        for i in range(num_examples)
+    ]
+
+
+def test_concurrent_reads():
+    reader = SlowReader()
+    start = time.perf_counter()
+    example = reader(get_examples()[1])
+    assert time.perf_counter() - start < 3 * SlowReader.latency
+    assert reader.max_active == 4
+    np.testing.assert_equal(example['audio_data']['observation'], [10] * 3)
+    np.testing.assert_equal(
+        example['audio_data']['speech_source'], [[11] * 3, [12] * 3, [13] * 3])
+    assert example['example_id'] == '1'
+
+
+def test_audio_keys_and_ragged(tmp_path):
+    paths = []
+    for num_samples in [4, 6]:
+        paths.append(str(tmp_path / f'{num_samples}.wav'))
+        soundfile.write(
+            paths[-1], np.zeros(num_samples), 8000, subtype='PCM_16')
+    example = {'audio_path': {'speech_source': paths, 'noise': paths[0]}}
+    reader = AsyncAudioReader(
+        audio_keys=['speech_source'], dst_key='audio', dtype=np.float32)
+    example = reader(example)
+    assert list(example['audio']) == ['speech_source']
+    # Different lengths are not stacked
+    assert [s.shape for s in example['audio']['speech_source']] == [
+        (4,), (6,)]
+    assert example['audio']['speech_source'][0].dtype == np.float32
+
+
+@pytest.mark.parametrize('num_read_ahead', [0, 2])
+def test_read_ahead(num_read_ahead):
+    reader = SlowReader(num_read_ahead=num_read_ahead, num_workers=16)
+    ds = lazy_dataset.new(get_examples()).apply(reader.read_ahead)
+    assert len(ds) == 4
+    examples = list(ds)
+    assert [ex['example_id'] for ex in examples] == ['0', '1', '2', '3']
+    assert reader.max_active == 4 * (num_read_ahead + 1)
+
+
+def test_read_ahead_stop():
+    reader = SlowReader(num_read_ahead=2, num_workers=1)
+    iterator = reader.iterate(get_examples(8))
+    next(iterator)
+    iterator.close()
+    # The pending reads of the read-ahead are cancelled
+    reader.executor.shutdown(wait=True)
+    assert reader.num_loads < 3 * 4
+
+
+class SlowArray:
+    """Array-like, that reads each slice with a latency."""
+    def __init__(self, array, reader):
+        self.array = array
+        self.reader = reader
+        self.shape = array.shape
+
+    def __getitem__(self, item):
+        self.reader._load(0)  # Latency and counters
+        return self.array[item]
+
+
+def test_read_segments():
+    from padertorch.data.segment import Segmenter
+
+    reader = SlowReader()
+    example = {
+        'y': SlowArray(np.arange(8), reader),
+        's': {str(k): SlowArray(np.arange(8) + 10 * k, reader)
+              for k in range(2)},
+        'example_id': 'a',
+    }
+    segments = Segmenter(4, include_keys=('y', 's'), lazy=True)(example)
+    start = time.perf_counter()
+    segments = reader.read_segments(segments)
+    assert time.perf_counter() - start < 3 * SlowReader.latency
+    assert reader.max_active == 2 * 3
+    assert [(s['segment_start'], s['example_id']) for s in segments] == [
+        (0, 'a'), (4, 'a')]
+    np.testing.assert_equal(segments[1]['y'], [4, 5, 6, 7])
+    np.testing.assert_equal(segments[1]['s']['1'], [14, 15, 16, 17])
+    # The segments are not read again
+    assert reader.num_loads == 2 * 3
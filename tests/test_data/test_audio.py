@@ -0,0 +1,109 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile
+from scipy.signal import resample_poly
+
+import paderbox as pb
+from padertorch.data.audio import AudioFile
+from padertorch.data.segment import Segmenter
+
+
+@pytest.fixture(scope='module')
+def audio_dir():
+    rng = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        for sample_rate in [8000, 16000, 44100]:
+            soundfile.write(
+                str(tmp_dir / f'mono_{sample_rate}.wav'),
+                rng.uniform(-0.5, 0.5, 3 * sample_rate), sample_rate,
+                subtype='FLOAT',
+            )
+        soundfile.write(
+            str(tmp_dir / 'multi.wav'), rng.uniform(-0.5, 0.5, (8000, 3)),
+            8000, subtype='FLOAT',
+        )
+        yield tmp_dir
+
+
+def test_shape_without_io():
+    audio = AudioFile('does_not_exist.wav', num_samples=100, num_channels=1)
+    assert audio.shape == (100,)
+    audio = AudioFile(['a.wav', 'b.wav'], num_samples=100, num_channels=2)
+    assert audio.shape == (2, 2, 100)
+
+
+def test_shape_from_header(audio_dir):
+    assert AudioFile(audio_dir / 'mono_8000.wav').shape == (24000,)
+    assert AudioFile(audio_dir / 'multi.wav').shape == (3, 8000)
+    assert AudioFile(
+        audio_dir / 'mono_8000.wav', target_sample_rate=16000
+    ).shape == (48000,)
+
+
+@pytest.mark.parametrize('item', [
+    slice(None), slice(100, 1000), slice(-500, None), slice(23990, 30000),
+])
+def test_read(audio_dir, item):
+    for path in ['mono_8000.wav', 'multi.wav']:
+        path = audio_dir / path
+        expected = pb.io.load_audio(path)
+        np.testing.assert_equal(AudioFile(path)[..., item], expected[..., item])
+        np.testing.assert_equal(
+            np.asarray(AudioFile(path)), expected)
+
+    paths = [audio_dir / 'mono_8000.wav'] * 2
+    expected = np.stack([pb.io.load_audio(p) for p in paths])
+    np.testing.assert_equal(AudioFile(paths)[:, item], expected[:, item])
+    np.testing.assert_equal(AudioFile(paths)[1, item], expected[1, item])
+
+
+@pytest.mark.parametrize('sample_rate,target_sample_rate', [
+    (8000, 16000), (16000, 8000), (44100, 16000), (16000, 44100),
+])
+def test_windowed_resampling(audio_dir, sample_rate, target_sample_rate):
+    path = audio_dir / f'mono_{sample_rate}.wav'
+    g = np.gcd(sample_rate, target_sample_rate)
+    expected = resample_poly(
+        pb.io.load_audio(path), target_sample_rate // g, sample_rate // g)
+
+    audio = AudioFile(path, target_sample_rate=target_sample_rate)
+    assert audio.shape == expected.shape
+    num_samples = expected.shape[-1]
+    for start, stop in [
+        (0, 100), (1, 1000), (12345, 23456), (num_samples - 1000, None),
+        (num_samples // 2, num_samples // 2 + 1), (0, None),
+    ]:
+        np.testing.assert_allclose(
+            audio[start:stop], expected[start:stop], atol=1e-10)
+
+
+def test_lazy_segmenter(audio_dir, monkeypatch):
+    path = audio_dir / 'multi.wav'
+    reads = []
+    load_audio = pb.io.load_audio
+
+    def counting_load_audio(*args, **kwargs):
+        x = load_audio(*args, **kwargs)
+        reads.append(x.shape[-1])
+        return x
+
+    monkeypatch.setattr(pb.io, 'load_audio', counting_load_audio)
+
+    example = {'y': AudioFile(path), 'example_id': 'a'}
+    segments = Segmenter(3000, shift=2000, include_keys='y', lazy=True)(
+        example)
+    assert reads == []
+    expected = Segmenter(3000, shift=2000, include_keys='y')(
+        {'y': load_audio(path), 'example_id': 'a'})
+    reads.clear()
+
+    assert len(segments) == len(expected) == 3
+    for segment, e in zip(segments, expected):
+        np.testing.assert_equal(segment['y'], e['y'])
+        # The second access is cached
+        np.testing.assert_equal(segment['y'], e['y'])
+    assert reads == [3000] * 3
@@ -0,0 +1,110 @@
+import multiprocessing
+import pickle
+import tempfile
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile
+
+from padertorch.data.audio import AudioFile
+from padertorch.data.audio_cache import AudioCache
+from padertorch.train.hooks import AudioCacheHook
+from padertorch.train.trainer import ContextTimerDict
+
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def get_loader(value, size=100):
+    calls = []
+
+    def load():
+        calls.append(value)
+        return np.full(size, value, dtype=np.float64)
+    return load, calls
+
+
+@pytest.mark.parametrize('shm', [False, True])
+def test_lru(tmp_dir, shm):
+    # Each entry has 800 bytes (plus the header of the npy file), the budget
+    # allows two entries.
+    cache = AudioCache(
+        max_size=2300, shm_dir=tmp_dir / 'shm' if shm else None)
+    loaders = {value: get_loader(value) for value in range(3)}
+
+    def get(value):
+        out = cache.get_or_load(value, loaders[value][0])
+        np.testing.assert_equal(out, value)
+        return out
+
+    get(0)
+    get(1)
+    get(0)
+    get(2)  # Evicts 1
+    get(0)
+    get(1)
+    assert [len(calls) for _, calls in loaders.values()] == [1, 2, 1]
+
+    statistics = cache.statistics
+    assert statistics['hits'] == 2 and statistics['misses'] == 4
+    assert statistics['hit_rate'] == 1 / 3
+    assert statistics['saved_time'] > 0
+
+    # The cached signal is not modified in place
+    get(0)[...] = -1
+    get(0)
+
+
+def _worker(args):
+    cache, value = args
+    cache.get_or_load('a', lambda: np.full(10, value))
+    return cache.statistics['hits']
+
+
+def test_shm_shared_across_processes(tmp_dir):
+    cache = AudioCache(max_size=2**20, shm_dir=tmp_dir / 'shm')
+    cache.get_or_load('a', lambda: np.full(10, 1.))
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        pool.map(_worker, [(cache, 2.)] * 4)
+    # All workers used the entry of the main process
+    np.testing.assert_equal(cache.get_or_load('a', None), 1.)
+    assert cache.statistics['hits'] == 5
+    assert cache.statistics['misses'] == 1
+    cache.clear()
+    assert cache.statistics['hits'] == 0
+
+
+def test_local_entries_are_not_pickled():
+    cache = AudioCache(max_size=2**20)
+    cache.get_or_load('a', lambda: np.zeros(10))
+    assert len(pickle.loads(pickle.dumps(cache))._entries) == 0
+
+
+def test_audio_file(tmp_dir):
+    path = tmp_dir / 'audio.wav'
+    soundfile.write(str(path), np.random.uniform(-0.5, 0.5, (16000, 2)),
+                    8000, subtype='FLOAT')
+    cache = AudioCache(max_size=2**20)
+    for item in [slice(None), slice(100, 1000), slice(-500, None)]:
+        np.testing.assert_equal(
+            AudioFile(path, cache=cache)[..., item], AudioFile(path)[..., item])
+    assert cache.statistics['misses'] == 1
+    assert cache.statistics['hits'] == 2
+
+
+def test_hook():
+    cache = AudioCache(max_size=2**20)
+    trainer = types.SimpleNamespace(train_timer=ContextTimerDict())
+    hook = AudioCacheHook(cache)
+    hook.pre_step(trainer)
+    for _ in range(3):
+        cache.get_or_load('a', lambda: np.zeros(10))
+        hook.pre_step(trainer)
+    timings = trainer.train_timer.as_dict
+    np.testing.assert_equal(timings['audio_cache_hit_rate'], [0, 1, 1])
+    assert len(timings['time_per_saved_decode']) == 3
@@ -0,0 +1,119 @@
+import os
+
+import lazy_dataset.database
+import numpy as np
+import pytest
+import soundfile
+
+from padertorch.data import audio_scan
+from padertorch.data.audio_scan import create_database, scan_audio_files
+
+
+@pytest.fixture
+def database_dir(tmp_path):
+    root = tmp_path / 'db'
+    for name, num_samples in [
+        ('train/clean/a.wav', 100),
+        ('train/clean/b.flac', 200),
+        ('train/noisy/c.wav', 300),
+        ('test/d.wav', 400),
+    ]:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        soundfile.write(str(path), np.zeros(num_samples), 8000)
+    (root / 'test' / 'broken.wav').write_text('no audio')
+    (root / 'test' / 'notes.txt').write_text('not scanned')
+    return root
+
+
+@pytest.fixture
+def count_reads(monkeypatch):
+    read_paths = []
+    read_audio_info = audio_scan.read_audio_info
+
+    def counting_read(path):
+        read_paths.append(path)
+        return read_audio_info(path)
+
+    monkeypatch.setattr(audio_scan, 'read_audio_info', counting_read)
+    return read_paths
+
+
+@pytest.mark.parametrize('num_processes', [0, 2])
+def test_scan(database_dir, num_processes):
+    infos = scan_audio_files(
+        database_dir, num_processes=num_processes, chunk_size=2)
+    names = {
+        os.path.relpath(path, database_dir): info
+        for path, info in infos.items()
+    }
+    assert list(names) == [
+        'test/broken.wav', 'test/d.wav',
+        'train/clean/a.wav', 'train/clean/b.flac', 'train/noisy/c.wav',
+    ]
+    assert 'error' in names['test/broken.wav']
+    assert names['train/clean/b.flac'] == {
+        'num_samples': 200, 'sample_rate': 8000, 'num_channels': 1}
+
+
+def test_cache(database_dir, tmp_path, count_reads):
+    cache_file = tmp_path / 'cache' / 'scan.jsonl'
+    infos = scan_audio_files(database_dir, cache_file=cache_file)
+    assert len(count_reads) == 5
+
+    assert scan_audio_files(database_dir, cache_file=cache_file) == infos
+    # Only the broken file is not cached
+    assert len(count_reads) == 6
+
+    # A modified file is read again
+    path = database_dir / 'test' / 'd.wav'
+    soundfile.write(str(path), np.zeros(50), 8000)
+    os.utime(path, ns=(0, 0))
+    infos = scan_audio_files(database_dir, cache_file=cache_file)
+    assert sorted(count_reads[6:]) == [
+        str(path.parent / 'broken.wav'), str(path)]
+    assert infos[str(path)]['num_samples'] == 50
+
+    # An incomplete last line (e.g. interrupted scan) is ignored
+    with open(cache_file, 'a') as fid:
+        fid.write('{"path": "/incompl')
+    assert scan_audio_files(database_dir, cache_file=cache_file) == infos
+
+
+def test_file_list(database_dir):
+    paths = [database_dir / 'test' / 'd.wav', database_dir / 'test' / 'd.wav']
+    infos = scan_audio_files(paths)
+    assert list(infos) == [str(paths[0])]
+
+
+def test_create_database(database_dir, tmp_path):
+    infos = scan_audio_files(database_dir)
+    json_path = tmp_path / 'db.json'
+    create_database(infos, database_dir, json_path=json_path)
+    db = lazy_dataset.database.JsonDatabase(json_path)
+    assert sorted(db.dataset_names) == ['test', 'train/clean', 'train/noisy']
+    example = db.get_dataset('train/clean')['b']
+    assert example['num_samples'] == 200
+    assert example['audio_path']['observation'] == str(
+        database_dir / 'train' / 'clean' / 'b.flac')
+
+    database = create_database(
+        infos, database_dir,
+        dataset_name_fn=lambda path: path.parts[0],
+        example_id_fn=lambda path: path.with_suffix('').as_posix(),
+    )
+    assert sorted(database['datasets']['train']) == [
+        'train/clean/a', 'train/clean/b', 'train/noisy/c']
+
+
+def test_symlink_cycle(database_dir):
+    # A cycle is not followed, other symlinks to directories are
+    os.symlink(database_dir / 'train', database_dir / 'train' / 'clean' / 'up')
+    os.symlink(database_dir / 'test', database_dir / 'test_link')
+    infos = scan_audio_files(database_dir)
+    names = [os.path.relpath(path, database_dir) for path in infos]
+    assert names == [
+        'test/broken.wav', 'test/d.wav',
+        'test_link/broken.wav', 'test_link/d.wav',
+        'train/clean/a.wav', 'train/clean/b.flac', 'train/noisy/c.wav',
+    ]
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pytest
+import torch
+
+import padertorch as pt
+
+
+@dataclass
+class Data:
+    signal: np.ndarray
+    num_samples: int
+
+
+def get_example():
+    return {
+        'observation': np.random.randn(2, 3, 100).astype(np.float32),
+        'num_samples': np.array([100, 80]),
+        'speaker_id': 3,
+        'example_id': ['a', 'b'],
+        'stft': np.ones((2, 5), np.complex64),
+        'masks': (torch.ones(2, 5, dtype=torch.bool), torch.zeros(2, 5)),
+        'data': Data(np.arange(4, dtype=np.float32), 4),
+    }
+
+
+def assert_same_structure(actual, expected, device):
+    if isinstance(expected, dict):
+        assert type(actual) is type(expected)
+        assert actual.keys() == expected.keys()
+        for k in expected:
+            assert_same_structure(actual[k], expected[k], device)
+    elif isinstance(expected, (tuple, list)):
+        assert type(actual) is type(expected)
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            assert_same_structure(a, e, device)
+    elif isinstance(expected, Data):
+        assert_same_structure(actual.signal, expected.signal, device)
+        assert actual.num_samples == expected.num_samples
+    elif torch.is_tensor(expected):
+        assert actual.device == torch.device(device), (actual.device, device)
+        assert actual.dtype == expected.dtype
+        assert actual.shape == expected.shape
+        if device != 'meta':
+            np.testing.assert_equal(
+                actual.cpu().numpy(), expected.cpu().numpy())
+    else:
+        assert type(actual) is type(expected)
+        if isinstance(expected, np.ndarray):
+            np.testing.assert_equal(actual, expected)
+        else:
+            assert actual == expected
+
+
+devices = ['cpu', 'meta']
+if torch.cuda.is_available():
+    devices.append('cuda:0')
+
+
+@pytest.mark.parametrize('device', devices)
+def test_batched_example_to_device(device):
+    example = get_example()
+    expected = pt.data.example_to_device(example, device)
+    actual = pt.data.example_to_device(example, device, batched=True)
+    assert_same_structure(actual, expected, device)
+
+
+def test_batched_example_to_device_single_buffer_per_dtype():
+    example = get_example()
+    actual = pt.data.example_to_device(example, 'meta', batched=True)
+    # The float32 leaves are views of the same transferred buffer
+    buffer = actual['observation']._base
+    assert buffer is not None
+    assert buffer.shape == (2 * 3 * 100 + 2 * 5 + 4,)
+    assert actual['masks'][1]._base is buffer
+    assert actual['data'].signal._base is buffer
+    assert actual['num_samples']._base is not buffer
+
+
+def test_batched_example_to_device_requires_grad():
+    x = torch.ones(3, requires_grad=True)
+    out = pt.data.example_to_device({'x': x}, 'meta', batched=True)
+    assert out['x'].requires_grad
+    assert out['x'].grad_fn is not None
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='Needs a GPU')
+def test_batched_example_to_device_reuses_pinned_buffers():
+    from padertorch.data.batch import _pinned_buffers
+    examples = [get_example() for _ in range(3)]
+    examples[1]['observation'] = examples[1]['observation'][:, :, :50]
+    results = []
+    for example in examples:
+        results.append(pt.data.example_to_device(
+            example, 'cuda:0', batched=True))
+        buffer = _pinned_buffers.buffers[torch.float32]
+        assert buffer.is_pinned()
+        if len(results) == 1:
+            first = buffer
+        # The smaller example reuses the buffer
+        assert buffer.data_ptr() == first.data_ptr()
+    # Reusing the buffer does not overwrite running transfers
+    for actual, example in zip(results, examples):
+        assert_same_structure(
+            actual, pt.data.example_to_device(example, 'cuda:0'), 'cuda:0')
@@ -0,0 +1,146 @@
+import lazy_dataset
+import numpy as np
+import pytest
+import torch
+
+from padertorch.data.batch_cache import BatchCache
+
+
+class Prepare:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, example):
+        self.calls += 1
+        return {
+            'example_id': str(example),
+            'features': np.full((2, example + 1), example, dtype=np.float32),
+            'tensor': torch.arange(example + 1),
+            'num_frames': example + 1,
+        }
+
+
+def get_dataset(prepare, num_examples=5):
+    return lazy_dataset.new(list(range(num_examples))).map(prepare)
+
+
+def assert_equal(batches, expected):
+    assert len(batches) == len(expected)
+    for batch, ref in zip(batches, expected):
+        assert batch.keys() == ref.keys()
+        assert batch['example_id'] == ref['example_id']
+        assert batch['num_frames'] == ref['num_frames']
+        np.testing.assert_equal(batch['features'], ref['features'])
+        assert isinstance(batch['tensor'], torch.Tensor)
+        assert torch.equal(batch['tensor'], ref['tensor'])
+
+
+def test_memory_replay():
+    prepare = Prepare()
+    ds = BatchCache(get_dataset(prepare))
+    expected = list(get_dataset(Prepare()))
+    assert_equal(list(ds), expected)
+    assert_equal(list(ds), expected)
+    assert prepare.calls == 5
+    assert len(ds) == 5
+
+
+def test_max_size():
+    prepare = Prepare()
+    ds = BatchCache(get_dataset(prepare), max_size=20)
+    with pytest.warns(UserWarning, match='exceed max_size'):
+        list(ds)
+    list(ds)
+    assert prepare.calls == 10
+
+
+def test_interrupted_iteration():
+    prepare = Prepare()
+    ds = BatchCache(get_dataset(prepare))
+    for _ in zip(range(2), ds):
+        pass
+    assert_equal(list(ds), list(get_dataset(Prepare())))
+    assert prepare.calls == 2 + 5
+
+
+def test_inplace_modification(tmp_path):
+    for ds in [
+        BatchCache(get_dataset(Prepare())),
+        BatchCache(get_dataset(Prepare()), cache_dir=tmp_path, config={}),
+    ]:
+        list(ds)
+        for batch in ds:
+            batch['features'] *= 0
+            batch['tensor'] *= 0
+        assert_equal(list(ds), list(get_dataset(Prepare())))
+
+
+def test_disk_cache(tmp_path):
+    prepare = Prepare()
+    config = {'num_examples': 5}
+    ds = BatchCache(get_dataset(prepare), cache_dir=tmp_path, config=config)
+    expected = list(get_dataset(Prepare()))
+    assert_equal(list(ds), expected)
+    assert_equal(list(ds), expected)
+    assert prepare.calls == 5
+
+    # Another instance (e.g. a new run) with the same config uses the file
+    ds = BatchCache(get_dataset(prepare), cache_dir=tmp_path, config=config)
+    assert_equal(list(ds), expected)
+    assert prepare.calls == 5
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # A changed config invalidates the cache
+    ds = BatchCache(
+        get_dataset(prepare, 3), cache_dir=tmp_path,
+        config={'num_examples': 3},
+    )
+    assert_equal(list(ds), expected[:3])
+    assert prepare.calls == 5 + 3
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_disk_cache_interrupted(tmp_path):
+    prepare = Prepare()
+    ds = BatchCache(get_dataset(prepare), cache_dir=tmp_path, config={})
+    for _ in zip(range(2), ds):
+        pass
+    # Neither an index nor a data file
+    assert list(ds.cache_dir.iterdir()) == []
+    assert_equal(list(ds), list(get_dataset(Prepare())))
+    assert sorted(p.suffix for p in ds.cache_dir.iterdir()) == [
+        '.bin', '.json', '.pkl']
+
+
+def test_disk_cache_concurrent(tmp_path):
+    # Two runs with the same config record at the same time, the last index
+    # wins and the data file of the other run is removed.
+    expected = list(get_dataset(Prepare()))
+    first, second = [
+        BatchCache(get_dataset(Prepare()), cache_dir=tmp_path, config={})
+        for _ in range(2)
+    ]
+    first_iterator, second_iterator = iter(first), iter(second)
+    next(first_iterator), next(second_iterator)
+    assert_equal([expected[0]] + list(first_iterator), expected)
+    assert_equal([expected[0]] + list(second_iterator), expected)
+    assert len(list(first.cache_dir.glob('data_*.bin'))) == 1
+
+    # A replaying run keeps its data file open, when another run replaces it
+    replay = BatchCache(get_dataset(Prepare()), cache_dir=tmp_path, config={})
+    assert_equal(list(replay), expected)
+    (first.cache_dir / 'index.pkl').unlink()
+    list(BatchCache(get_dataset(Prepare()), cache_dir=tmp_path, config={}))
+    assert len(list(first.cache_dir.glob('data_*.bin'))) == 1
+    assert_equal(list(replay), expected)
+
+
+def test_disk_cache_max_size(tmp_path):
+    prepare = Prepare()
+    ds = BatchCache(
+        get_dataset(prepare), max_size=20, cache_dir=tmp_path, config={})
+    with pytest.warns(UserWarning, match='exceed max_size'):
+        list(ds)
+    assert list(ds.cache_dir.iterdir()) == []
+    list(ds)
+    assert prepare.calls == 10
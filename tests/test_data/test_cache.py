@@ -0,0 +1,143 @@
+import dataclasses
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+from padertorch.data.cache import FeatureCache, get_transform_config
+
+
+@dataclasses.dataclass
+class Power:
+    exponent: int = 2
+
+    def __post_init__(self):
+        self.calls = 0
+
+    def __call__(self, example):
+        self.calls += 1
+        x = np.load(example['audio_path'])
+        return {**example, 'x': x, 'feature': x ** self.exponent}
+
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def get_examples(tmp_dir, num_examples=4):
+    examples = []
+    for i in range(num_examples):
+        path = tmp_dir / f'{i}.npy'
+        np.save(path, np.arange(100) + i)
+        examples.append({'example_id': str(i), 'audio_path': str(path)})
+    return examples
+
+
+def test_hit(tmp_dir):
+    examples = get_examples(tmp_dir)
+    transform = Power()
+    cache = FeatureCache(transform, tmp_dir / 'cache')
+    first = [cache(ex) for ex in examples]
+    second = [cache(ex) for ex in examples]
+    assert transform.calls == 4
+    for a, b in zip(first, second):
+        np.testing.assert_equal(a['feature'], b['feature'])
+    assert cache.statistics['hits'] == 4
+
+    # A new process (e.g. the next training) reuses the cache.
+    cache = pickle.loads(pickle.dumps(cache))
+    cache._reset_statistics()
+    for ex in examples:
+        cache(ex)
+    assert cache.statistics['hits'] == 4
+
+
+def test_invalidation(tmp_dir):
+    examples = get_examples(tmp_dir)
+    cache = FeatureCache(Power(), tmp_dir / 'cache')
+    for ex in examples:
+        cache(ex)
+
+    # Changed config
+    cache = FeatureCache(Power(3), tmp_dir / 'cache')
+    np.testing.assert_equal(
+        cache(examples[1])['feature'], (np.arange(100) + 1) ** 3)
+    assert cache.statistics['misses'] == 1
+
+    # Changed file
+    cache = FeatureCache(Power(), tmp_dir / 'cache')
+    np.save(examples[0]['audio_path'], np.zeros(100))
+    stat = os.stat(examples[0]['audio_path'])
+    os.utime(examples[0]['audio_path'],
+             ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    np.testing.assert_equal(cache(examples[0])['feature'], np.zeros(100))
+    cache(examples[1])
+    assert cache.statistics == {
+        'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
+
+
+def test_keys(tmp_dir):
+    examples = get_examples(tmp_dir)
+    cache = FeatureCache(Power(), tmp_dir / 'cache', keys=['feature'])
+    cache(examples[0])
+    out = cache(examples[0])
+    assert cache.statistics['hits'] == 1
+    assert set(out.keys()) == {'example_id', 'audio_path', 'feature'}
+    with open(cache.get_path(examples[0]), 'rb') as fid:
+        assert set(pickle.load(fid).keys()) == {'feature'}
+
+
+def test_lru_eviction(tmp_dir):
+    examples = get_examples(tmp_dir, 10)
+    cache = FeatureCache(Power(), tmp_dir / 'cache')
+    cache(examples[0])
+    entry_size = cache.size()
+
+    cache = FeatureCache(
+        Power(), tmp_dir / 'cache', max_size=int(4.5 * entry_size))
+    for i, ex in enumerate(examples[1:]):
+        cache(ex)
+        # Keep the first example recently used
+        stat = os.stat(cache.get_path(examples[0]))
+        os.utime(cache.get_path(examples[0]),
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**12))
+        os.utime(cache.get_path(ex), ns=(0, 10**9 * i))
+    assert cache.size() <= 4.5 * entry_size
+    assert cache.statistics['evictions'] > 0
+    assert cache.get_path(examples[0]).exists()
+    assert cache.get_path(examples[-1]).exists()
+    assert not cache.get_path(examples[1]).exists()
+
+
+def test_config():
+    assert get_transform_config(Power(2)) != get_transform_config(Power(3))
+    assert get_transform_config([Power(2)]) == [
+        {'factory': f'{__name__}.Power', 'exponent': 2, 'calls': 0}]
+
+
+def test_config_module():
+    # The parameters and buffers of a module are part of the config
+    norm = torch.nn.BatchNorm1d(3)
+    config = get_transform_config(torch.nn.Sequential(norm))
+    assert config['0']['running_mean']['shape'] == [3]
+    norm.running_mean += 1
+    assert get_transform_config(torch.nn.Sequential(norm)) != config
+
+
+def test_config_rejected():
+    with pytest.raises(ValueError, match='lambda'):
+        get_transform_config(lambda example: example)
+
+    def local_function(example):
+        return example
+    with pytest.raises(ValueError, match='local function'):
+        get_transform_config([Power(2), local_function])
+    # The repr would contain the memory address
+    with pytest.raises(TypeError, match='RandomState'):
+        get_transform_config(np.random.RandomState(0))
@@ -0,0 +1,84 @@
+import lazy_dataset
+import numpy as np
+import pytest
+
+from padertorch.data.dynamic_batch import DynamicBatchDataset
+
+
+def get_dataset(num_examples=500, seed=0):
+    rng = np.random.RandomState(seed)
+    return lazy_dataset.new([
+        {'example_id': str(i), 'num_samples': int(n)}
+        for i, n in enumerate(rng.randint(100, 2000, num_examples))
+    ])
+
+
+@pytest.mark.parametrize('budget', ['padded', 'frames'])
+@pytest.mark.parametrize('sort_window', [None, 1, 64])
+@pytest.mark.parametrize('bucket_boundaries', [None, [500, 1000]])
+def test_budget(budget, sort_window, bucket_boundaries):
+    ds = get_dataset()
+    batches = DynamicBatchDataset(
+        ds, 'num_samples', max_total_size=8000, budget=budget,
+        max_batch_size=6, sort_window=sort_window,
+        bucket_boundaries=bucket_boundaries,
+    )
+    example_ids = []
+    for batch in batches:
+        lengths = [ex['num_samples'] for ex in batch]
+        assert len(batch) <= 6
+        if budget == 'padded':
+            assert len(batch) * max(lengths) <= 8000
+        else:
+            assert sum(lengths) <= 8000
+        assert lengths == sorted(lengths, reverse=True)
+        if bucket_boundaries is not None:
+            assert len(set(np.searchsorted(
+                bucket_boundaries, lengths, side='right'))) == 1
+        example_ids.extend([ex['example_id'] for ex in batch])
+    # Each example exactly once
+    assert sorted(example_ids) == sorted([ex['example_id'] for ex in ds])
+
+    statistics = batches.statistics
+    assert statistics['num_examples'] == len(ds)
+    assert 0 <= statistics['padding_ratio'] < 1
+
+
+def test_padding_ratio():
+    ds = get_dataset()
+    ratios = []
+    for sort_window in [None, 100, 500]:
+        batches = DynamicBatchDataset(
+            ds, 'num_samples', max_total_size=8000, sort_window=sort_window)
+        num_frames = num_padded = 0
+        for batch in batches:
+            lengths = [ex['num_samples'] for ex in batch]
+            num_frames += sum(lengths)
+            num_padded += len(lengths) * max(lengths)
+        np.testing.assert_allclose(
+            batches.statistics['padding_ratio'], 1 - num_frames / num_padded)
+        ratios.append(batches.statistics['padding_ratio'])
+    assert ratios[0] > ratios[1] > ratios[2], ratios
+
+
+def test_shuffle_and_drop_incomplete():
+    ds = get_dataset()
+    batches = DynamicBatchDataset(
+        ds, 'num_samples', max_total_size=8000, sort_window=100,
+        shuffle=True, rng=np.random.RandomState(0), drop_incomplete=True,
+    )
+    first = [[ex['example_id'] for ex in b] for b in batches]
+    second = [[ex['example_id'] for ex in b] for b in batches]
+    assert first != second
+    assert sorted(map(sorted, first)) == sorted(map(sorted, second))
+    statistics = batches.statistics
+    assert statistics['num_examples'] + statistics['num_dropped'] == len(ds)
+
+    # Without a sort window, there is nothing to shuffle
+    with pytest.raises(AssertionError, match='sort_window'):
+        DynamicBatchDataset(ds, 'num_samples', 8000, shuffle=True)
+
+    # The dataset pipeline continues after the batching
+    ds = ds.apply(lambda ds: DynamicBatchDataset(
+        ds, 'num_samples', max_total_size=8000)).map(len)
+    assert sum(ds) == 500
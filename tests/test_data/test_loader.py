@@ -0,0 +1,110 @@
+import types
+
+import lazy_dataset
+import numpy as np
+import pytest
+import torch
+
+from padertorch.data.loader import to_data_loader, LazyIterableDataset
+
+pytestmark = pytest.mark.filterwarnings(
+    'ignore:This DataLoader will create:UserWarning')
+
+
+def get_dataset(num_examples=20):
+    return lazy_dataset.new(list(range(num_examples))).map(lambda x: 10 * x)
+
+
+def test_map_style_shuffle():
+    ds = get_dataset()
+    loader = to_data_loader(
+        ds, batch_size=3, shuffle=True, num_workers=2, seed=0)
+    epochs = [[ex for batch in loader for ex in batch] for _ in range(2)]
+    for epoch in epochs:
+        assert sorted(epoch) == list(ds)
+    assert epochs[0] != epochs[1]
+
+    # Deterministic with a seed
+    loader = to_data_loader(
+        ds, batch_size=3, shuffle=True, num_workers=2, seed=0)
+    assert [ex for batch in loader for ex in batch] == epochs[0]
+
+
+@pytest.mark.parametrize('persistent_workers', [False, True])
+def test_iterable_sharding(persistent_workers):
+    ds = get_dataset().shuffle(reshuffle=True)
+    loader = to_data_loader(
+        ds, num_workers=3, seed=1, persistent_workers=persistent_workers)
+    assert isinstance(loader.dataset, LazyIterableDataset)
+    epochs = [list(loader) for _ in range(3)]
+    for epoch in epochs:
+        # Each example exactly once, although each worker shuffles
+        assert sorted(epoch) == sorted(get_dataset())
+    # Reshuffled in each epoch
+    assert len({tuple(epoch) for epoch in epochs}) == 3
+
+    loader = to_data_loader(
+        ds, num_workers=3, seed=1, persistent_workers=persistent_workers)
+    assert list(loader) == epochs[0]
+
+
+def test_filter_exception():
+    def drop_odd(x):
+        if x % 20:
+            raise lazy_dataset.FilterException()
+        return x
+
+    ds = get_dataset().map(drop_odd)
+    loader = to_data_loader(
+        ds, batch_size=2, num_workers=2, catch_filter_exception=True)
+    assert sorted(ex for batch in loader for ex in batch) == list(range(0, 200, 20))
+
+
+def test_numpy_seeding():
+    ds = get_dataset(8).map(lambda x: np.random.randint(2**31))
+    values = list(to_data_loader(ds, num_workers=2, seed=0))
+    # The workers draw different random numbers
+    assert len(set(values)) == len(values)
+    assert values == list(to_data_loader(ds, num_workers=2, seed=0))
+
+
+def iterate_workers(get_pipeline, num_workers, monkeypatch):
+    # The examples of each worker, without worker processes. Each worker
+    # has its own dataset.
+    shards = []
+    for worker_id in range(num_workers):
+        info = types.SimpleNamespace(
+            id=worker_id, num_workers=num_workers, seed=7 + worker_id)
+        monkeypatch.setattr(
+            torch.utils.data, 'get_worker_info', lambda: info)
+        shards.append(list(LazyIterableDataset(get_pipeline())))
+    return shards
+
+
+def test_iterable_sharding_not_indexable(monkeypatch):
+    calls = []
+
+    def record(x):
+        calls.append(x)
+        return x
+
+    def get_pipeline():
+        # The frozen pipeline is not indexable, because of the filter
+        return (
+            get_dataset().shuffle(reshuffle=True).map(record)
+            .filter(lambda x: x % 20 == 0, lazy=True)
+        )
+
+    shards = iterate_workers(get_pipeline, 3, monkeypatch)
+    assert sorted(sum(shards, [])) == list(range(0, 200, 20))
+    # The map runs only for the shard of each worker
+    assert sorted(calls) == list(range(0, 200, 10))
+
+
+def test_iterable_sharding_warning(monkeypatch):
+    # Concatenated non-indexable datasets have no indexable part to shard
+    ds = get_dataset(6).filter(lambda x: True, lazy=True)
+    ds = lazy_dataset.concatenate(ds, ds)
+    with pytest.warns(UserWarning, match='no indexable part'):
+        shards = iterate_workers(lambda: ds, 2, monkeypatch)
+    assert sorted(sum(shards, [])) == sorted(list(ds))
@@ -0,0 +1,81 @@
+import pickle
+import tempfile
+from pathlib import Path
+
+import lazy_dataset
+import numpy as np
+import pytest
+import soundfile
+
+import paderbox as pb
+from padertorch.data.packed_audio import pack_database, PackedAudioReader
+
+
+@pytest.fixture(scope='module')
+def database():
+    rng = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        examples = {}
+        for i in range(10):
+            num_samples = rng.randint(100, 1000)
+            paths = {}
+            for key, channels in [('observation', 2), ('speech_source', 1)]:
+                path = tmp_dir / f'{key}_{i}.wav'
+                soundfile.write(
+                    str(path),
+                    rng.uniform(-0.5, 0.5, (num_samples, channels)).squeeze(),
+                    8000, subtype='PCM_16',
+                )
+                paths[key] = str(path)
+            paths['speech_source'] = [paths['speech_source']] * 2
+            examples[str(i)] = {
+                'audio_path': paths, 'num_samples': num_samples}
+        database = {'datasets': {'train': examples}}
+        pack_database(database, tmp_dir / 'packed', shard_size=4000)
+        yield database, tmp_dir / 'packed'
+
+
+def test_same_as_load_audio(database):
+    database, packed_dir = database
+    assert len(list(packed_dir.glob('shard_*.bin'))) > 1
+    reader = PackedAudioReader(packed_dir)
+    for example in database['datasets']['train'].values():
+        expected = pb.io.recursive_load_audio(
+            example['audio_path'], dtype=np.float32)
+        out = reader(dict(example))['audio_data']
+        assert out['observation'].shape == expected['observation'].shape
+        np.testing.assert_equal(out['observation'], expected['observation'])
+        np.testing.assert_equal(
+            out['speech_source'][1], expected['speech_source'][1])
+
+        # Zero copy, but copy-on-write
+        assert not out['observation'].flags.owndata
+        out['observation'][...] = 0
+        np.testing.assert_equal(
+            reader(dict(example))['audio_data']['observation'],
+            expected['observation'])
+
+
+def test_partial_read(database):
+    database, packed_dir = database
+    reader = PackedAudioReader(packed_dir)
+    path = database['datasets']['train']['3']['audio_path']['observation']
+    expected = pb.io.load_audio(path, dtype=np.float32)
+    np.testing.assert_equal(reader.load(path, 10, 50), expected[..., 10:50])
+
+    lazy = PackedAudioReader(packed_dir, lazy=True)(
+        dict(database['datasets']['train']['3']))['audio_data']['observation']
+    assert lazy.shape == expected.shape
+    np.testing.assert_equal(lazy[..., -20:], expected[..., -20:])
+
+
+def test_pipeline(database):
+    database, packed_dir = database
+    reader = PackedAudioReader(packed_dir)
+    # The reader is pickled for process based prefetching
+    reader = pickle.loads(pickle.dumps(reader))
+    ds = lazy_dataset.new(database['datasets']['train']).map(reader)
+    for example in ds:
+        assert example['audio_data']['observation'].shape == (
+            2, example['num_samples'])
@@ -1,4 +1,6 @@
 from padertorch.data.segment import Segmenter
+from padertorch.data.utils import collate_fn
+from paderbox.utils.nested import flatten
 import numpy as np
 import torch
 
@@ -281,3 +283,90 @@ def test_length_mode():
             segmented = segmenter(ex)
             np.testing.assert_equal(segmented[0]['x'],
                                     np.arange(0, new_length[idx][mode]))
+
+
+def test_lazy():
+    ex = {'audio_data': {'x': np.arange(16000), 'y': np.arange(16000)},
+          'z': torch.arange(16000)[None],
+          'num_samples': 16000, 'gender': 'm'}
+    for kwargs in [
+        dict(length=950),
+        dict(length=950, shift=250, anchor='centered_cutout'),
+        dict(length=950, shift=250, mode='max', padding=True),
+        dict(length=950, shift=250, mode='min', padding=True),
+        dict(length=950, padding=True),
+        dict(length=950, copy_keys='gender'),
+    ]:
+        eager = Segmenter(include_keys=('audio_data', 'z'), **kwargs)(ex)
+        lazy = Segmenter(include_keys=('audio_data', 'z'), lazy=True,
+                         **kwargs)(ex)
+        assert len(eager) == len(lazy), kwargs
+        for e, l in zip(eager, lazy):
+            assert list(e.keys()) == list(l.keys()), (e.keys(), l.keys())
+            for actual in [{k: l[k] for k in l}, l.to_dict()]:
+                actual, expected = flatten(actual), flatten(e)
+                assert actual.keys() == expected.keys()
+                for key in expected:
+                    if isinstance(expected[key], (np.ndarray, torch.Tensor)):
+                        assert type(actual[key]) == type(expected[key]), key
+                    np.testing.assert_equal(
+                        np.asarray(actual[key]), np.asarray(expected[key]))
+        assert collate_fn(lazy).keys() == collate_fn(eager).keys()
+        # Views instead of copies
+        if not kwargs.get('padding', False):
+            assert np.shares_memory(
+                lazy[-1]['audio_data']['x'], ex['audio_data']['x'])
+
+
+def test_lazy_array_like():
+    class Reader:
+        """Reads only the requested part of a signal."""
+        shape = (65000,)
+        requested = []
+
+        def __getitem__(self, item):
+            self.requested.append(item)
+            return np.arange(65000)[item]
+
+    segmenter = Segmenter(length=32000, include_keys='x', lazy=True)
+    segmented = segmenter({'x': Reader(), 'num_samples': 65000})
+    assert Reader.requested == []
+    np.testing.assert_equal(segmented[1]['x'], np.arange(32000, 64000))
+    assert Reader.requested == [(slice(32000, 64000),)]
+
+
+def test_lazy_nested():
+    class Reader:
+        """Reads only the requested part of a signal."""
+        shape = (8,)
+
+        def __init__(self):
+            self.requested = []
+
+        def __getitem__(self, item):
+            self.requested.append(item)
+            return np.arange(8)[item]
+
+    ex = {
+        'audio_data': {'x': Reader(), 'y': Reader()},
+        'z': Reader(),
+        'num_samples': 8,
+    }
+    segmenter = Segmenter(length=4, include_keys=('audio_data', 'z'),
+                          lazy=True)
+    segment = segmenter(ex)[1]
+    np.testing.assert_equal(segment['audio_data']['x'], np.arange(4, 8))
+    # Only the values below the key are read
+    assert ex['audio_data']['x'].requested == [(slice(4, 8),)]
+    assert ex['z'].requested == []
+
+    # Modifications of the nested dict persist
+    segment['audio_data']['x'] = segment['audio_data']['x'] * 2
+    segment['audio_data']['w'] = 1
+    np.testing.assert_equal(segment['audio_data']['x'], np.arange(8, 16, 2))
+    actual = segment.to_dict()
+    np.testing.assert_equal(actual['audio_data']['x'], np.arange(8, 16, 2))
+    assert actual['audio_data']['w'] == 1
+    assert set(actual) == {
+        'audio_data', 'z', 'num_samples', 'segment_start', 'segment_stop'}
+    assert len(ex['audio_data']['x'].requested) == 1
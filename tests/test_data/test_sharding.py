@@ -0,0 +1,109 @@
+import lazy_dataset
+import numpy as np
+import pytest
+import torch.distributed
+
+from padertorch.data.sharding import ShardDataset, get_rank_and_world_size
+
+
+def get_shards(num_examples, world_size, **kwargs):
+    ds = lazy_dataset.new(list(range(num_examples)))
+    return [ShardDataset(ds, rank, world_size, **kwargs)
+            for rank in range(world_size)]
+
+
+@pytest.mark.parametrize('num_examples', [1, 9, 10, 11, 12])
+@pytest.mark.parametrize('lengths', [False, True])
+def test_disjoint(num_examples, lengths):
+    lengths = np.random.RandomState(0).randint(1, 100, num_examples) \
+        if lengths else None
+    shards = get_shards(num_examples, 4, lengths=lengths, tail=None)
+    for _ in range(3):
+        epoch = [list(shard) for shard in shards]
+        assert sorted(sum(epoch, [])) == list(range(num_examples))
+        assert max(map(len, epoch)) - min(map(len, epoch)) <= 1
+
+
+@pytest.mark.parametrize('tail,size', [('pad', 3), ('drop', 2)])
+def test_tail(tail, size):
+    for shards in [
+        get_shards(10, 4, tail=tail),
+        get_shards(10, 4, tail=tail, lengths=np.arange(10) + 1),
+    ]:
+        for _ in range(2):
+            assert [len(shard) for shard in shards] == [size] * 4
+            assert [len(list(shard)) for shard in shards] == [size] * 4
+
+
+def test_duration_balance():
+    lengths = np.random.RandomState(1).exponential(10, 1001)
+    shards = get_shards(1001, 8, lengths=lengths, tail=None)
+    totals = [lengths[list(shard)].sum() for shard in shards]
+    assert max(totals) - min(totals) <= lengths.max()
+
+    # Without lengths, only the number of examples is balanced
+    shards = get_shards(1001, 8, tail=None)
+    totals_count = [lengths[list(shard)].sum() for shard in shards]
+    assert np.ptp(totals) < np.ptp(totals_count)
+
+
+def test_epochs():
+    shard, = get_shards(10, 1, seed=3)
+    epochs = [list(shard) for _ in range(3)]
+    assert len({tuple(epoch) for epoch in epochs}) == 3
+
+    shard, = get_shards(10, 1, seed=3)
+    shard.set_epoch(2)
+    assert list(shard) == epochs[2]
+
+    shard, = get_shards(10, 1, shuffle=False)
+    assert list(shard) == list(shard) == list(range(10))
+
+
+def test_freeze(monkeypatch):
+    monkeypatch.setenv('OMP_NUM_THREADS', '1')
+    monkeypatch.setenv('MKL_NUM_THREADS', '1')
+    reference, = get_shards(10, 1, seed=3)
+    shard, = get_shards(10, 1, seed=3)
+    ds = shard.map(lambda x: 2 * x).prefetch(2, 4)
+    for _ in range(2):
+        assert list(ds) == [2 * x for x in reference]
+
+
+def test_freeze_changing_length(monkeypatch):
+    # With lengths and tail=None, the size of a shard changes between the
+    # epochs and the prefetch has to use the size of the current epoch.
+    monkeypatch.setenv('OMP_NUM_THREADS', '1')
+    monkeypatch.setenv('MKL_NUM_THREADS', '1')
+    lengths = np.random.RandomState(0).randint(1, 100, 11)
+    references = get_shards(11, 2, lengths=lengths, tail=None)
+    shards = get_shards(11, 2, lengths=lengths, tail=None)
+    datasets = [shard.map(lambda x: 2 * x).prefetch(2, 4) for shard in shards]
+    sizes = []
+    for _ in range(4):
+        for ds, reference in zip(datasets, references):
+            expected = [2 * x for x in reference]
+            sizes.append(len(expected))
+            assert list(ds) == expected
+    assert sizes == [5, 6, 6, 5, 5, 6, 6, 5]
+
+
+@pytest.mark.parametrize('tail', ['pad', 'drop', None])
+def test_empty(tail):
+    shards = get_shards(0, 2, tail=tail, lengths=[])
+    assert [list(shard) for shard in shards] == [[], []]
+
+
+def test_torch_distributed(tmp_path):
+    assert get_rank_and_world_size() == (0, 1)
+    torch.distributed.init_process_group(
+        'gloo', init_method=f'file://{tmp_path / "store"}',
+        rank=0, world_size=1,
+    )
+    try:
+        assert get_rank_and_world_size() == (0, 1)
+        shard = ShardDataset(lazy_dataset.new(list(range(5))))
+        assert (shard.rank, shard.world_size) == (0, 1)
+        assert sorted(shard) == list(range(5))
+    finally:
+        torch.distributed.destroy_process_group()
@@ -0,0 +1,90 @@
+import gc
+import multiprocessing
+import pickle
+
+import numpy as np
+import pytest
+import torch
+
+from padertorch.data.shared_memory import SharedMemoryTransport
+
+
+@pytest.fixture
+def transport():
+    transport = SharedMemoryTransport(
+        num_blocks=2, block_size=2**16, min_size=1024)
+    yield transport
+    gc.collect()
+    transport.close()
+
+
+def get_example(seed=0):
+    rng = np.random.RandomState(seed)
+    return {
+        'features': rng.randn(4, 100, 8).astype(np.float32),
+        'labels': torch.from_numpy(rng.rand(4, 300) > 0.5),
+        'seq_len': np.array([100, 90, 80, 70]),
+        'example_id': ['a', 'b', 'c', 'd'],
+    }
+
+
+def assert_example_equal(actual, desired):
+    assert actual.keys() == desired.keys()
+    np.testing.assert_equal(actual['features'], desired['features'])
+    assert isinstance(actual['labels'], torch.Tensor)
+    np.testing.assert_equal(
+        actual['labels'].numpy(), desired['labels'].numpy())
+    np.testing.assert_equal(actual['seq_len'], desired['seq_len'])
+    assert actual['example_id'] == desired['example_id']
+
+
+def test_roundtrip(transport):
+    example = get_example()
+    decoded = transport.decode(pickle.loads(pickle.dumps(
+        transport.encode(example))))
+    assert_example_equal(decoded, example)
+    assert transport.num_shared == 1
+    # The small array is pickled
+    assert decoded['seq_len'].base is None
+
+
+def test_block_recycling(transport):
+    decoded = [transport.decode(transport.encode(get_example(i)))
+               for i in range(2)]
+    assert list(transport._flags_block.buf) == [1, 1]
+
+    # No free block: The example is pickled
+    example = transport.encode(get_example(2))
+    assert isinstance(example, dict)
+    assert_example_equal(transport.decode(example), get_example(2))
+    assert transport.num_fallback == 1
+
+    # A block is free, when all arrays are deleted
+    features = decoded[0]['features']
+    del decoded[0]
+    assert list(transport._flags_block.buf) == [1, 1]
+    del features
+    assert list(transport._flags_block.buf) == [0, 1]
+    decoded.append(transport.decode(transport.encode(get_example(3))))
+    assert_example_equal(decoded[-1], get_example(3))
+    assert_example_equal(decoded[0], get_example(1))
+
+
+def test_too_large(transport):
+    example = {'x': np.zeros(2**16 + 1, dtype=np.uint8)}
+    assert transport.encode(example) is example
+
+
+def _encode(transport, seed):
+    return transport.encode(get_example(seed))
+
+
+def test_worker_processes(transport):
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        for i in range(4):
+            encoded = pool.apply(_encode, (transport, i))
+            decoded = transport.decode(encoded)
+            assert_example_equal(decoded, get_example(i))
+            del decoded
+    assert transport.num_shared == 4
+    assert list(transport._flags_block.buf) == [0, 0]
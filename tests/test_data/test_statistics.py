@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+import lazy_dataset
+import numpy as np
+
+from padertorch.data.statistics import Moments, map_reduce, cached_statistics
+
+
+def get_dataset(num_examples=20):
+    rng = np.random.RandomState(0)
+    return lazy_dataset.new({
+        str(i): {
+            'features': rng.randn(3, rng.randint(5, 50)) * (i + 1),
+            'labels': [f'label_{i % 7}', f'label_{i % 3}'],
+        }
+        for i in range(num_examples)
+    })
+
+
+def moments_of_shard(shard):
+    moments = Moments()
+    for example in shard:
+        moments.update(example['features'], axis=-1)
+    return moments
+
+
+def test_moments_parallel():
+    ds = get_dataset()
+    features = np.concatenate([ex['features'] for ex in ds], axis=-1)
+    for num_workers, num_shards in [(1, None), (3, None), (3, 7)]:
+        moments = map_reduce(
+            ds, moments_of_shard, Moments.merge,
+            num_workers=num_workers, num_shards=num_shards,
+        )
+        assert moments.count == features.shape[-1]
+        np.testing.assert_allclose(moments.mean, features.mean(-1))
+        np.testing.assert_allclose(moments.std, features.std(-1))
+        moments = Moments.from_dict(moments.to_dict())
+        np.testing.assert_allclose(moments.var, features.var(-1))
+
+
+def test_label_sets():
+    ds = get_dataset()
+    labels = map_reduce(
+        ds,
+        # Lambdas work, because the workers are forked
+        lambda shard: {label for ex in shard for label in ex['labels']},
+        set.union, num_workers=4,
+    )
+    assert labels == {f'label_{i}' for i in range(7)}
+
+
+def test_cached_statistics():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'mean': [1., 2.]}
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        for _ in range(2):
+            assert cached_statistics(
+                storage_dir, 'norm', {'dataset': 'train'}, compute
+            ) == {'mean': [1., 2.]}
+        assert len(calls) == 1
+        # A different config is computed again
+        cached_statistics(storage_dir, 'norm', {'dataset': 'test'}, compute)
+        assert len(calls) == 2
+        assert len(os.listdir(storage_dir)) == 2
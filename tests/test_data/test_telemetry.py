@@ -0,0 +1,109 @@
+import pickle
+import time
+import types
+
+import lazy_dataset
+import pytest
+
+from padertorch.data.telemetry import PipelineTelemetry
+from padertorch.train.hooks import DataPipelineTelemetryHook
+from padertorch.train.trainer import ContextTimerDict
+
+
+def slow_read(example):
+    time.sleep(0.01)
+    return example
+
+
+def fast_scale(example):
+    return 2 * example
+
+
+def get_dataset(telemetry, num_workers=2):
+    return (
+        lazy_dataset.new(list(range(20)))
+        .map(telemetry.timed('read', slow_read))
+        .map(telemetry.timed('scale', fast_scale))
+        .map(telemetry.encode)
+        .prefetch(num_workers, 4)
+        .map(telemetry.decode)
+    )
+
+
+@pytest.fixture
+def single_threaded_libs(monkeypatch):
+    # Required by the multi-threaded prefetch of lazy_dataset
+    monkeypatch.setenv('OMP_NUM_THREADS', '1')
+    monkeypatch.setenv('MKL_NUM_THREADS', '1')
+
+
+def test_stage_times(single_threaded_libs):
+    telemetry = PipelineTelemetry()
+    assert list(get_dataset(telemetry)) == [2 * i for i in range(20)]
+    statistics = telemetry.statistics
+    assert statistics['num_examples'] == 20
+    assert statistics['num_workers'] == 2
+    assert statistics['stage_time']['read'] >= 20 * 0.01
+    assert statistics['stage_time']['read'] > statistics['stage_time']['scale']
+    assert statistics['busy_time'] >= statistics['stage_time']['read']
+    assert 0 < statistics['worker_utilization'] <= 1
+    assert sum(statistics['worker_num_examples'].values()) == 20
+    assert sum(statistics['worker_busy_time'].values()) == pytest.approx(
+        statistics['busy_time'])
+    assert statistics['worker_utilization_max'] >= \
+        statistics['worker_utilization']
+    assert statistics['worker_utilization_spread'] >= 0
+
+    telemetry.reset()
+    assert telemetry.statistics['num_examples'] == 0
+
+
+def test_worker_imbalance():
+    telemetry = PipelineTelemetry()
+    for worker, busy_time in [('a', 0.), ('b', 1.), ('b', 2.)]:
+        example = telemetry.encode(0)
+        example.worker, example.busy_time = worker, busy_time
+        telemetry.decode(example)
+    statistics = telemetry.statistics
+    assert statistics['num_workers'] == 2
+    assert statistics['worker_num_examples'] == {'a': 1, 'b': 2}
+    assert statistics['worker_busy_time'] == {'a': 0., 'b': 3.}
+    # The idle worker 'a' halves the mean, the max shows the busy worker
+    assert statistics['worker_utilization_max'] == pytest.approx(
+        2 * statistics['worker_utilization'])
+    assert statistics['worker_utilization_spread'] == pytest.approx(
+        statistics['worker_utilization_max'])
+
+
+def test_disabled(single_threaded_libs):
+    telemetry = PipelineTelemetry(enabled=False)
+    assert telemetry.timed('read', slow_read) is slow_read
+    assert list(get_dataset(telemetry)) == [2 * i for i in range(20)]
+    assert telemetry.statistics['num_examples'] == 0
+
+
+def test_pickle():
+    telemetry = PipelineTelemetry()
+    stage = pickle.loads(pickle.dumps(telemetry.timed('scale', fast_scale)))
+    worker_telemetry = pickle.loads(pickle.dumps(telemetry))
+    # Timings of the unpickled copies are collected by the original
+    assert telemetry.decode(worker_telemetry.encode(stage(3))) == 6
+    assert list(telemetry.statistics['stage_time']) == ['scale']
+
+
+def test_hook():
+    telemetry = PipelineTelemetry()
+    trainer = types.SimpleNamespace(train_timer=ContextTimerDict())
+    hook = DataPipelineTelemetryHook(telemetry)
+    hook.pre_step(trainer)
+    for _ in get_dataset(telemetry, num_workers=1):
+        hook.pre_step(trainer)
+    timings = trainer.train_timer.as_dict
+    assert len(timings['time_per_data_read']) == 20
+    assert timings['time_per_data_read'].sum() == pytest.approx(
+        telemetry.statistics['stage_time']['read'])
+    assert (timings['data_worker_utilization'] >= 0).all()
+    # A single worker
+    assert len(timings['data_worker_utilization_max']) == 20
+    assert (timings['data_worker_utilization_spread'] == 0).all()
+    assert (timings['data_queue_depth'] >= 0).all()
@@ -0,0 +1,80 @@
+import pickle
+
+import lazy_dataset
+import numpy as np
+import torch
+
+from padertorch.data.utils import PaddedCollate, collate_fn, pad_tensor
+
+
+def get_batch(lengths=(5, 3, 4), dtype=np.float32):
+    return [
+        {
+            'example_id': str(i),
+            'observation': np.random.randn(2, length).astype(dtype),
+            'num_samples': length,
+        }
+        for i, length in enumerate(lengths)
+    ]
+
+
+def reference(batch, key):
+    pad = max(ex[key].shape[-1] for ex in batch)
+    return np.stack([pad_tensor(ex[key], pad, axis=-1) for ex in batch])
+
+
+def test_matches_pad_tensor():
+    for dtype in [np.float32, np.int16, np.complex64]:
+        batch = get_batch(dtype=dtype)
+        out = PaddedCollate()(batch)
+        expected = reference(batch, 'observation')
+        assert out['observation'].dtype == dtype
+        np.testing.assert_equal(out['observation'], expected)
+        np.testing.assert_equal(out['observation_lengths'], [5, 3, 4])
+        np.testing.assert_equal(
+            out['observation_padding_mask'],
+            np.arange(5) >= np.array([5, 3, 4])[:, None],
+        )
+        assert out['example_id'] == ['0', '1', '2']
+        assert out['num_samples'] == [5, 3, 4]
+
+
+def test_padding_keys():
+    batch = get_batch()
+    out = PaddedCollate(
+        padding_keys=['observation', 'num_samples'], mask_template=None,
+        lengths_template=None,
+    )(batch)
+    assert set(out.keys()) == {'example_id', 'observation', 'num_samples'}
+    np.testing.assert_equal(out['num_samples'], [5, 3, 4])
+    assert PaddedCollate(padding_keys=[])(batch).keys() \
+        == collate_fn(batch).keys()
+
+
+def test_to_torch():
+    batch = get_batch()
+    out = PaddedCollate(to_torch=True)(batch)
+    assert isinstance(out['observation'], torch.Tensor)
+    assert out['observation'].dtype == torch.float32
+    assert out['observation_padding_mask'].dtype == torch.bool
+
+
+def test_pool():
+    collate = PaddedCollate(pool_size=2)
+    outs = [collate(get_batch(lengths)) for lengths in [(5, 3), (2, 4), (3, 3)]]
+    # The third batch reuses the buffer of the first batch.
+    assert np.shares_memory(outs[0]['observation'], outs[2]['observation'])
+    assert not np.shares_memory(
+        outs[0]['observation'], outs[1]['observation'])
+    assert not np.shares_memory(
+        outs[1]['observation'], outs[2]['observation'])
+    # The pool is not pickled, e.g. for the prefetch workers.
+    assert pickle.loads(pickle.dumps(collate))._pool == {}
+
+
+def test_lazy_dataset_pipeline():
+    examples = {ex['example_id']: ex for ex in get_batch(range(1, 9))}
+    ds = lazy_dataset.new(examples).batch(3).map(PaddedCollate())
+    for batch, expected in zip(ds, lazy_dataset.new(examples).batch(3)):
+        np.testing.assert_equal(
+            batch['observation'], reference(expected, 'observation'))
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+import pytest
+import torch
+from scipy.signal import resample_poly
+
+from padertorch.ops import resample
+
+SAMPLE_RATES = [
+    (16000, 8000), (8000, 16000), (44100, 16000), (16000, 44100),
+    (22050, 16000), (48000, 16000),
+]
+
+
+def band_limited_signal(seed=0):
+    """Sum of sines below 0.7 times the lowest Nyquist frequency used in the
+    tests (4 kHz), as a function of the time."""
+    rng = np.random.RandomState(seed)
+    frequencies = rng.uniform(50, 2800, size=5)
+    phases = rng.uniform(0, 2 * np.pi, size=5)
+
+    def signal(t):
+        return sum(
+            np.sin(2 * np.pi * f * t + p) for f, p in zip(frequencies, phases)
+        ) / 5
+    return signal
+
+
+@pytest.mark.parametrize('orig_sample_rate,target_sample_rate', SAMPLE_RATES)
+def test_accuracy(orig_sample_rate, target_sample_rate):
+    signal = band_limited_signal()
+    x = signal(np.arange(orig_sample_rate) / orig_sample_rate)
+    y = resample(torch.from_numpy(x), orig_sample_rate, target_sample_rate)
+    y = y.numpy()
+
+    g = math.gcd(orig_sample_rate, target_sample_rate)
+    reference = resample_poly(
+        x, target_sample_rate // g, orig_sample_rate // g)
+    assert y.shape == reference.shape
+
+    # Ignore the borders, where the signal is not band limited.
+    ideal = signal(np.arange(len(y)) / target_sample_rate)
+    border = target_sample_rate // 50
+    np.testing.assert_allclose(y[border:-border], ideal[border:-border],
+                               atol=2e-4)
+    np.testing.assert_allclose(y[border:-border], reference[border:-border],
+                               atol=2e-3)
+
+
+@pytest.mark.parametrize('orig_sample_rate,target_sample_rate', SAMPLE_RATES)
+def test_samplerate(orig_sample_rate, target_sample_rate):
+    # The resampling that is used by AudioReader in contrib/je
+    samplerate = pytest.importorskip('samplerate')
+    signal = band_limited_signal()
+    x = signal(np.arange(orig_sample_rate) / orig_sample_rate)
+    y = resample(torch.from_numpy(x), orig_sample_rate, target_sample_rate)
+    reference = samplerate.resample(
+        x, target_sample_rate / orig_sample_rate, 'sinc_fastest')
+    length = min(len(reference), y.shape[-1])
+    border = target_sample_rate // 50
+    np.testing.assert_allclose(
+        y.numpy()[border:length - border], reference[border:length - border],
+        atol=5e-3)
+
+
+def test_padded_batch():
+    rng = np.random.RandomState(0)
+    lengths = [16000, 12345, 800]
+    batch = np.zeros((3, 2, max(lengths)), dtype=np.float32)
+    for i, length in enumerate(lengths):
+        batch[i, :, :length] = rng.randn(2, length)
+
+    y, new_lengths = resample(
+        torch.from_numpy(batch), 16000, 22050, sequence_lengths=lengths)
+    assert y.dtype == torch.float32
+    for i, length in enumerate(lengths):
+        expected = resample(
+            torch.from_numpy(batch[i, :, :length]), 16000, 22050)
+        assert expected.shape[-1] == new_lengths[i]
+        np.testing.assert_allclose(
+            y[i, :, :new_lengths[i]], expected, atol=1e-5)
+
+
+def test_identity():
+    x = torch.randn(10)
+    assert resample(x, 16000, 16000) is x
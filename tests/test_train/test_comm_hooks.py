@@ -0,0 +1,212 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+import torch.multiprocessing
+
+import padertorch as pt
+from padertorch.train.comm_hooks import (
+    AllReduceHook,
+    CastCompressionHook,
+    PowerSGDHook,
+    TopKCompressionHook,
+)
+
+WORLD_SIZE = 2
+
+
+def _init_process_group(rank, world_size, tmp_dir):
+    import torch.distributed as dist
+    dist.init_process_group(
+        'gloo', init_method=f'file://{tmp_dir}/init',
+        rank=rank, world_size=world_size,
+    )
+
+
+def _get_tensors(rank):
+    torch.manual_seed(rank)
+    return [torch.randn(16, 8), torch.randn(8), torch.randn(4, 3, 5)]
+
+
+def _comm_hook_worker(rank, world_size, tmp_dir, comm_hook):
+    import torch.distributed as dist
+    _init_process_group(rank, world_size, tmp_dir)
+    try:
+        tensors = _get_tensors(rank)
+        inputs = [t.clone() for t in tensors]
+        comm_hook(tensors)
+        torch.save({
+            'inputs': inputs,
+            'outputs': tensors,
+            'error': getattr(comm_hook, 'error', None),
+            'bytes_communicated': comm_hook.bytes_communicated,
+        }, f'{tmp_dir}/rank_{rank}.pth')
+    finally:
+        dist.destroy_process_group()
+
+
+def run_comm_hook(comm_hook):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        torch.multiprocessing.spawn(
+            _comm_hook_worker, args=(WORLD_SIZE, tmp_dir, comm_hook),
+            nprocs=WORLD_SIZE,
+        )
+        return [
+            torch.load(f'{tmp_dir}/rank_{rank}.pth')
+            for rank in range(WORLD_SIZE)
+        ]
+
+
+def expected_mean():
+    return [
+        torch.stack(ts).mean(0)
+        for ts in zip(*[_get_tensors(rank) for rank in range(WORLD_SIZE)])
+    ]
+
+
+uncompressed_bytes = sum(
+    t.numel() * t.element_size() for t in _get_tensors(0))
+
+
+@pytest.mark.parametrize('comm_hook,rtol,compression', [
+    (AllReduceHook(), 1e-6, 1),
+    (CastCompressionHook('float16'), 1e-2, 2),
+    (CastCompressionHook('bfloat16'), 1e-1, 2),
+    # Full rank and all entries: no approximation error
+    (PowerSGDHook(rank=8, min_compression_rate=0), 1e-4, 1),
+    # int64 indices and float32 values
+    (TopKCompressionHook(ratio=1), 1e-6, 1 / 3),
+])
+def test_comm_hook_mean(comm_hook, rtol, compression):
+    results = run_comm_hook(comm_hook)
+    for result in results:
+        for actual, expected in zip(result['outputs'], expected_mean()):
+            np.testing.assert_allclose(
+                actual.numpy(), expected.numpy(), rtol=rtol, atol=rtol)
+        if not isinstance(comm_hook, PowerSGDHook):
+            assert result['bytes_communicated'] == \
+                uncompressed_bytes / compression, result['bytes_communicated']
+
+
+@pytest.mark.parametrize('comm_hook', [
+    PowerSGDHook(rank=1),
+    TopKCompressionHook(ratio=0.1),
+])
+def test_comm_hook_error_feedback(comm_hook):
+    results = run_comm_hook(comm_hook)
+    for result in results:
+        assert result['bytes_communicated'] < uncompressed_bytes / 2, \
+            result['bytes_communicated']
+        # The identical outputs on all processes are an approximation of
+        # the mean.
+        for actual, other in zip(
+                result['outputs'], results[0]['outputs']):
+            np.testing.assert_equal(actual.numpy(), other.numpy())
+
+    if isinstance(comm_hook, TopKCompressionHook):
+        # Only k entries are communicated, the remaining are kept as error.
+        for result in results:
+            flat_input = torch.cat([t.flatten() for t in result['inputs']])
+            error, = result['error'].values()
+            communicated = flat_input - error
+            assert (communicated != 0).sum() == int(0.1 * flat_input.numel())
+    else:
+        for result in results:
+            # The 1D tensor is not compressed.
+            assert set(result['error'].keys()) == {0, 2}, result['error'].keys()
+
+
+def get_mnist_examples():
+    from padertorch.testing.test_db import MnistDatabase
+    db = MnistDatabase()
+    return [
+        {'image': ex['image'].reshape(-1), 'digit': ex['digit']}
+        for ex in db.get_dataset('test')
+    ]
+
+
+class Model(pt.Model):
+    def __init__(self):
+        super().__init__()
+        self.l = torch.nn.Linear(28 * 28, 10)
+
+    def forward(self, inputs):
+        return self.l(inputs['image'])
+
+    def review(self, inputs, output):
+        return {'loss': torch.nn.CrossEntropyLoss()(output, inputs['digit'])}
+
+
+def _train_worker(rank, world_size, tmp_dir, comm_hook, examples):
+    import torch.distributed as dist
+    _init_process_group(rank, world_size, tmp_dir)
+    try:
+        torch.manual_seed(0)
+        trainer = pt.Trainer.from_config({
+            'factory': pt.Trainer,
+            'model': {'factory': Model},
+            'storage_dir': str(Path(tmp_dir) / f'rank_{rank}'),
+            'optimizer': {
+                'factory': pt.optimizer.DistributedOptimizer,
+                'optimizer': {'factory': pt.optimizer.Adam, 'lr': 1e-2},
+                'comm_hook': comm_hook,
+            },
+            'summary_trigger': (100, 'iteration'),
+            'checkpoint_trigger': (1000, 'iteration'),
+            'stop_trigger': (300, 'iteration'),
+        })
+        # Each process uses its own shard
+        train = examples[:8000][rank::world_size]
+        batch_size = 16
+        train = [
+            pt.data.utils.collate_fn(train[i:i + batch_size])
+            for i in range(0, len(train), batch_size)
+        ]
+        train = [
+            {'image': np.stack(b['image']), 'digit': np.array(b['digit'])}
+            for b in train
+        ]
+        trainer.train(train, device='cpu', progress_bar=False)
+
+        test = examples[8000:]
+        model = trainer.model.eval()
+        with torch.no_grad():
+            prediction = model({
+                'image': torch.tensor(np.stack([e['image'] for e in test]))
+            }).argmax(-1).numpy()
+        accuracy = np.mean(prediction == np.array([e['digit'] for e in test]))
+        torch.save({
+            'accuracy': float(accuracy),
+            'model': trainer.model.state_dict(),
+        }, f'{tmp_dir}/result_{rank}.pth')
+    finally:
+        dist.destroy_process_group()
+
+
+@pytest.mark.parametrize('comm_hook', [
+    {'factory': AllReduceHook},
+    {'factory': CastCompressionHook, 'dtype': 'float16'},
+    {'factory': CastCompressionHook, 'dtype': 'bfloat16'},
+    {'factory': PowerSGDHook, 'rank': 2},
+    {'factory': TopKCompressionHook, 'ratio': 0.05},
+])
+def test_comm_hook_convergence(comm_hook):
+    examples = get_mnist_examples()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        torch.multiprocessing.spawn(
+            _train_worker,
+            args=(WORLD_SIZE, tmp_dir, comm_hook, examples),
+            nprocs=WORLD_SIZE,
+        )
+        results = [
+            torch.load(f'{tmp_dir}/result_{rank}.pth')
+            for rank in range(WORLD_SIZE)
+        ]
+    for result in results:
+        assert result['accuracy'] > 0.8, (comm_hook, result['accuracy'])
+        # The replicas stay synchronous
+        for key, value in result['model'].items():
+            np.testing.assert_equal(
+                value.numpy(), results[0]['model'][key].numpy())
@@ -297,6 +297,89 @@ def test_validation_hook_create_snapshot_flag():
     assert model.validation_create_snapshot_log == [True, False] * 11
 
 
+def test_summary_due_flag():
+    class Model(DummyModel):
+
+        def __init__(self, validation_losses, exp_dir, optimizer):
+            super().__init__(validation_losses, exp_dir, optimizer)
+            self.train_summary_due_log = []
+            self.validation_summary_due_log = []
+
+        def review(self, example, output):
+            if self.training:
+                self.train_summary_due_log.append(self.summary_due)
+            else:
+                self.validation_summary_due_log.append(self.summary_due)
+            return super().review(example, output)
+
+    ds_train = [0., 1., 2., 3.]
+    ds_valid = [0., 1.]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        optimizer = pt.optimizer.Adam()
+        model = Model([1, 2, 3, 4, 5] * 10, tmp_dir, optimizer)
+        trainer = pt.Trainer(
+            model, tmp_dir, optimizer, stop_trigger=(3, 'epoch'),
+            summary_trigger=(1, 'epoch'),
+            review_metrics_trigger=(3, 'iteration'),
+        )
+        trainer.register_validation_hook(ds_valid)
+        trainer.train(ds_train)
+    # True, when the review_metrics_trigger fires (iteration 0, 3, 6, 9) and
+    # in the first iteration after each summary (iteration 0, 4, 8).
+    assert model.train_summary_due_log == [
+        True, False, False, True,
+        True, False, True, False,
+        True, True, False, False,
+    ]
+    assert model.validation_summary_due_log == [True, True] * 4
+
+
+def test_report_only_loss():
+    class Model(DummyModel):
+
+        def __init__(self, validation_losses, exp_dir, optimizer):
+            super().__init__(validation_losses, exp_dir, optimizer)
+            self.report_log = []
+
+        def review(self, example, output):
+            review = super().review(example, output)
+            if not self.training:
+                return review
+            # 'l2' is only reported
+            review = {'losses': {'l1': review.pop('loss')}, 'scalars': {}}
+            self.report_log.append(self.summary_due)
+            if self.summary_due:
+                review['scalars']['l2'] = self.lin.weight.detach().pow(2).sum()
+            return review
+
+    ds_train = [0., 1., 2., 3.]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        optimizer = pt.optimizer.Adam()
+        model = Model([1, 2, 3, 4, 5] * 10, tmp_dir, optimizer)
+        trainer = pt.Trainer(
+            model, tmp_dir, optimizer, stop_trigger=(2, 'epoch'),
+            summary_trigger=(1, 'epoch'),
+            review_metrics_trigger=(3, 'iteration'),
+            loss_weights={'l1': 1., 'l2': 0.},
+        )
+        assert model.loss_weights is trainer.loss_weights
+        trainer.train(ds_train)
+    assert model.report_log == [
+        True, False, False, True,
+        True, False, True, False,
+    ]
+
+    # A missing loss with a non-zero weight is an error
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = Model([], tmp_dir, optimizer)
+        trainer = pt.Trainer(
+            model, tmp_dir, optimizer, stop_trigger=(1, 'epoch'),
+            loss_weights={'l1': 1., 'l2': 1.},
+        )
+        with pytest.raises(Exception, match='loss_weight'):
+            trainer.train(ds_train)
+
+
 def test_backoff():
     ds = [0]
     with tempfile.TemporaryDirectory() as tmp_dir:
@@ -325,6 +408,178 @@ def test_backoff():
     assert model.lr_log == 7*[0.001]+3*[0.0001]
 
 
+@pytest.mark.parametrize('best_state_cache_size', [None, 10**6])
+def test_backoff_from_memory(best_state_cache_size):
+    ds = [0]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        optimizer = pt.optimizer.Adam()
+        model = DummyModel([3, 2, 1, 0, 1, 1, 1, 1, 1, 1], tmp_dir, optimizer)
+        trainer = pt.Trainer(
+            model, tmp_dir, optimizer, stop_trigger=(10, 'epoch')
+        )
+        trainer.register_validation_hook(
+            ds, max_checkpoints=None,
+            n_back_off=1, back_off_patience=2, early_stopping_patience=2,
+            best_state_cache_size=best_state_cache_size,
+        )
+
+        def load_checkpoint(*args, **kwargs):
+            raise AssertionError('Expect that the back off uses the cache.')
+        trainer.load_checkpoint = load_checkpoint
+
+        trainer.train(ds)
+    assert model.ckpt_log == [
+        [],
+        ['ckpt_0.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_4.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_4.pth', 'ckpt_5.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_4.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+        ['ckpt_0.pth', 'ckpt_1.pth', 'ckpt_2.pth', 'ckpt_3.pth', 'ckpt_4.pth', 'ckpt_5.pth', 'ckpt_best_loss.pth', 'ckpt_latest.pth'],
+    ]
+    assert model.lr_log == 7*[0.001]+3*[0.0001]
+
+
+def test_backoff_cache_size_exceeded():
+    hook = pt.train.hooks.BackOffValidationHook(
+        (1, 'epoch'), [0], n_back_off=1, back_off_patience=1,
+        best_state_cache_size=1,
+    )
+
+    class DummyTrainer:
+        def state_dict(self):
+            return {'model': {'w': torch.zeros(10)}}
+
+    hook._cache_best_state(DummyTrainer(), 'ckpt_0.pth')
+    assert hook._best_state is None
+    assert hook._best_state_ckpt_name is None
+
+    hook.best_state_cache_size = None
+    hook._cache_best_state(DummyTrainer(), 'ckpt_0.pth')
+    assert hook._best_state_ckpt_name == 'ckpt_0.pth'
+    w = hook._best_state['model']['w']
+    hook._cache_best_state(DummyTrainer(), 'ckpt_1.pth')
+    # Inplace update of the cached tensors
+    assert hook._best_state['model']['w'] is w
+    assert hook._best_state_ckpt_name == 'ckpt_1.pth'
+
+
+def test_validation_cache_dir_without_cache_size(tmp_path):
+    with pytest.raises(AssertionError, match='need cache_size'):
+        pt.train.hooks.ValidationHook(
+            (1, 'epoch'), [0], cache_size=0, cache_dir=tmp_path,
+            cache_config={},
+        )
+    hook = pt.train.hooks.ValidationHook(
+        (1, 'epoch'), [0], cache_size=None, cache_dir=tmp_path,
+        cache_config={},
+    )
+    assert hook.iterator.cache_dir.parent == tmp_path
+
+
+def test_gradient_stats_hook():
+    class Model(pt.Model):
+        def __init__(self):
+            super().__init__()
+            self.enc = torch.nn.Linear(3, 4)
+            self.dec = torch.nn.Linear(4, 2)
+
+        def forward(self, inputs):
+            return self.dec(self.enc(inputs))
+
+        def review(self, inputs, outputs):
+            return {'loss': outputs.sum()}
+
+    class DummyTrainer:
+        epoch = 0
+        iteration = 0
+        model = Model()
+        writer = MagicMock()
+
+    trainer = DummyTrainer()
+    optimizer = torch.optim.SGD(trainer.model.parameters(), lr=0.1)
+    hook = pt.train.hooks.GradientStatsHook((2, 'iteration'), depth=1)
+
+    def step():
+        hook.pre_step(trainer)
+        optimizer.zero_grad()
+        trainer.model(torch.ones(5, 3)).sum().backward()
+        trainer.model.dec.bias.grad[0] = 0
+        hook.pre_optimize(trainer)
+        optimizer.step()
+        hook.post_optimize(trainer, {})
+
+    # Not triggered: nothing is reported
+    trainer.iteration = 1
+    step()
+    assert trainer.writer.add_scalar.call_count == 0
+
+    trainer.iteration = 2
+    weights = {k: v.detach().clone() for k, v in trainer.model.named_parameters()}
+    grads = {}
+
+    def pre_optimize(trainer):
+        grads.update({k: v.grad.clone() for k, v in trainer.model.named_parameters()})
+        pt.train.hooks.GradientStatsHook.pre_optimize(hook, trainer)
+    hook.pre_optimize = pre_optimize
+    step()
+
+    scalars = {
+        call[0][0]: call[0][1]
+        for call in trainer.writer.add_scalar.call_args_list
+    }
+    assert set(scalars.keys()) == {
+        f'gradient_stats/{group}/{key}'
+        for group in ['enc', 'dec']
+        for key in ['grad_norm', 'weight_norm', 'update_ratio',
+                    'grad_zero_fraction', 'grad_nonfinite_fraction']
+    }, scalars.keys()
+
+    def norm(group, d):
+        return np.sqrt(sum([
+            np.sum(v.numpy().astype(np.float64) ** 2)
+            for k, v in d.items() if k.startswith(group)
+        ]))
+
+    for group in ['enc', 'dec']:
+        np.testing.assert_allclose(
+            scalars[f'gradient_stats/{group}/grad_norm'], norm(group, grads))
+        np.testing.assert_allclose(
+            scalars[f'gradient_stats/{group}/weight_norm'],
+            norm(group, weights), rtol=1e-6)
+        np.testing.assert_allclose(
+            scalars[f'gradient_stats/{group}/update_ratio'],
+            0.1 * norm(group, grads) / norm(group, weights), rtol=1e-5)
+        assert scalars[f'gradient_stats/{group}/grad_nonfinite_fraction'] == 0
+    assert scalars['gradient_stats/enc/grad_zero_fraction'] == 0
+    # 1 of 10 entries (weight 4x2 and bias 2) is zero
+    np.testing.assert_allclose(
+        scalars['gradient_stats/dec/grad_zero_fraction'], 0.1)
+
+    # Non-finite entries are counted for the flagged gradients
+    del hook.pre_optimize
+    trainer.iteration = 4
+    trainer.writer = MagicMock()
+    hook.pre_step(trainer)
+    optimizer.zero_grad()
+    trainer.model(torch.ones(5, 3)).sum().backward()
+    trainer.model.dec.weight.grad[0, :2] = float('inf')
+    trainer.model.dec.bias.grad[1] = float('nan')
+    hook.pre_optimize(trainer)
+    hook.post_optimize(trainer, {})
+    scalars = {
+        call[0][0]: call[0][1]
+        for call in trainer.writer.add_scalar.call_args_list
+    }
+    # 3 of 10 entries are not finite
+    np.testing.assert_allclose(
+        scalars['gradient_stats/dec/grad_nonfinite_fraction'], 0.3)
+    assert scalars['gradient_stats/enc/grad_nonfinite_fraction'] == 0
+
+
 def test_loss_weight_annealing_hook():
     class DummyTrainer:
         epoch = 0
@@ -448,3 +703,62 @@ def test_LRSchedulerHook():
         hook.pre_step(trainer)
     assert lr_scheduler.calls_iteration == [0, 2, 4, 6, 8, 10]
     assert lr_scheduler.calls_epoch == [0, 0, 1, 2, 2, 3]
+
+
+def test_backoff_from_memory_equals_checkpoint():
+    # The model has parameters and Adam has a state, that both change in each
+    # optimizer step, and the BatchNorm statistics change in each training
+    # forward, so the cached state has to be taken before the training
+    # continues.
+    class Model(DummyModel):
+        def __init__(self, validation_losses, exp_dir, optimizer):
+            super().__init__(validation_losses, exp_dir, optimizer)
+            self.norm = torch.nn.BatchNorm1d(10)
+
+        def forward(self, inputs):
+            if self.training:
+                return self.norm(torch.randn(4, 10))
+            return inputs
+
+        def review(self, inputs, outputs):
+            review = super().review(inputs, outputs)
+            if self.training:
+                review['loss'] = review['loss'] + outputs.sum()
+            return review
+
+    ds = [0., 1.]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        optimizer = pt.optimizer.Adam()
+        model = Model([3, 2, 1, 2, 3] + [1] * 10, tmp_dir, optimizer)
+        trainer = pt.Trainer(
+            model, tmp_dir, optimizer, stop_trigger=(6, 'epoch')
+        )
+        trainer.register_validation_hook(
+            [0], max_checkpoints=None,
+            n_back_off=1, back_off_patience=1,
+            best_state_cache_size=None,
+        )
+
+        loaded = []
+        load_state_dict = trainer.load_state_dict
+
+        def check_load_state_dict(state_dict):
+            disk = torch.load(
+                str(trainer.checkpoint_dir / 'ckpt_latest.pth'),
+                map_location='cpu', weights_only=False,
+            )
+            assert state_dict['iteration'] == disk['iteration']
+            assert disk['model']['norm.num_batches_tracked'] == 4
+            assert not torch.all(disk['model']['norm.running_mean'] == 0)
+            for key, value in disk['model'].items():
+                torch.testing.assert_close(state_dict['model'][key], value)
+            for key, value in disk['optimizer']['state'].items():
+                for name, tensor in value.items():
+                    torch.testing.assert_close(
+                        state_dict['optimizer']['state'][key][name], tensor)
+            loaded.append(state_dict['iteration'])
+            return load_state_dict(state_dict)
+
+        trainer.load_state_dict = check_load_state_dict
+        trainer.train(ds)
+    assert loaded == [4]
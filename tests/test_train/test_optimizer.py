@@ -15,3 +15,98 @@ def test_frad_norm():
     )
     assert grad_norm == grad_norm_ref and grad_norm_ref > 0., \
         (grad_norm, grad_norm_ref)
+
+
+def _get_model_and_data():
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(
+        torch.nn.Linear(4, 8),
+        torch.nn.ReLU(),
+        torch.nn.Linear(8, 3),
+    )
+    data = torch.randn(5, 10, 4)
+    return model, data
+
+
+def _train(model, opti, data):
+    for x in data:
+        opti.zero_grad()
+        model(x).pow(2).sum().backward()
+        opti.clip_grad()
+        opti.step()
+
+
+def _sharded_optimizer_worker(rank, world_size, tmp_dir):
+    import torch.distributed as dist
+    dist.init_process_group(
+        'gloo', init_method=f'file://{tmp_dir}/init',
+        rank=rank, world_size=world_size,
+    )
+    try:
+        model, data = _get_model_and_data()
+        opti = pt.optimizer.ShardedOptimizer(
+            pt.optimizer.Adam(lr=0.01, gradient_clipping=1.))
+        opti.set_parameters(model.parameters())
+        _train(model, opti, data)
+        state_dict = opti.state_dict()
+
+        # Each process holds only the state of its shard
+        num_local_states = len(opti.optimizer.state)
+        assert 0 < num_local_states < len(opti.parameters), num_local_states
+
+        # Loading the consolidated state_dict restores the shards
+        model_2, _ = _get_model_and_data()
+        opti_2 = pt.optimizer.ShardedOptimizer(pt.optimizer.Adam(lr=0.01))
+        opti_2.set_parameters(model_2.parameters())
+        opti_2.load_state_dict(state_dict)
+        assert len(opti_2.optimizer.state) == num_local_states
+
+        torch.save({
+            'model': model.state_dict(),
+            'optimizer': state_dict,
+            'reloaded_optimizer': opti_2.state_dict(),
+        }, f'{tmp_dir}/rank_{rank}.pth')
+    finally:
+        dist.destroy_process_group()
+
+
+def test_sharded_optimizer():
+    import tempfile
+    import torch.multiprocessing
+    import paderbox as pb
+
+    world_size = 2
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        torch.multiprocessing.spawn(
+            _sharded_optimizer_worker, args=(world_size, tmp_dir),
+            nprocs=world_size,
+        )
+        results = [
+            torch.load(f'{tmp_dir}/rank_{rank}.pth')
+            for rank in range(world_size)
+        ]
+
+    model, data = _get_model_and_data()
+    opti = pt.optimizer.Adam(lr=0.01, gradient_clipping=1.)
+    opti.set_parameters(model.parameters())
+    _train(model, opti, data)
+    expected = {
+        'model': model.state_dict(),
+        'optimizer': opti.state_dict(),
+        'reloaded_optimizer': opti.state_dict(),
+    }
+
+    expected = pb.utils.nested.flatten(expected, sep=None)
+    for result in results:
+        # Same parameters on all processes and same layout of the
+        # consolidated state_dict as without sharding.
+        result = pb.utils.nested.flatten(result, sep=None)
+        assert result.keys() == expected.keys(), (result.keys(), expected.keys())
+        for key, value in expected.items():
+            if torch.is_tensor(value):
+                pb.testing.assert_allclose(
+                    result[key].numpy(), value.numpy(), rtol=1e-5, atol=1e-6,
+                    err_msg=key,
+                )
+            else:
+                assert result[key] == value, (key, result[key], value)